@@ -24,6 +24,17 @@ const MediaDefaults = {
   }
 };
 
+// Must match name_tokens() in python-backend/utils/ai_core/database.py: the AI Analyst
+// finds people by word prefixes of name_tokens on a multikey index.
+const NAME_TITLES = /\b(DR|PROF|MR|MS|MRS|JR|SR|I|II|III|IV)\b\.?/gi;
+
+function nameTokens(name) {
+  if (!name) return [];
+  const cleaned = String(name).toUpperCase().replace(NAME_TITLES, '').replace(/-/g, ' ')
+    .replace(/[^\p{L}\p{N}_\s]/gu, '');
+  return [...new Set(cleaned.split(/\s+/).filter(Boolean))];
+}
+
 class StudentDatabase {
   constructor(connectionString = null, databaseName = 'school_system') {
   this.connectionString = connectionString || 'mongodb://localhost:27017/';
@@ -118,6 +129,7 @@ _getCollectionByDepartment(department) {
       surname: data.surname || '',
       first_name: data.first_name || '',
       full_name: data.full_name || '',
+      name_tokens: nameTokens(data.full_name),
       course: data.course || '',
       section: data.section || '',
       year: data.year || '',
@@ -212,6 +224,7 @@ _getCollectionByDepartment(department) {
     const pendingDoc = {
       student_id: studentDoc.student_id,
       full_name: studentDoc.full_name,
+      name_tokens: nameTokens(studentDoc.full_name),
       course: studentDoc.course,
       section: studentDoc.section,
       year: studentDoc.year,
@@ -911,6 +924,7 @@ class StudentGradesManager {
       student_id: studentNumber,
       student_name: gradesData.metadata.student_name,
       full_name: existingStudent.full_name,
+      name_tokens: nameTokens(existingStudent.full_name),
       course: gradesData.metadata.course || existingStudent.course,
       department: existingStudent.department,
       year: existingStudent.year,  // ← CHANGED from year_level
@@ -1031,6 +1045,7 @@ class TeachingFacultyManager {
       // Identification
       faculty_id: `FACULTY_${facultyData.metadata.department}_${Date.now()}`,
       full_name: facultyData.metadata.full_name,
+      name_tokens: nameTokens(facultyData.metadata.full_name),
       surname: facultyData.metadata.surname,
       first_name: facultyData.metadata.first_name,
       
@@ -1194,6 +1209,7 @@ async _addTeachingToPendingMedia(facultyDoc) {
     const pendingDoc = {
       faculty_id: facultyDoc.faculty_id,
       full_name: facultyDoc.full_name,
+      name_tokens: nameTokens(facultyDoc.full_name),
       position: facultyDoc.position,
       department: facultyDoc.department,
       faculty_type: 'teaching',
@@ -1488,6 +1504,7 @@ class TeachingFacultyScheduleManager {
         schedule_id: `FACULTY_SCHED_${scheduleData.metadata.department}_${Date.now()}`,
         adviser_name: scheduleData.metadata.adviser_name,
         full_name: scheduleData.metadata.full_name,
+        name_tokens: nameTokens(scheduleData.metadata.full_name),
         department: scheduleData.metadata.department,
         
         // Schedule Summary
@@ -1659,6 +1676,7 @@ class NonTeachingFacultyManager {
       // Identification
       faculty_id: `NON_TEACHING_${facultyData.metadata.department}_${Date.now()}`,
       full_name: facultyData.metadata.full_name,
+      name_tokens: nameTokens(facultyData.metadata.full_name),
       surname: facultyData.metadata.surname,
       first_name: facultyData.metadata.first_name,
       
@@ -1822,6 +1840,7 @@ async _addNonTeachingToPendingMedia(facultyDoc) {
     const pendingDoc = {
       faculty_id: facultyDoc.faculty_id,
       full_name: facultyDoc.full_name,
+      name_tokens: nameTokens(facultyDoc.full_name),
       position: facultyDoc.position,
       department: facultyDoc.department,
       faculty_type: 'non_teaching',
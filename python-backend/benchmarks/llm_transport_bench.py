@@ -0,0 +1,93 @@
+# backend/benchmarks/llm_transport_bench.py
+
+"""
+Micro-benchmark for the LLMService HTTP transport.
+
+Starts the local stub LLM server (stub_llm_server.py) in Ollama mode, then measures
+the per-call overhead of:
+  - "fresh":  a new requests.post() per call (the old LLMService behaviour)
+  - "pooled": LLMService.execute() using the shared keep-alive session
+
+With --batch N it also compares N sequential execute() calls against one
+execute_many() call, with the stub sleeping --latency seconds per request to
+stand in for model time.
+
+Usage (from python-backend/):
+    python benchmarks/llm_transport_bench.py --calls 200
+    python benchmarks/llm_transport_bench.py --calls 50 --batch 16 --latency 0.2
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import requests
+
+sys.path.append(str(Path(__file__).resolve().parent))
+sys.path.append(str(Path(__file__).resolve().parents[1] / "utils"))
+from ai_core.llm_service import LLMService, close_http_sessions  # noqa: E402
+from stub_llm_server import StubLLMServer  # noqa: E402
+
+
+def _summarize(label: str, samples: list) -> str:
+    ms = sorted(s * 1000 for s in samples)
+    p95 = ms[int(len(ms) * 0.95) - 1]
+    return f"{label:<8} mean={statistics.mean(ms):7.3f} ms  p50={statistics.median(ms):7.3f} ms  p95={p95:7.3f} ms"
+
+
+def run(calls: int, batch: int = 0, latency: float = 0.0):
+    server = StubLLMServer(profile="instant").start()
+    api_url = server.ollama_url
+
+    payload = json.dumps({"model": "stub", "messages": [{"role": "user", "content": "hi"}], "stream": False})
+    headers = {"Content-Type": "application/json"}
+
+    fresh = []
+    for _ in range(calls):
+        t0 = time.perf_counter()
+        requests.post(api_url, headers=headers, data=payload, timeout=360).json()
+        fresh.append(time.perf_counter() - t0)
+
+    llm = LLMService({"api_mode": "offline", "ollama_api_url": api_url, "planner_model": "stub"})
+    pooled = []
+    for _ in range(calls):
+        t0 = time.perf_counter()
+        llm.execute(system_prompt="bench", user_prompt="hi")
+        pooled.append(time.perf_counter() - t0)
+
+    if batch:
+        server.ttfb = latency
+        requests_batch = [{"system_prompt": "bench", "user_prompt": f"q{i}"} for i in range(batch)]
+        t0 = time.perf_counter()
+        for request in requests_batch:
+            llm.execute(**request)
+        sequential = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        results = llm.execute_many(requests_batch)
+        concurrent = time.perf_counter() - t0
+
+    close_http_sessions()
+    server.stop()
+
+    print(f"Per-call overhead against a local stub ({calls} calls each):")
+    print(_summarize("fresh", fresh))
+    print(_summarize("pooled", pooled))
+    print(f"Speed-up (mean): {statistics.mean(fresh) / statistics.mean(pooled):.2f}x")
+    if batch:
+        ok = sum(1 for r in results if r["ok"])
+        print(f"\nBatch of {batch} requests at {latency * 1000:.0f} ms simulated model time "
+              f"(max_concurrency={llm.max_concurrency}):")
+        print(f"sequential  {sequential * 1000:8.1f} ms")
+        print(f"execute_many {concurrent * 1000:7.1f} ms  ({ok}/{batch} ok, {sequential / concurrent:.2f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark fresh vs pooled LLM HTTP transport")
+    parser.add_argument("--calls", type=int, default=200, help="Number of calls per strategy")
+    parser.add_argument("--batch", type=int, default=0, help="Also benchmark execute_many with this many requests")
+    parser.add_argument("--latency", type=float, default=0.1, help="Simulated model time (s) for the batch benchmark")
+    args = parser.parse_args()
+    run(args.calls, args.batch, args.latency)
@@ -0,0 +1,106 @@
+# backend/benchmarks/pipeline_bench.py
+
+"""
+End-to-end load test of AIAnalyst against the local stub LLM server.
+
+Every LLM URL in config/config.json is pointed at an in-process StubLLMServer,
+so the full pipeline (intent -> planner -> tools -> synth -> summarizer) runs
+without a Mistral key or Ollama. MongoDB must still be reachable, because the
+tools query the real collections.
+
+Usage (from python-backend/):
+    python benchmarks/pipeline_bench.py --profile ollama-cpu --concurrency 4 --repeat 3
+    python benchmarks/pipeline_bench.py --cassette cassettes/demo.jsonl --profile recorded
+
+To build a cassette, set "record_cassette": "cassettes/demo.jsonl" in the
+online/offline config section and use the assistant normally against the
+real backends.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+sys.path.append(str(Path(__file__).resolve().parent))
+sys.path.append(str(BACKEND_DIR / "utils"))
+from stub_llm_server import PROFILES, StubLLMServer  # noqa: E402
+
+DEFAULT_QUERIES = [
+    "hello",
+    "who is the dean of CCS?",
+    "list all BSCS 1st year students",
+    "what is the schedule of BSIT 2A?",
+    "what is the mission of PDM?",
+]
+
+
+def _percentile(samples: list, percentile: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(percentile * (len(ordered) - 1))))]
+
+
+def run(args):
+    from ai_core import AIAnalyst  # Imported late: needs the full backend requirements
+    from run_ai import list_all_collections, load_config
+
+    config = load_config(BACKEND_DIR / "config" / "config.json")
+    queries = DEFAULT_QUERIES
+    if args.queries:
+        queries = [q.strip() for q in Path(args.queries).read_text(encoding="utf-8").splitlines() if q.strip()]
+
+    server = StubLLMServer(profile=args.profile, cassette=args.cassette, error_rate=args.error_rate).start()
+    config.setdefault("online", {})["mistral_api_url"] = server.mistral_url
+    config.setdefault("offline", {})["ollama_api_url"] = server.ollama_url
+    for section in ("online", "offline"):
+        config[section]["debug_mode"] = args.verbose
+        config[section].pop("record_cassette", None)  # Never record stub answers
+
+    collections = args.collections.split(",") if args.collections else list_all_collections(config)
+    execution_mode = args.mode or config.get("execution_mode", "split")
+    with contextlib.redirect_stdout(io.StringIO()) if not args.verbose else contextlib.nullcontext():
+        analyst = AIAnalyst(collections=collections, llm_config=config, execution_mode=execution_mode)
+
+    jobs = [(f"bench_{i % args.concurrency}", query) for i, query in enumerate(queries * args.repeat)]
+
+    def run_turn(job):
+        session_id, query = job
+        t0 = time.perf_counter()
+        analyst.web_start_ai_analyst(query, session_id)
+        return time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()) if not args.verbose else contextlib.nullcontext():
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            latencies = list(pool.map(run_turn, jobs))
+    wall = time.perf_counter() - t0
+    server.stop()
+
+    print(f"{len(jobs)} turns, concurrency={args.concurrency}, mode={execution_mode}, profile={args.profile}")
+    print(f"turn latency  mean={statistics.mean(latencies):.3f}s  p50={_percentile(latencies, 0.5):.3f}s  "
+          f"p95={_percentile(latencies, 0.95):.3f}s  max={max(latencies):.3f}s")
+    print(f"throughput    {len(jobs) / wall:.2f} turns/s over {wall:.2f}s")
+    print(f"stub          {server.stats}")
+    if args.stats:
+        print(json.dumps(analyst.get_llm_stats(), indent=2, default=str))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test the AI Analyst pipeline against the stub LLM server")
+    parser.add_argument("--profile", default="instant", choices=sorted(PROFILES), help="Stub latency profile")
+    parser.add_argument("--cassette", help="Cassette to replay (see stub_llm_server.py)")
+    parser.add_argument("--queries", help="Text file with one query per line")
+    parser.add_argument("--collections", help="Comma-separated collections (default: discover from MongoDB)")
+    parser.add_argument("--mode", choices=["online", "offline", "split"], help="Override execution_mode")
+    parser.add_argument("--concurrency", type=int, default=1, help="Concurrent sessions")
+    parser.add_argument("--repeat", type=int, default=1, help="How many times to run the query list")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of stub requests answered with 503")
+    parser.add_argument("--stats", action="store_true", help="Print AIAnalyst.get_llm_stats() afterwards")
+    parser.add_argument("--verbose", action="store_true", help="Keep the pipeline's debug output")
+    run(parser.parse_args())
@@ -0,0 +1,141 @@
+# backend/benchmarks/projection_bench.py
+
+"""
+Measures what projection pushdown saves per search_database-style query: the
+bytes MongoDB sends back and the latency of each MongoCollectionAdapter.query().
+
+Three projections are compared:
+  - "full":    no projection (the old behaviour, image/audio blobs included)
+  - "default": the adapter default, media and face descriptors excluded
+  - "grades":  the get_student_grades field list
+
+By default a scratch database is seeded with synthetic students carrying
+base64 placeholder-size images, and dropped afterwards. With --real the
+configured database's collections are queried instead (read-only).
+
+Usage (from python-backend/):
+    python benchmarks/projection_bench.py --students 500 --image-kb 200 --repeat 20
+    python benchmarks/projection_bench.py --real --collections students_ccs,grades_ccs
+"""
+
+import argparse
+import base64
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import bson
+from pymongo import MongoClient, monitoring
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+sys.path.append(str(BACKEND_DIR / "utils"))
+from ai_core.analyst import GRADE_TOOL_FIELDS  # noqa: E402
+from ai_core.database import MongoCollectionAdapter  # noqa: E402
+from run_ai import get_mongo_params, load_config  # noqa: E402
+
+SCRATCH_DB = "projection_bench"
+QUERIES = [
+    {"query_texts": ["*"], "where": {"program": "BSCS"}},
+    {"query_texts": ["santos"]},
+    {"query_texts": ["*"], "where": {"year_level": "2"}},
+]
+
+
+class ReplySizeListener(monitoring.CommandListener):
+    """Adds up the BSON size of every find/getMore reply."""
+
+    def __init__(self):
+        self.bytes = 0
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        if event.command_name in ("find", "getMore"):
+            self.bytes += len(bson.encode(event.reply))
+
+    def failed(self, event):
+        pass
+
+
+def seed(db, students: int, image_kb: int):
+    image = base64.b64encode(os.urandom(image_kb * 1024 * 3 // 4)).decode()
+    docs = []
+    for i in range(students):
+        docs.append({
+            "student_id": f"PDM-{i:05d}", "full_name": f"Student {i} {'Santos' if i % 10 == 0 else 'Cruz'}",
+            "course": "BSCS" if i % 2 else "BSIT", "year": str(1 + i % 4), "section": "AB"[i % 2],
+            "department": "CCS", "contact_number": "09170000000", "guardian_name": "Guardian",
+            "image": {"data": image, "filename": f"{i}.png", "status": "complete"},
+            "audio": {"data": None, "filename": None, "status": "waiting"},
+            "descriptor": [0.01 * (i % 100)] * 128,
+            "field_status": {"image": "complete", "audio": "waiting"}, "completion_percentage": 80,
+        })
+    db["students_bench"].insert_many(docs)
+    db["grades_bench"].insert_many([{
+        "student_id": d["student_id"], "full_name": d["full_name"], "course": d["course"], "year": d["year"],
+        "section": d["section"], "department": "CCS", "data_type": "student_grades", "gwa": "1.75",
+        "total_subjects": 8, "grades": [{"subject_code": f"CS10{k}", "final_grade": "1.75"} for k in range(8)],
+    } for d in docs])
+    return ["students_bench", "grades_bench"]
+
+
+def measure(db, listener, names, excluded_fields, fields, repeat):
+    adapters = [MongoCollectionAdapter(db[name], excluded_fields=excluded_fields) for name in names]
+    latencies, sizes = [], []
+    for _ in range(repeat):
+        for query in QUERIES:
+            listener.bytes = 0
+            t0 = time.perf_counter()
+            for adapter in adapters:  # One call = one query per collection, like search_database
+                adapter.query(n_results=200, fields=fields, **query)
+            latencies.append(time.perf_counter() - t0)
+            sizes.append(listener.bytes)
+    return latencies, sizes
+
+
+def run(args):
+    listener = ReplySizeListener()
+    if args.real:
+        config = load_config(BACKEND_DIR / "config" / "config.json")
+        mongo_uri, db_name = get_mongo_params(config)
+    else:
+        mongo_uri, db_name = args.mongo_uri, SCRATCH_DB
+    client = MongoClient(mongo_uri, event_listeners=[listener], serverSelectionTimeoutMS=5000)
+    db = client[db_name]
+
+    if args.real:
+        names = args.collections.split(",") if args.collections else db.list_collection_names()
+    else:
+        client.drop_database(SCRATCH_DB)
+        names = seed(db, args.students, args.image_kb)
+
+    try:
+        print(f"{len(QUERIES) * args.repeat} calls over {len(names)} collection(s) in '{db_name}'")
+        baseline = None
+        for label, excluded, fields in (("full", (), None),
+                                        ("default", ("image", "audio", "descriptor"), None),
+                                        ("grades", ("image", "audio", "descriptor"), GRADE_TOOL_FIELDS)):
+            latencies, sizes = measure(db, listener, names, excluded, fields, args.repeat)
+            mean_bytes = statistics.mean(sizes)
+            baseline = baseline or mean_bytes
+            print(f"{label:<8} latency mean={statistics.mean(latencies) * 1000:8.2f} ms  "
+                  f"p50={statistics.median(latencies) * 1000:8.2f} ms  "
+                  f"bytes/call={mean_bytes / 1024:10.1f} KB  ({baseline / max(mean_bytes, 1):.1f}x less than full)")
+    finally:
+        if not args.real:
+            client.drop_database(SCRATCH_DB)
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark bytes and latency with and without projection pushdown")
+    parser.add_argument("--mongo-uri", default="mongodb://localhost:27017/", help="MongoDB for the scratch database")
+    parser.add_argument("--students", type=int, default=500, help="Synthetic students to seed")
+    parser.add_argument("--image-kb", type=int, default=200, help="Size of each base64 image")
+    parser.add_argument("--repeat", type=int, default=10, help="How many times to run the query list")
+    parser.add_argument("--real", action="store_true", help="Query the configured database instead of a scratch one")
+    parser.add_argument("--collections", help="Comma-separated collections for --real (default: all)")
+    run(parser.parse_args())
@@ -0,0 +1,137 @@
+# backend/benchmarks/search_strategy_bench.py
+
+"""
+Compares the ways search_database can query several collections:
+  - "sequential": one find() per collection, one after another (the old loop)
+  - "parallel":   one find() per collection, all in flight on a thread pool
+                  (search_fanout.strategy "parallel", the default)
+  - "union":      one $unionWith aggregation (search_fanout.strategy "union")
+
+A scratch database is seeded with the collection layout the express-backend
+creates (students_, schedules_, faculty_, faculty_schedules_, grades_ and
+non_teaching_faculty_ per department) and dropped afterwards. Each search is
+timed and its round-trips (find/aggregate/getMore commands) are counted.
+
+The union pipeline saves round-trips but its branches run one after another
+on the server, so it tends to win on a remote server (high RTT) with cheap
+per-collection queries, and the parallel fan-out wins when the queries
+themselves are slow (unindexed filters, large collections). Use --mongo-uri
+to point at a remote server and --docs to change the collection sizes.
+
+Usage (from python-backend/):
+    python benchmarks/search_strategy_bench.py --docs 200 --repeat 20
+    python benchmarks/search_strategy_bench.py --mongo-uri mongodb://db.example:27017/ --docs 5000
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from pymongo import MongoClient, monitoring
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+sys.path.append(str(BACKEND_DIR / "utils"))
+from ai_core.database import MongoCollectionAdapter, union_query  # noqa: E402
+from ai_core.stages import Stage, run_stages  # noqa: E402
+
+SCRATCH_DB = "search_strategy_bench"
+DEPARTMENTS = ["ccs", "chtm", "cba", "cte", "unknown"]
+PREFIXES = ["students", "schedules", "faculty", "faculty_schedules", "grades", "non_teaching_faculty"]
+SURNAMES = ["Santos", "Reyes", "Cruz", "Bautista", "Garcia", "Mendoza", "Escobar", "Villanueva"]
+
+# (label, collection_filter, search arguments), shaped like the tools' calls.
+SEARCHES = [
+    ("name, all collections", None, {"query_texts": ["escobar"]}),
+    ("wildcard, students_", "students_", {"query_texts": ["*"], "where": {"program": "BSCS"}}),
+    ("filter, grades_", "grades_", {"query_texts": ["*"], "where": {"year_level": "2"}}),
+]
+
+
+class RoundTripListener(monitoring.CommandListener):
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        if event.command_name in ("find", "aggregate", "getMore"):
+            self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+def seed(db, docs: int):
+    for prefix in PREFIXES:
+        for dept in DEPARTMENTS:
+            db[f"{prefix}_{dept}"].insert_many([{
+                "full_name": f"{SURNAMES[i % len(SURNAMES)]}, Student {i}", "student_id": f"{dept}-{i:05d}",
+                "course": "BSCS" if i % 3 == 0 else "BSIT", "year": str(1 + i % 4), "section": "ABC"[i % 3],
+                "department": dept.upper(), "gwa": "1.75",
+            } for i in range(docs)])
+
+
+def sequential(adapters, args):
+    return {name: adapter.query(n_results=200, **args) for name, adapter in adapters.items()}
+
+
+def parallel(adapters, args, executor):
+    run = run_stages({name: Stage(lambda adapter=adapter: adapter.query(n_results=200, **args), default={})
+                      for name, adapter in adapters.items()}, executor)
+    return {name: run[name] for name in adapters}
+
+
+def union(adapters, args):
+    return union_query(adapters, n_results=200, **args)
+
+
+def run(args):
+    listener = RoundTripListener()
+    client = MongoClient(args.mongo_uri, event_listeners=[listener], serverSelectionTimeoutMS=5000)
+    client.drop_database(SCRATCH_DB)
+    db = client[SCRATCH_DB]
+    seed(db, args.docs)
+    names = sorted(db.list_collection_names())
+    executor = ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix="search-fanout")
+    strategies = {"sequential": sequential, "parallel": lambda a, q: parallel(a, q, executor), "union": union}
+
+    try:
+        print(f"{len(names)} collections x {args.docs} documents, {args.repeat} runs per search\n")
+        for label, collection_filter, search_args in SEARCHES:
+            adapters = {name: MongoCollectionAdapter(db[name]) for name in names
+                        if not collection_filter or collection_filter in name}
+            print(f"{label} ({len(adapters)} collections)")
+            counts = None
+            for strategy, fn in strategies.items():
+                fn(adapters, search_args)  # Warm-up (connections, plan cache)
+                latencies = []
+                listener.count = 0
+                for _ in range(args.repeat):
+                    t0 = time.perf_counter()
+                    results = fn(adapters, search_args)
+                    latencies.append(time.perf_counter() - t0)
+                hits = [len(r["ids"][0]) for r in results.values()]
+                if counts is not None and hits != counts:
+                    print(f"   ⚠️ {strategy} returned different results: {sum(hits)} vs {sum(counts)} documents")
+                counts = hits
+                print(f"   {strategy:<10} mean={statistics.mean(latencies) * 1000:8.2f} ms  "
+                      f"p50={statistics.median(latencies) * 1000:8.2f} ms  "
+                      f"round-trips/search={listener.count / args.repeat:5.1f}  hits={sum(hits)}")
+            print()
+    finally:
+        executor.shutdown()
+        client.drop_database(SCRATCH_DB)
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark sequential, parallel and $unionWith multi-collection search")
+    parser.add_argument("--mongo-uri", default="mongodb://localhost:27017/", help="MongoDB for the scratch database")
+    parser.add_argument("--docs", type=int, default=200, help="Documents per collection")
+    parser.add_argument("--repeat", type=int, default=20, help="Runs per search and strategy")
+    parser.add_argument("--workers", type=int, default=8, help="Thread pool size for the parallel strategy")
+    run(parser.parse_args())
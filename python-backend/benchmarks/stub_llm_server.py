@@ -0,0 +1,340 @@
+# backend/benchmarks/stub_llm_server.py
+
+"""
+A local stand-in for the LLM backends, for benchmarking and load-testing the
+AI Analyst pipeline without a Mistral key or a running Ollama.
+
+It speaks both protocols LLMService uses:
+  - Mistral:  POST /v1/chat/completions  (JSON, or SSE when "stream": true)
+  - Ollama:   POST /api/chat             (JSON, or NDJSON when "stream": true)
+              POST /api/generate (model load only), GET /api/ps
+
+With --model-load-seconds, Ollama requests for a model that is not loaded pay
+a simulated load time, and only --max-loaded-models stay loaded, mimicking
+weight swaps on a CPU-only box.
+
+Responses come from a cassette recorded by LLMService (set "record_cassette"
+in the online/offline config) when the request matches one. Otherwise a canned
+answer is returned: a minimal tool call in JSON mode (a JSON object or
+schema-constrained output), a fixed sentence otherwise.
+Latency follows a profile: time-to-first-byte plus a token rate. The "recorded"
+profile replays the latency captured in the cassette.
+
+Usage (from python-backend/):
+    python benchmarks/stub_llm_server.py --port 11435 --profile ollama-cpu
+    python benchmarks/stub_llm_server.py --cassette cassettes/demo.jsonl --profile recorded
+
+Then point "ollama_api_url" at http://127.0.0.1:11435/api/chat or
+"mistral_api_url" at http://127.0.0.1:11435/v1/chat/completions.
+"""
+
+import argparse
+import json
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional, Tuple
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / "utils"))
+from ai_core.cassette import CassettePlayer  # noqa: E402
+from ai_core.token_budget import estimate_message_tokens, estimate_tokens  # noqa: E402
+
+# ttfb: seconds before the first byte; tokens_per_sec: generation speed (0 = instant);
+# jitter: +/- fraction applied to both.
+PROFILES = {
+    "instant":    {"ttfb": 0.0,  "tokens_per_sec": 0,  "jitter": 0.0},
+    "mistral":    {"ttfb": 0.35, "tokens_per_sec": 80, "jitter": 0.15},
+    "ollama-gpu": {"ttfb": 0.25, "tokens_per_sec": 40, "jitter": 0.1},
+    "ollama-cpu": {"ttfb": 1.5,  "tokens_per_sec": 8,  "jitter": 0.2},
+    "recorded":   {"ttfb": 0.0,  "tokens_per_sec": 0,  "jitter": 0.0},  # Uses each entry's recorded latency
+}
+
+CANNED_PLAN = {"tool_name": "answer_conversational_query", "parameters": {}}
+CANNED_TEXT = "This is a canned response from the stub LLM server."
+
+_CHUNK_RE = re.compile(r"\S+\s*|\s+")
+
+
+class StubLLMServer:
+    """A threaded HTTP server that answers like Mistral and Ollama. Use start()/stop() or a with-block."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, profile: str = "instant",
+                 cassette: Optional[str] = None, ttfb: Optional[float] = None,
+                 tokens_per_sec: Optional[float] = None, jitter: Optional[float] = None,
+                 error_rate: float = 0.0, strict: bool = False, seed: int = 0,
+                 model_load_seconds: float = 0.0, max_loaded_models: int = 1):
+        if profile not in PROFILES:
+            raise ValueError(f"Unknown profile '{profile}'. Choose from: {', '.join(PROFILES)}")
+        settings = dict(PROFILES[profile])
+        for name, value in (("ttfb", ttfb), ("tokens_per_sec", tokens_per_sec), ("jitter", jitter)):
+            if value is not None:
+                settings[name] = value
+        self.profile = profile
+        self.ttfb = settings["ttfb"]
+        self.tokens_per_sec = settings["tokens_per_sec"]
+        self.jitter = settings["jitter"]
+        self.error_rate = error_rate
+        self.strict = strict
+        self.player = CassettePlayer(cassette) if cassette else None
+        self.model_load_seconds = model_load_seconds
+        self.max_loaded_models = max(1, max_loaded_models)
+        self.loaded_models: "OrderedDict[str, float]" = OrderedDict()
+        self._load_lock = threading.Lock()  # Ollama loads one model at a time
+
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "cassette_hits": 0, "canned": 0, "misses": 0, "injected_errors": 0,
+                      "model_loads": 0}
+
+        self._httpd = ThreadingHTTPServer((host, port), _StubHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.stub = self
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def ollama_url(self) -> str:
+        return f"{self.base_url}/api/chat"
+
+    @property
+    def mistral_url(self) -> str:
+        return f"{self.base_url}/v1/chat/completions"
+
+    def start(self) -> "StubLLMServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _count(self, stat: str):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def _jittered(self, value: float) -> float:
+        if not self.jitter or not value:
+            return value
+        with self._lock:
+            return max(0.0, value * (1 + self._random.uniform(-self.jitter, self.jitter)))
+
+    def load_model(self, model: str) -> float:
+        """Makes `model` resident, sleeping for the simulated load time if it wasn't. Returns that time."""
+        if not self.model_load_seconds:
+            return 0.0
+        with self._load_lock:
+            if model in self.loaded_models:
+                self.loaded_models.move_to_end(model)
+                return 0.0
+            time.sleep(self.model_load_seconds)
+            self.loaded_models[model] = time.time()
+            while len(self.loaded_models) > self.max_loaded_models:
+                self.loaded_models.popitem(last=False)
+        self._count("model_loads")
+        return self.model_load_seconds
+
+    def should_fail(self) -> bool:
+        if not self.error_rate:
+            return False
+        with self._lock:
+            return self._random.random() < self.error_rate
+
+    def respond(self, messages: list, json_mode: bool) -> Tuple[Optional[str], str, Optional[float]]:
+        """Returns (content, source, recorded_latency). content is None on a strict-mode miss."""
+        self._count("requests")
+        if self.player is not None:
+            entry = self.player.lookup(messages, json_mode)
+            if entry is not None:
+                self._count("cassette_hits")
+                return entry["response"], "cassette", entry.get("latency_seconds")
+            self._count("misses")
+            if self.strict:
+                return None, "miss", None
+        self._count("canned")
+        return (json.dumps(CANNED_PLAN) if json_mode else CANNED_TEXT), "canned", None
+
+    def timing(self, content: str, recorded_latency: Optional[float]) -> Tuple[float, float]:
+        """Returns (time to first byte, per-token delay) for a response."""
+        if self.profile == "recorded" and recorded_latency is not None:
+            return recorded_latency, 0.0
+        per_token = 1.0 / self.tokens_per_sec if self.tokens_per_sec else 0.0
+        return self._jittered(self.ttfb), self._jittered(per_token)
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like the real backends
+    disable_nagle_algorithm = True  # Avoids 40 ms delayed-ACK stalls on reused sockets
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        stub: StubLLMServer = self.server.stub
+        if self.path.endswith("/api/ps"):
+            return self._send_json(200, {"models": [{"name": m, "model": m} for m in stub.loaded_models]})
+        self._send_json(404, {"error": f"unknown path {self.path}"})
+
+    def do_POST(self):
+        stub: StubLLMServer = self.server.stub
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            return self._send_json(400, {"error": "invalid JSON body"})
+
+        if self.path.endswith("/api/generate"):
+            model = body.get("model", "stub")
+            load_seconds = stub.load_model(model)
+            return self._send_json(200, {"model": model, "response": "", "done": True,
+                                         "load_duration": int(load_seconds * 1e9)})
+
+        if self.path.endswith("/chat/completions"):
+            protocol = "mistral"
+            json_mode = (body.get("response_format") or {}).get("type") in ("json_object", "json_schema")
+        elif self.path.endswith("/api/chat"):
+            protocol = "ollama"
+            json_mode = bool(body.get("format"))  # "json", or a JSON schema for constrained decoding
+        else:
+            return self._send_json(404, {"error": f"unknown path {self.path}"})
+
+        if stub.should_fail():
+            stub._count("injected_errors")
+            return self._send_json(503, {"error": "injected failure"}, {"Retry-After": "1"})
+
+        messages = body.get("messages", [])
+        content, source, recorded_latency = stub.respond(messages, json_mode)
+        if content is None:
+            return self._send_json(404, {"error": "no cassette entry for this request"})
+
+        model = body.get("model", "stub")
+        load_seconds = stub.load_model(model) if protocol == "ollama" else 0.0
+        ttfb, per_token = stub.timing(content, recorded_latency)
+        prompt_tokens = estimate_message_tokens(messages)
+        completion_tokens = estimate_tokens(content)
+        headers = {"X-Stub-Source": source}
+
+        if body.get("stream"):
+            return self._stream(protocol, model, content, ttfb, per_token, prompt_tokens, completion_tokens,
+                                load_seconds, headers)
+
+        started = time.perf_counter()
+        time.sleep(ttfb + per_token * completion_tokens)
+        elapsed_ns = int((time.perf_counter() - started) * 1e9)
+        if protocol == "mistral":
+            payload = {
+                "id": f"stub-{uuid.uuid4().hex[:12]}", "object": "chat.completion", "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                          "total_tokens": prompt_tokens + completion_tokens},
+            }
+        else:
+            payload = {
+                "model": model, "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "message": {"role": "assistant", "content": content}, "done": True,
+                "total_duration": elapsed_ns, "prompt_eval_count": prompt_tokens,
+                "eval_count": completion_tokens, "eval_duration": max(1, int(per_token * completion_tokens * 1e9)),
+                "load_duration": int(load_seconds * 1e9),
+            }
+        self._send_json(200, payload, headers)
+
+    def _send_json(self, status: int, payload: dict, headers: Optional[dict] = None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _stream(self, protocol, model, content, ttfb, per_token, prompt_tokens, completion_tokens, load_seconds, headers):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream" if protocol == "mistral" else "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+
+        time.sleep(ttfb)
+        started = time.perf_counter()
+        for piece in _CHUNK_RE.findall(content):
+            if protocol == "mistral":
+                event = {"choices": [{"index": 0, "delta": {"content": piece}}]}
+                self._write_chunk(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+            else:
+                event = {"model": model, "message": {"role": "assistant", "content": piece}, "done": False}
+                self._write_chunk((json.dumps(event) + "\n").encode("utf-8"))
+            if per_token:
+                time.sleep(per_token * estimate_tokens(piece))
+
+        if protocol == "mistral":
+            usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                     "total_tokens": prompt_tokens + completion_tokens}
+            final = {"choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "usage": usage}
+            self._write_chunk(f"data: {json.dumps(final)}\n\n".encode("utf-8"))
+            self._write_chunk(b"data: [DONE]\n\n")
+        else:
+            final = {"model": model, "message": {"role": "assistant", "content": ""}, "done": True,
+                     "prompt_eval_count": prompt_tokens, "eval_count": completion_tokens,
+                     "eval_duration": max(1, int((time.perf_counter() - started) * 1e9)),
+                     "load_duration": int(load_seconds * 1e9)}
+            self._write_chunk((json.dumps(final) + "\n").encode("utf-8"))
+        self._write_chunk(b"")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stub LLM server (Mistral + Ollama protocols)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--profile", default="instant", choices=sorted(PROFILES), help="Latency profile")
+    parser.add_argument("--cassette", help="Cassette (JSONL) recorded by LLMService to replay")
+    parser.add_argument("--ttfb", type=float, help="Override the profile's time to first byte (s)")
+    parser.add_argument("--tokens-per-sec", type=float, help="Override the profile's generation speed")
+    parser.add_argument("--jitter", type=float, help="Override the profile's jitter fraction")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    parser.add_argument("--strict", action="store_true", help="Fail requests that are not in the cassette")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for jitter and error injection")
+    parser.add_argument("--model-load-seconds", type=float, default=0.0, help="Simulated Ollama model load time")
+    parser.add_argument("--max-loaded-models", type=int, default=1, help="Models the simulated Ollama keeps loaded")
+    args = parser.parse_args()
+
+    server = StubLLMServer(args.host, args.port, args.profile, args.cassette, args.ttfb,
+                           args.tokens_per_sec, args.jitter, args.error_rate, args.strict, args.seed,
+                           args.model_load_seconds, args.max_loaded_models)
+    if server.player is not None:
+        print(f"Loaded {len(server.player)} recorded responses from {args.cassette}")
+    print(f"Stub LLM server ({args.profile}) on {server.base_url}")
+    print(f"  Ollama:  {server.ollama_url}")
+    print(f"  Mistral: {server.mistral_url}")
+    server.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print(f"\nStopping. Stats: {server.stats}")
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,12 @@
 import uvicorn #type: ignore
 from fastapi.middleware.cors import CORSMiddleware #type: ignore
 from fastapi import FastAPI, Request, HTTPException, status#type: ignore
-from fastapi.responses import JSONResponse #type: ignore
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse #type: ignore
+import json
 from web.intsys.backend.src.LLM_model import AIAnalyst
 from web.intsys.backend.src.config import Configuration
+from utils.ai_core.llm_service import close_http_sessions, close_async_http_clients
+from utils.ai_core.llm_metrics import get_llm_metrics
 
 app = FastAPI()
 app.add_middleware(
@@ -19,6 +22,8 @@ config = Configuration()
 @app.on_event("shutdown")
 async def shutdown_event():
     config.shutdown()
+    close_http_sessions()
+    await close_async_http_clients()
 # ----------------------Route---------------------- 
 
 ai_analyst = None
@@ -43,9 +48,50 @@ async def ChatPrompt(request: Request):
         raise HTTPException(status_code=400, detail="Missing query")
     
     user_query = data['query']
-    final_answer = ai_analyst.web_start_ai_analyst(user_query=user_query)
+    session_id = data.get('session_id', 'web_user_01')
+    # Awaiting the async pipeline keeps the event loop free for other chats. The response
+    # lists any optional stages cut to stay within the endpoint's latency budget.
+    final_answer = await ai_analyst.web_start_ai_analyst_async(user_query=user_query, session_id=session_id,
+                                                             endpoint="chatprompt")
     return JSONResponse({"response": final_answer}, status_code=201)
 
+@app.post("/chatprompt/stream")
+async def ChatPromptStream(request: Request):
+    global ai_analyst
+    if ai_analyst is None:
+        raise HTTPException(status_code=400, detail="AI Analyst not configured. Call /ai_config first")
+    
+    data = await request.json()
+    if not data or 'query' not in data:
+        raise HTTPException(status_code=400, detail="Missing query")
+    
+    user_query = data['query']
+    session_id = data.get('session_id', 'web_user_01')
+
+    async def event_stream():
+        # Server-Sent Events: one "token" event per synthesizer token, then a final "done" event.
+        async for event in ai_analyst.web_stream_ai_analyst_async(user_query=user_query, session_id=session_id,
+                                                                  endpoint="chatprompt_stream"):
+            yield f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/llm_stats")
+async def LLMStats():
+    global ai_analyst
+    if ai_analyst is None:
+        raise HTTPException(status_code=400, detail="AI Analyst not configured. Call /ai_config first")
+    return JSONResponse(ai_analyst.get_llm_stats(), status_code=200)
+
+@app.get("/llm_metrics")
+async def LLMMetrics(format: str = "json"):
+    # Per-call latency/throughput histograms; ?format=prometheus for a scrape target.
+    metrics = get_llm_metrics()
+    if format == "prometheus":
+        return PlainTextResponse(metrics.export_prometheus(), media_type="text/plain; version=0.0.4")
+    return JSONResponse({**metrics.snapshot(), "slowest_phase_p95": metrics.slowest_phase("p95")}, status_code=200)
+
 # ----------------------Route----------------------
 
 if __name__ == "__main__":
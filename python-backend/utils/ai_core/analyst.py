@@ -18,16 +18,41 @@ from collections import defaultdict
 from datetime import datetime, timezone, timedelta
 import uuid
 import hashlib
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 # Third-party imports
 from pymongo import MongoClient
+from pymongo.errors import ExecutionTimeout
 
 # Local (ai_core) imports
 from .policy_engine import PolicyEngine 
-from .database import MongoCollectionAdapter
+from .background import CoalescingTaskQueue
+from .database import DEFAULT_EXCLUDED_FIELDS, MongoCollectionAdapter, field_scope, name_tokens, union_query
+from .index_manager import IndexManager, required_filter_fields
+from .deadline import Deadline, current_deadline, deadline_scope
 from .llm_service import LLMService
+from .llm_cache import LLMResponseCache
+from .llm_metrics import get_llm_metrics
+from .llm_router import LLMRouter
+from .intent_classifier import IntentClassifier
+from .plan_cache import PlanCache
+from .rule_router import RuleRouter
+from .stages import Stage, run_stages
+from .synth_context import build_synth_context, dumps_compact
+from .plan_executor import PlanRun, run_plan
+from .plan_schema import PLANNER_PSEUDO_TOOLS, build_plan_schema, extract_json_object, parse_plan
 from .prompts import PROMPT_TEMPLATES
 from .training import TrainingSystem
+from .turn_state import current_turn, turn_scope
+
+# Fields get_student_grades reads: the name fields resolve_person_entity matches on, plus the grades.
+GRADE_TOOL_FIELDS = ["student_name", "surname", "first_name", "adviser", "staff_name",
+                     "total_subjects", "grades", "semester", "school_year"]
+
+# structured_context keys the turn owns; a background summary never overwrites them.
+TURN_CONTEXT_KEYS = ("clarification_pending", "original_ambiguous_query")
 
 
 
@@ -79,7 +104,18 @@ class AIAnalyst:
             print(f"❌ Failed to connect to MongoDB: {e}")
             raise
             
-        self.collections = {name: MongoCollectionAdapter(self.mongo_db[name]) for name in collections}
+        # Media fields never leave MongoDB; tools listed in tool_fields fetch only those fields.
+        projection_cfg = llm_config.get("query_projection", {})
+        excluded_fields = projection_cfg.get("excluded_fields", DEFAULT_EXCLUDED_FIELDS)
+        self.tool_fields = {"get_student_grades": GRADE_TOOL_FIELDS, **projection_cfg.get("tool_fields", {})}
+        self.collections = {name: MongoCollectionAdapter(self.mongo_db[name], excluded_fields=excluded_fields)
+                            for name in collections}
+        # search_database queries the matching collections concurrently; they share the client's connection pool.
+        fanout_cfg = llm_config.get("search_fanout", {})
+        # "parallel": one query per collection on the pool; "union": one $unionWith aggregation per search.
+        self.search_strategy = fanout_cfg.get("strategy", "parallel")
+        self._search_executor = ThreadPoolExecutor(max_workers=fanout_cfg.get("max_workers", 8),
+                                                   thread_name_prefix="search-fanout")
         print(f"📚 AI Analyst is now using MongoDB collections: {list(self.collections.keys())}")
         # --- END OF MONGODB MODIFICATIONS ---
 
@@ -109,24 +145,56 @@ class AIAnalyst:
         online_cfg['api_mode'] = 'online'
         offline_cfg['api_mode'] = 'offline'
 
+        # Opt-in LLM response cache shared by the planner and synthesizer services.
+        cache_cfg = config.get('llm_cache', {})
+        self.llm_cache = LLMResponseCache(cache_cfg, mongo_db=self.mongo_db) if cache_cfg.get('enabled') else None
+
+        # Per-call LLM metrics are collected process-wide; this only sets the window and export file.
+        metrics_cfg = config.get('metrics', {})
+        get_llm_metrics().configure(window_seconds=metrics_cfg.get('window_seconds'),
+                                    log_path=metrics_cfg.get('log_path'))
+
         if execution_mode == 'online':
             print("AI Analyst running in FULLY ONLINE mode.")
-            self.planner_llm = LLMService(online_cfg)
-            self.synth_llm = LLMService(online_cfg)
+            self.planner_llm = LLMService(online_cfg, cache=self.llm_cache)
+            self.synth_llm = LLMService(online_cfg, cache=self.llm_cache)
             self.debug_mode = online_cfg.get("debug_mode", False)
         elif execution_mode == 'offline':
             print("AI Analyst running in FULLY OFFLINE mode.")
-            self.planner_llm = LLMService(offline_cfg)
-            self.synth_llm = LLMService(offline_cfg)
+            self.planner_llm = LLMService(offline_cfg, cache=self.llm_cache)
+            self.synth_llm = LLMService(offline_cfg, cache=self.llm_cache)
             self.debug_mode = offline_cfg.get("debug_mode", False)
         else:
             print("AI Analyst running in SPLIT mode (Offline Planner, Online Synthesizer).")
-            self.planner_llm = LLMService(offline_cfg)
-            self.synth_llm = LLMService(online_cfg)
+            self.planner_llm = LLMService(offline_cfg, cache=self.llm_cache)
+            self.synth_llm = LLMService(online_cfg, cache=self.llm_cache)
             self.debug_mode = offline_cfg.get("debug_mode", False)
 
+        # Opt-in routing: hedge and fail over to the other backend (Ollama <-> Mistral).
+        routing_cfg = config.get('llm_routing', {})
+        if routing_cfg.get('enabled'):
+            backup_planner_cfg = online_cfg if self.planner_llm.api_mode == 'offline' else offline_cfg
+            backup_synth_cfg = online_cfg if self.synth_llm.api_mode == 'offline' else offline_cfg
+            self.planner_llm = LLMRouter([self.planner_llm, LLMService(backup_planner_cfg, cache=self.llm_cache)], routing_cfg)
+            self.synth_llm = LLMRouter([self.synth_llm, LLMService(backup_synth_cfg, cache=self.llm_cache)], routing_cfg)
+            print(f"LLM routing enabled: hedging after {routing_cfg.get('hedge_delay', 4.0)}s, automatic failover.")
+
+        # Load the local model in the background so the first offline query doesn't pay for it.
+        if offline_cfg.get('residency', {}).get('warm_on_start') and self.planner_llm.api_mode == 'offline':
+            threading.Thread(target=self.planner_llm.warm_models, name="ollama-warmup", daemon=True).start()
+
         self.db_schema_summary = "Schema not generated yet."
         self.REVERSE_SCHEMA_MAP = self._create_reverse_schema_map()
+
+        # Indexes for the fields the tools filter on, built in the background (utils/manage_indexes.py reports them).
+        index_cfg = config.get('index_manager', {})
+        self.index_manager = None
+        if index_cfg.get('enabled'):
+            self.index_manager = IndexManager(self.mongo_db, list(self.collections),
+                                              fields=required_filter_fields(self.REVERSE_SCHEMA_MAP),
+                                              sample_size=index_cfg.get('sample_size', 50),
+                                              debug_mode=self.debug_mode)
+            self.index_manager.ensure_in_background()
         self._generate_db_schema()
         
         self.debug("Pre-loading dynamic filter values from database...")
@@ -146,9 +214,61 @@ class AIAnalyst:
         # Ensure a text index exists for efficient searching. This command is idempotent and safe to run on startup.
         self.dynamic_examples_collection.create_index([("user_pattern", "text")], name="query_text_index")  
 
+        # Workers for the concurrent pre-planner stages (see _plan_turn) and fire-and-forget writes.
+        pre_planner_cfg = config.get('pre_planner', {})
+        self.stage_timeouts = {"intent": 2.0, "examples": 1.5, **pre_planner_cfg.get('stage_timeouts', {})}
+        self._stage_executor = ThreadPoolExecutor(max_workers=pre_planner_cfg.get('max_workers', 8),
+                                                  thread_name_prefix="pre-planner")
+
+        # End-to-end latency budget per web endpoint. Optional stages are cut when less than
+        # their minimum is left, so the planner and synthesizer keep the time they need.
+        deadline_cfg = config.get('request_deadlines', {})
+        self.endpoint_deadlines = {"chatprompt": 90.0, "chatprompt_stream": 120.0, **deadline_cfg.get('endpoints', {})}
+        self.default_deadline = deadline_cfg.get('default_seconds')  # Other entry points (CLI) have no deadline
+        self.stage_min_remaining = {"dynamic_examples": 20.0, "fallback_search": 15.0,
+                                    **deadline_cfg.get('min_remaining_seconds', {})}
+
+        # Documents for the synthesizer are ranked and compacted to fit this budget (see synth_context.py).
+        synth_context_cfg = config.get('synth_context', {})
+        self.synth_context_tokens = synth_context_cfg.get('max_tokens', 3000)
+        self.synth_context_max_docs = synth_context_cfg.get('max_documents', 30)
+
+        # Structured-context summaries run after the answer has been returned, one job per
+        # session at a time; the next turn only waits briefly for one that is still running.
+        summarizer_cfg = chat_cfg.get('summarizer', {})
+        # One lock per session guards its chat_history and structured_context against the summarizer.
+        self._session_locks: Dict[str, threading.RLock] = {}
+        self.summary_wait_seconds = summarizer_cfg.get('max_wait_seconds', 2.0)
+        self.summary_queue = None
+        if summarizer_cfg.get('background', True):
+            self.summary_queue = CoalescingTaskQueue(self._summarize_conversation,
+                                                     workers=summarizer_cfg.get('workers', 2),
+                                                     name="summarizer", debug_mode=self.debug_mode)
+
+        # Tier-0 rule router: deterministic tool calls for unambiguous queries (config/routing_rules.json).
+        router_cfg = config.get('rule_router', {})
+        self.rule_router = None
+        if router_cfg.get('enabled'):
+            self.rule_router = RuleRouter(
+                router_cfg.get('rules_path', 'config/routing_rules.json'),
+                vocabularies={"program": self.all_programs, "department": self.all_departments,
+                              "position": self.all_positions},
+                reload_interval_seconds=router_cfg.get('reload_interval_seconds', 2.0),
+                debug_mode=self.debug_mode
+            )
+
+        # Plan templates of earlier successful turns, served directly for matching queries.
+        plan_cache_cfg = config.get('plan_cache', {})
+        self.plan_cache = None
+        if plan_cache_cfg.get('enabled'):
+            self.plan_cache = PlanCache(self.policy_engine, plan_cache_cfg, debug_mode=self.debug_mode)
+            seeded = self.plan_cache.seed(self.dynamic_examples_collection.find(
+                {}, {"user_pattern": 1, "plan_template": 1, "quality_label": 1}
+            ))
+            self.debug(f"Plan template cache seeded with {seeded} templates.")
+
         self.last_referenced_person = None
         self.last_referenced_aliases = []
-        self.corruption_warnings = set() 
 
         self.available_tools = {
             "answer_conversational_query": self.answer_conversational_query,
@@ -168,6 +288,32 @@ class AIAnalyst:
             "get_student_grades": self.get_student_grades,
             "query_curriculum": self.query_curriculum,
         }
+        # The planner's replies are decoded against this schema, built from the tool signatures:
+        # one tool call, or a multi-step plan whose independent steps run concurrently.
+        plan_cfg = config.get('plan_executor', {})
+        self.max_plan_steps = plan_cfg.get('max_steps', 5)
+        self.planner_tools = {**self.available_tools, **PLANNER_PSEUDO_TOOLS}
+        self.plan_step_tools = {name: tool for name, tool in self.available_tools.items()
+                                if name != "answer_conversational_query"}
+        self.planner_tool_schema = build_plan_schema(self.planner_tools, self.plan_step_tools, self.max_plan_steps)
+        self._plan_executor = ThreadPoolExecutor(max_workers=plan_cfg.get('max_workers', 4),
+                                                 thread_name_prefix="plan-step")
+
+        # Local intent classifier for example ranking; the LLM is only asked when it isn't confident.
+        intent_cfg = config.get('intent_classifier', {})
+        self.intent_classifier = None
+        if intent_cfg.get('enabled'):
+            self.intent_classifier = IntentClassifier(
+                self.available_tools,
+                confidence_threshold=intent_cfg.get('confidence_threshold', 0.6),
+                min_training_samples=intent_cfg.get('min_training_samples', 30),
+                retrain_after_samples=intent_cfg.get('retrain_after_samples', 50),
+                debug_mode=self.debug_mode
+            )
+            self.intent_classifier.start_background_training(
+                self._load_intent_training_samples,
+                interval_seconds=intent_cfg.get('retrain_interval_seconds', 1800)
+            )
 
 
     # In analyst.py, inside the AIAnalyst class
@@ -226,24 +372,25 @@ class AIAnalyst:
         # Get the current session object (from cache or DB)
         session = self._get_or_create_session(session_id)
         
-        # Append the new messages
-        session["chat_history"].append({"role": "user", "content": user_query})
-        session["chat_history"].append({"role": "assistant", "content": ai_response})
-        
-        # Trim the history list (sliding window)
-        history_limit = self.max_history_turns * 2
-        if history_limit > 0 and len(session["chat_history"]) > history_limit:
-            session["chat_history"] = session["chat_history"][-history_limit:]
+        with self._session_lock(session_id):
+            # Append the new messages
+            session["chat_history"].append({"role": "user", "content": user_query})
+            session["chat_history"].append({"role": "assistant", "content": ai_response})
 
-        # Update the timestamp
-        session["updated_at"] = datetime.now(timezone.utc)
+            # Trim the history list (sliding window)
+            history_limit = self.max_history_turns * 2
+            if history_limit > 0 and len(session["chat_history"]) > history_limit:
+                session["chat_history"] = session["chat_history"][-history_limit:]
 
-        # Save the entire updated session object to MongoDB
-        self.sessions_collection.update_one(
-            {"session_id": session_id},
-            {"$set": session},
-            upsert=True  # Creates the document if it doesn't exist
-        )
+            # Update the timestamp
+            session["updated_at"] = datetime.now(timezone.utc)
+
+            # Save the entire updated session object to MongoDB
+            self.sessions_collection.update_one(
+                {"session_id": session_id},
+                {"$set": session},
+                upsert=True  # Creates the document if it doesn't exist
+            )
         self.debug(f"Session {session_id} saved to MongoDB.")
 
 
@@ -257,13 +404,15 @@ class AIAnalyst:
         self.debug(f"Updating structured context for session: {session_id}")
         session = self._get_or_create_session(session_id)
         
-        if len(session["chat_history"]) < 2: return
+        with self._session_lock(session_id):
+            chat_history = list(session["chat_history"])
+        if len(chat_history) < 2: return
 
-        previous_context_str = json.dumps(session.get("structured_context", {}), indent=2)
+        previous_context_str = json.dumps(self._structured_context(session), indent=2)
         
         latest_exchange = "\n".join([
-            f"User: {session['chat_history'][-2]['content']}",
-            f"Assistant: {session['chat_history'][-1]['content']}"
+            f"User: {chat_history[-2]['content']}",
+            f"Assistant: {chat_history[-1]['content']}"
         ])
 
         prompt = PROMPT_TEMPLATES["conversation_summarizer"].format(
@@ -275,21 +424,26 @@ class AIAnalyst:
             system_prompt="You are a context analysis AI that only outputs valid JSON.",
             user_prompt=prompt,
             json_mode=True,
-            phase="planner"
+            phase="summarizer"
         )
 
         new_context = self._repair_json(response_str)
         if new_context and isinstance(new_context, dict):
-            session["structured_context"] = new_context
-            session["updated_at"] = datetime.now(timezone.utc)
-            self.sessions_collection.update_one(
-                {"session_id": session_id},
-                {"$set": {
-                    "structured_context": new_context,
-                    "updated_at": session["updated_at"]
-                }},
-                upsert=True
-            )
+            with self._session_lock(session_id):
+                # The turn may have run meanwhile; its own keys (a pending clarification) win.
+                current = session.get("structured_context", {})
+                new_context = {key: value for key, value in new_context.items() if key not in TURN_CONTEXT_KEYS}
+                new_context.update({key: current[key] for key in TURN_CONTEXT_KEYS if key in current})
+                session["structured_context"] = new_context
+                session["updated_at"] = datetime.now(timezone.utc)
+                self.sessions_collection.update_one(
+                    {"session_id": session_id},
+                    {"$set": {
+                        "structured_context": new_context,
+                        "updated_at": session["updated_at"]
+                    }},
+                    upsert=True
+                )
             self.debug(f"New structured context for {session_id}: {new_context}")
 
 
@@ -301,6 +455,51 @@ class AIAnalyst:
 
     # Add this new method anywhere inside the AIAnalyst class in AI.py
 
+    def _session_lock(self, session_id: str) -> threading.RLock:
+        return self._session_locks.setdefault(session_id, threading.RLock())
+
+    @staticmethod
+    def _note_entity(name: str):
+        """Records a person the current turn resolved, to be saved to the session afterwards."""
+        turn = current_turn()
+        if turn is not None:
+            turn.add_entity(name)
+
+    @staticmethod
+    def _note_corruption(collection_name: str):
+        """Records a collection whose index is corrupted, for the current turn's response."""
+        turn = current_turn()
+        if turn is not None:
+            turn.add_corruption_warning(collection_name)
+
+    def _structured_context(self, session: dict) -> dict:
+        """A copy of the session's structured context, safe to read while a summary is running."""
+        with self._session_lock(session["session_id"]):
+            return dict(session.get("structured_context", {}))
+
+    def _set_turn_context(self, session: dict, **values):
+        """Writes turn-owned keys (see TURN_CONTEXT_KEYS) into the session's current structured context."""
+        with self._session_lock(session["session_id"]):
+            session.setdefault("structured_context", {}).update(values)
+
+    def _schedule_summary(self, session_id: str):
+        """Queues a structured-context update for the session (or runs it inline if disabled)."""
+        if self.summary_queue is None:
+            self._summarize_conversation(session_id)
+        else:
+            self.summary_queue.submit(session_id)
+
+    def _await_pending_summary(self, session_id: str):
+        """Gives a summary of the previous turn that is still running a short bound to finish."""
+        if self.summary_queue is None or not self.summary_queue.pending(session_id):
+            return
+        timeout = self.summary_wait_seconds
+        deadline = current_deadline()
+        if deadline is not None:
+            timeout = deadline.clamp(timeout)
+        if not self.summary_queue.wait(session_id, timeout):
+            self.debug(f"Summary for {session_id} still running after {timeout:.1f}s; using the previous context.")
+
     def _add_entity_to_session(self, session_id: str, entity_name: str):
         """
         Adds a new entity to the session's memory and keeps the list trimmed.
@@ -426,9 +625,13 @@ class AIAnalyst:
         Tool: Compares the schedules of two people by retrieving schedule documents for both.
         """
         self.debug(f"Running tool: compare_schedules for '{person_a_name}' and '{person_b_name}'")
-        docs_a = self.get_person_schedule(person_name=person_a_name)
-        docs_b = self.get_person_schedule(person_name=person_b_name)
-        return docs_a + docs_b
+        # Both lookups are independent. They run on the stage pool, not the plan pool, because
+        # this tool may itself be running as a plan step.
+        run = run_plan([
+            {"tool_name": "get_person_schedule", "parameters": {"person_name": person_a_name}},
+            {"tool_name": "get_person_schedule", "parameters": {"person_name": person_b_name}},
+        ], lambda number, call, results: self.get_person_schedule(**call["parameters"]), self._stage_executor)
+        return (run.results.get(1) or []) + (run.results.get(2) or [])
     
 
     def request_clarification(self, question_for_user: str, missing_information: List[str]) -> List[dict]:
@@ -833,7 +1036,8 @@ class AIAnalyst:
         specific_answer = self.synth_llm.execute(
             system_prompt="You are a helpful assistant that answers specific questions based ONLY on the provided Factual Documents. Do not use any outside knowledge.",
             user_prompt=qa_user_prompt,
-            phase="synth"
+            phase="synth",
+            context_blocks=[context_for_qa]
         )
 
         # Step 5: Return the specific answer along with the source documents
@@ -1192,16 +1396,9 @@ class AIAnalyst:
         if not name1 or not name2:
             return False
         
-        def clean_name_to_set(name: str) -> set:
-            """Helper to clean a name string and return a set of its component words."""
-            # Remove common titles and suffixes
-            name = re.sub(r'\b(DR|PROF|MR|MS|MRS|JR|SR|I|II|III|IV)\b\.?', '', name.upper(), flags=re.IGNORECASE)
-            # Remove all punctuation
-            name = re.sub(r'[^\w\s]', '', name)
-            return set(part for part in name.strip().split() if part)
-
-        name1_parts = clean_name_to_set(name1)
-        name2_parts = clean_name_to_set(name2)
+        # Titles, suffixes and punctuation removed, the same way as the stored name_tokens.
+        name1_parts = set(name_tokens(name1))
+        name2_parts = set(name_tokens(name2))
         
         if not name1_parts or not name2_parts:
             return False
@@ -1278,7 +1475,7 @@ class AIAnalyst:
         final_primary_name = primary_name
         if matching_docs:
             final_primary_name = max([doc.get("metadata", {}).get("full_name", "") for doc in matching_docs], key=len)
-            self.current_query_entities.append(final_primary_name) # <-- ADD THIS LINE
+            self._note_entity(final_primary_name)
 
         self.debug(f"Entity resolved: Primary='{final_primary_name}', Aliases={list(resolved_aliases)}, Found {len(matching_docs)} docs.")
         
@@ -1348,7 +1545,7 @@ class AIAnalyst:
             final_greeting = self.synth_llm.execute(
                 system_prompt="You are a friendly and welcoming AI assistant for PDM.",
                 user_prompt=PROMPT_TEMPLATES["personalized_greeting_prompt"].format(context=context_for_greeting),
-                phase="synth"
+                phase="greeting"
             )
             return final_greeting
         
@@ -1356,11 +1553,37 @@ class AIAnalyst:
         else:
             return "Hello! Welcome to PDM. How can I assist you today?"
         
+    def get_llm_stats(self) -> dict:
+        """Returns monitoring counters for the LLM layer (response cache, retries, circuit breakers)."""
+        return {
+            "cache": self.llm_cache.get_stats() if self.llm_cache is not None else None,
+            "planner": self.planner_llm.get_health(),
+            "synth": self.synth_llm.get_health(),
+            "intent_classifier": self.intent_classifier.get_stats() if self.intent_classifier is not None else None,
+            "plan_cache": self.plan_cache.get_stats() if self.plan_cache is not None else None,
+            "rule_router": self.rule_router.get_stats() if self.rule_router is not None else None,
+            "summary_queue": self.summary_queue.get_stats() if self.summary_queue is not None else None,
+            "metrics": get_llm_metrics().snapshot()
+        }
+
     def debug(self, *args):
         """Prints messages only if the analyst is in debug mode."""
         if self.debug_mode:
             print(*args)
 
+    def _new_deadline(self, endpoint: str) -> Optional[Deadline]:
+        """Starts the latency budget configured for `endpoint`, or None if it has none."""
+        budget = self.endpoint_deadlines.get(endpoint, self.default_deadline)
+        return Deadline(budget, name=endpoint) if budget else None
+
+    def _stage_allowed(self, stage: str) -> bool:
+        """False (and the stage recorded as cut) when the current request can't afford an optional stage."""
+        deadline = current_deadline()
+        if deadline is None or deadline.allows(stage, self.stage_min_remaining.get(stage, 0.0)):
+            return True
+        self.debug(f"-> Deadline: skipping '{stage}' ({deadline.remaining():.1f}s left)")
+        return False
+
     # In analyst.py
     def _is_query_complete_nlp(self, query: str) -> bool:
         """
@@ -1410,43 +1633,112 @@ class AIAnalyst:
 
 # In backend/utils/ai_core/analyst.py
 
-    def _load_dynamic_examples(self, query: str) -> str:
-        """
-        [UPGRADED - PHASE 3 FINAL FIX] Finds, ranks, and correctly formats abstract
-        templates from MongoDB.
-        """
-        if not query:
-            return ""
-        
-        # --- Lightweight Pre-computation of Intent ---
+    def _load_intent_training_samples(self, limit: int = 5000) -> List[tuple]:
+        """
+        Collects (query, tool_name) pairs for the intent classifier: the labelled templates
+        in dynamic_examples and the plans of successful turns in the query log.
+        """
+        samples = []
+        for doc in self.dynamic_examples_collection.find({"intent": {"$type": "string"}},
+                                                         {"user_pattern": 1, "intent": 1}).limit(limit):
+            samples.append((doc.get("user_pattern"), doc["intent"]))
+        log_cursor = self.training_system.log_collection.find(
+            {"outcome": {"$regex": "^SUCCESS"}}, {"query": 1, "plan": 1}
+        ).sort("$natural", -1).limit(limit)
+        for doc in log_cursor:
+            steps = (doc.get("plan") or {}).get("plan") or [{}]
+            tool_name = (steps[0].get("tool_call") or {}).get("tool_name") if isinstance(steps[0], dict) else None
+            if tool_name:
+                samples.append((doc.get("query"), tool_name))
+        return samples
+
+    def _plan_without_llm(self, query: str, is_ambiguous: bool) -> tuple[Optional[dict], str]:
+        """
+        Returns (tool_call, source) for queries that can be planned without the planner LLM,
+        or (None, 'planner') when the planner has to run. Tier 0 is the deterministic rule
+        router (which also handles short queries such as a bare PDM ID), then the plan cache.
+        """
+        if self.rule_router is not None:
+            tool_call, rule_name = self.rule_router.route(query)
+            if tool_call is not None:
+                self.debug(f"-> Routed by rule '{rule_name}', skipping the planner: {tool_call}")
+                get_llm_metrics().count("planner", "skipped_rule")
+                return tool_call, "rule"
+        if is_ambiguous:
+            return None, "planner"
+        if self.plan_cache is not None:
+            tool_call = self.plan_cache.lookup(query)
+            if tool_call is not None:
+                self.debug(f"-> Plan template cache hit, skipping the planner: {tool_call}")
+                get_llm_metrics().count("planner", "skipped_cache")
+                return tool_call, "cache"
+        return None, "planner"
+
+    def _predict_intent(self, query: str) -> tuple[str, str]:
+        """
+        Predicts the tool the planner will choose, for example ranking. Returns (intent, source),
+        where source is 'classifier', or 'llm' when the local classifier isn't trained or confident.
+        """
+        if self.intent_classifier is not None:
+            intent, confidence = self.intent_classifier.predict(query)
+            if intent and self.intent_classifier.is_confident(confidence):
+                self.debug(f"Predicted intent for example retrieval: '{intent}' (classifier, p={confidence:.2f})")
+                return intent, "classifier"
+
         intent_prompt = f"Given the user query, which single tool is the most appropriate? Respond with only the tool name. Query: \"{query}\""
         system_prompt_for_intent = "You are an AI assistant that only responds with a single tool name from the following list: get_person_schedule, find_people, get_student_grades, answer_question_about_person, query_curriculum, get_person_profile, get_school_info, answer_conversational_query."
-        
+
         predicted_intent = self.planner_llm.execute(
             system_prompt=system_prompt_for_intent,
             user_prompt=intent_prompt,
-            phase="planner"
+            phase="intent"
         ).strip().replace("`", "").replace("\"", "")
-        self.debug(f"Predicted intent for example retrieval: '{predicted_intent}'")
+        self.debug(f"Predicted intent for example retrieval: '{predicted_intent}' (llm)")
+        return predicted_intent, "llm"
+
+    def _load_dynamic_examples(self, query: str, predicted_intent: Optional[str] = None) -> str:
+        """
+        [UPGRADED - PHASE 3 FINAL FIX] Finds, ranks, and correctly formats abstract
+        templates from MongoDB. Examples whose intent matches `predicted_intent` are boosted.
+        The planner path runs the two halves concurrently with intent prediction instead.
+        """
+        if not query:
+            return ""
 
+        if predicted_intent is None:
+            predicted_intent, _ = self._predict_intent(query)
+        return self._rank_dynamic_examples(self._find_example_candidates(query), predicted_intent)
+
+    def _find_example_candidates(self, query: str) -> List[dict]:
+        """The $text search half of example retrieval; needs no intent, so it can run alongside it."""
+        if not query:
+            return []
         try:
-            # --- Use a standard text search and then rank in Python ---
-            candidates = list(self.dynamic_examples_collection.find(
+            return list(self.dynamic_examples_collection.find(
                 {"$text": {"$search": query}},
                 {"score": {"$meta": "textScore"}}
             ).limit(20))
+        except Exception as e:
+            self.debug(f"⚠️ Dynamic example search failed: {e}")
+            return []
 
-            if not candidates:
-                self.debug("No relevant dynamic examples found via text search.")
-                return ""
+    def _rank_dynamic_examples(self, candidates: List[dict], predicted_intent: Optional[str]) -> str:
+        """
+        Ranks example candidates by text score, intent match and freshness, and formats the
+        top 3 for the planner prompt. Their last_used_at is bumped off the request path.
+        """
+        if not candidates:
+            self.debug("No relevant dynamic examples found via text search.")
+            return ""
 
+        try:
             ranked_candidates = []
             half_life_days = 30.0
             decay_rate = -0.693 / half_life_days
             now_aware = datetime.now(timezone.utc)
 
             for doc in candidates:
-                intent_boost = 1.5 if doc.get("intent") == predicted_intent else 1.0
+                intent_boost = 1.5 if predicted_intent and doc.get("intent") == predicted_intent else 1.0
                 last_used_aware = doc["last_used_at"].replace(tzinfo=timezone.utc)
                 days_old = (now_aware - last_used_aware).total_seconds() / (60 * 60 * 24)
                 freshness_score = math.exp(days_old * decay_rate)
@@ -1455,51 +1747,31 @@ class AIAnalyst:
 
             ranked_candidates.sort(key=lambda x: x["final_score"], reverse=True)
             examples_list = ranked_candidates[:3]
-            
-            retrieved_ids = [ex['_id'] for ex in examples_list]
-            if retrieved_ids:
-                self.dynamic_examples_collection.update_many(
-                    {"_id": {"$in": retrieved_ids}},
-                    {"$set": {"last_used_at": datetime.now(timezone.utc)}}
-                )
-
-            example_strings = []
-            for example in examples_list:
-                # --- FIX: Use the new field names "user_pattern" and "plan_template" ---
-                example_strings.append(
-                    f"EXAMPLE (from memory):\n"
-                    f"User Query: \"{example['user_pattern']}\"\n"
-                    f"Your JSON Response:\n"
-                    f"{json.dumps(example['plan_template'], indent=2, ensure_ascii=False)}"
-                )
-            
-            self.debug(f"Loaded {len(example_strings)} relevant examples from memory using smart ranking.")
-            return "\n---\n".join(example_strings)
-            
         except Exception as e:
-            self.debug(f"⚠️ Error during smart ranking: {e}. Falling back to simple text search.")
-            try:
-                examples_cursor = self.dynamic_examples_collection.find(
-                    { "$text": { "$search": query } },
-                    { "score": { "$meta": "textScore" } }
-                ).sort([("score", { "$meta": "textScore" })]).limit(3)
-                
-                examples_list = list(examples_cursor)
-                if not examples_list: return ""
-
-                example_strings = []
-                for example in examples_list:
-                    # --- FIX: Also use the new field names in the fallback logic ---
-                    example_strings.append(
-                        f"EXAMPLE (from memory):\n"
-                        f"User Query: \"{example['user_pattern']}\"\n"
-                        f"Your JSON Response:\n"
-                        f"{json.dumps(example['plan_template'], indent=2, ensure_ascii=False)}"
-                    )
-                return "\n---\n".join(example_strings)
-            except Exception as fallback_e:
-                self.debug(f"⚠️ Fallback search also failed: {fallback_e}")
-                return ""
+            self.debug(f"⚠️ Error during smart ranking: {e}. Falling back to text score order.")
+            examples_list = sorted(candidates, key=lambda x: x.get("score", 0), reverse=True)[:3]
+
+        retrieved_ids = [ex['_id'] for ex in examples_list if '_id' in ex]
+        if retrieved_ids:
+            # Freshness bookkeeping only; the planner doesn't need to wait for it.
+            self._stage_executor.submit(
+                self.dynamic_examples_collection.update_many,
+                {"_id": {"$in": retrieved_ids}},
+                {"$set": {"last_used_at": datetime.now(timezone.utc)}}
+            )
+
+        example_strings = []
+        for example in examples_list:
+            # --- FIX: Use the new field names "user_pattern" and "plan_template" ---
+            example_strings.append(
+                f"EXAMPLE (from memory):\n"
+                f"User Query: \"{example['user_pattern']}\"\n"
+                f"Your JSON Response:\n"
+                f"{json.dumps(example['plan_template'], indent=2, ensure_ascii=False)}"
+            )
+
+        self.debug(f"Loaded {len(example_strings)} relevant examples from memory using smart ranking.")
+        return "\n---\n".join(example_strings)
 
     
     # In backend/utils/ai_core/analyst.py
@@ -1571,15 +1843,11 @@ class AIAnalyst:
         """
         Extracts a valid JSON object from a string that may contain surrounding text or markdown.
         """
-        if not text: return None
-        m = re.search(r'\{.*\}', text, re.DOTALL)
-        if not m: return None
-        try:
-            return json.loads(m.group(0))
-        except json.JSONDecodeError:
-            return None
+        obj, _ = extract_json_object(text)
+        return obj
 
-    def _create_reverse_schema_map(self) -> dict:
+    @staticmethod
+    def _create_reverse_schema_map() -> dict:
         """
         Creates a mapping from common alternative field names (e.g., 'course', 'yr')
         to their standard equivalents (e.g., 'program', 'year_level').
@@ -2147,6 +2415,36 @@ class AIAnalyst:
         
         return " | ".join(reasons) if reasons else "General relevance match"
     
+    def _union_search(self, collections: Dict[str, MongoCollectionAdapter], query_texts: Optional[List[str]],
+                      n_results: int, where_clause: Optional[dict], document_filter: Optional[dict],
+                      deadline: Optional[Deadline]) -> Optional[List[dict]]:
+        """
+        search_database's collection queries as one $unionWith aggregation (search_fanout.strategy
+        "union"). Returns None if the aggregation fails, so the caller can fall back to the fan-out.
+        """
+        max_time_ms = deadline.max_time_ms() if deadline is not None else None
+        t0 = time.monotonic()
+        try:
+            results = union_query(collections, query_texts, n_results=n_results, where=where_clause,
+                                  where_document=document_filter, max_time_ms=max_time_ms)
+        except ExecutionTimeout:
+            self.debug(f"Union search hit the request deadline (maxTimeMS={max_time_ms}).")
+            if deadline is not None:
+                deadline.cut("search_database", "maxTimeMS exceeded in the union search")
+            return []
+        except Exception as e:
+            self.debug(f"Union search failed, falling back to per-collection queries: {e}")
+            return None
+        hits = []
+        for name, res in results.items():
+            docs = (res.get("documents") or [[]])[0]
+            metas = (res.get("metadatas") or [[]])[0]
+            hits.extend({"source_collection": name, "content": doc, "metadata": metas[i] if i < len(metas) else {}}
+                        for i, doc in enumerate(docs))
+        self.debug(f"search_database union: {len(collections)} collection(s) in one aggregation, "
+                   f"{time.monotonic() - t0:.3f}s")
+        return hits
+
     def search_database(self, query_text: Optional[str] = None, query: Optional[str] = None,
                     filters: Optional[dict] = None, document_filter: Optional[dict] = None,
                     collection_filter: Optional[str] = None, n_results: int = 200) -> List[dict]: # Add n_results=50 here
@@ -2256,25 +2554,51 @@ class AIAnalyst:
             try: self.debug("Final where_clause:", json.dumps(where_clause, ensure_ascii=False))
             except Exception: self.debug("Final where_clause (non-serializable):", where_clause)
 
-        for name, coll in self.collections.items():
-            if collection_filter and isinstance(collection_filter, str) and collection_filter not in name:
-                continue
+        deadline = current_deadline()
+        if deadline is not None and deadline.expired():
+            deadline.cut("search_database", "deadline exceeded before the search")
+            return all_hits
+
+        def query_collection(name: str, coll: MongoCollectionAdapter) -> List[dict]:
+            max_time_ms = deadline.max_time_ms() if deadline is not None else None
             try:
                 res = coll.query(
                     query_texts=final_query_texts, n_results=n_results,
-                    where=where_clause, where_document=document_filter
+                    where=where_clause, where_document=document_filter, max_time_ms=max_time_ms
                 )
-                docs = (res.get("documents") or [[]])[0]
-                metas = (res.get("metadatas") or [[]])[0]
-                for i, doc in enumerate(docs):
-                    all_hits.append({
-                        "source_collection": name, "content": doc,
-                        "metadata": metas[i] if i < len(metas) else {}
-                    })
+            except ExecutionTimeout:
+                self.debug(f"Query in {name} hit the request deadline (maxTimeMS={max_time_ms}).")
+                if deadline is not None:
+                    deadline.cut("search_database", f"maxTimeMS exceeded in '{name}'")
+                return []
             except Exception as e:
                 self.debug(f"Query error in {name}: {e}")
                 if "hnsw segment reader" in str(e):
-                    self.corruption_warnings.add(name)
+                    self._note_corruption(name)
+                return []
+            docs = (res.get("documents") or [[]])[0]
+            metas = (res.get("metadatas") or [[]])[0]
+            return [{"source_collection": name, "content": doc, "metadata": metas[i] if i < len(metas) else {}}
+                    for i, doc in enumerate(docs)]
+
+        matching = {name: coll for name, coll in self.collections.items()
+                    if not (collection_filter and isinstance(collection_filter, str) and collection_filter not in name)}
+        if self.search_strategy == "union" and len(matching) > 1:
+            union_hits = self._union_search(matching, final_query_texts, n_results, where_clause, document_filter, deadline)
+            if union_hits is not None:
+                return union_hits
+
+        # One query per matching collection, all in flight at once: the search takes as long as the
+        # slowest collection. Results are merged in collection order, so the output stays deterministic.
+        stages = {name: Stage(lambda name=name, coll=coll: query_collection(name, coll), default=[])
+                  for name, coll in matching.items()}
+        fanout = run_stages(stages, self._search_executor)
+        for name in stages:
+            all_hits.extend(fanout[name] or [])
+        if self.debug_mode and fanout.timings:
+            slowest = max(fanout.timings, key=fanout.timings.get)
+            self.debug(f"search_database fan-out: {len(stages)} collection(s), slowest '{slowest}' "
+                       f"({fanout.timings[slowest]:.3f}s), timings={fanout.timings}, skipped={fanout.skipped}")
 
         return all_hits
     
@@ -2359,14 +2683,50 @@ class AIAnalyst:
             elif tool_name not in self.available_tools and tool_name != "finish_plan":
                 return False, f"Step {step_num} uses an unknown tool: '{tool_name}'."
         
-        last_step = plan_list[-1]
-        if not (isinstance(last_step, dict) and last_step.get("tool_call", {}).get("tool_name") == "finish_plan"):
-            return False, "The plan must conclude with a 'finish_plan' step."
+        # 'finish_plan' is optional, but only allowed as the last step.
+        for i, step in enumerate(plan_list[:-1]):
+            if step.get("tool_call", {}).get("tool_name") == "finish_plan":
+                return False, f"Step {i + 1} is 'finish_plan', which may only be the last step."
 
         return True, None
 
 
 
+    @staticmethod
+    def _tool_result_failed(docs: Any) -> bool:
+        """True when a tool returned nothing, or an error/empty status document."""
+        if not docs:
+            return True
+        first = docs[0] if isinstance(docs, list) else docs
+        status = first.get("status", "") if isinstance(first, dict) else ""
+        return "error" in status or "empty" in status
+
+    def _run_plan_step(self, number: int, tool_call: dict, step_results: dict) -> Any:
+        """Resolves a step's placeholders against the finished steps and calls its tool."""
+        tool_name = tool_call["tool_name"]
+        tool_function = self.available_tools[tool_name]
+        params = self._resolve_placeholders(tool_call.get("parameters") or {}, step_results)
+        sig = inspect.signature(tool_function)
+        valid_params = {k: v for k, v in params.items() if k in sig.parameters}
+        self.debug(f"   -> Step {number}: {tool_name} with params: {valid_params}")
+        with field_scope(self.tool_fields.get(tool_name)):
+            return tool_function(**valid_params)
+
+    def _execute_plan(self, plan_json: dict) -> PlanRun:
+        """
+        Runs a multi-step plan as a dependency graph: steps referencing `$field_from_step_N`
+        wait for step N, every other step starts immediately. Returns the PlanRun.
+        """
+        steps = [step["tool_call"] for step in plan_json["plan"]
+                 if step["tool_call"].get("tool_name") != "finish_plan"]
+        plan_run = run_plan(steps, self._run_plan_step, self._plan_executor,
+                            is_usable=lambda result: not self._tool_result_failed(result))
+        self.debug(f"-> Plan of {len(steps)} steps finished in {plan_run.wall_time}s: {plan_run.timings}")
+        for step in plan_run.steps.values():
+            if step.error or step.skipped:
+                self.debug(f"   -> Step {step.number} ({step.tool_name}): {step.error or step.skipped}")
+        return plan_run
+
     # Add this new function anywhere inside your AIAnalyst class
 
     def _execute_smart_fallback_search(self, query: str) -> List[dict]:
@@ -2382,7 +2742,14 @@ class AIAnalyst:
         self.debug(f"   -> Fallback Strategy: {search_strategy['type']} | Threshold: {search_strategy['threshold']}")
 
         all_results = []
+        deadline = current_deadline()
         for name, collection_obj in self.collections.items():
+            max_time_ms = None
+            if deadline is not None:
+                if deadline.expired():
+                    deadline.cut("fallback_search", f"deadline exceeded before '{name}'")
+                    break
+                max_time_ms = deadline.max_time_ms()
             try:
                 where_clause = self.build_smart_filters(query_intent, name)
                 if where_clause and 'impossible_filter' in where_clause:
@@ -2391,7 +2758,8 @@ class AIAnalyst:
                 results = collection_obj.query(
                     query_texts=[query],
                     n_results=50, # Retrieve a large pool for re-ranking
-                    where=where_clause if where_clause else None
+                    where=where_clause if where_clause else None,
+                    max_time_ms=max_time_ms
                 )
 
                 # 2. Score and collect results that meet the dynamic threshold
@@ -2409,10 +2777,14 @@ class AIAnalyst:
                                 "metadata": metadata,
                                 "relevance": relevance_score # Keep the score for ranking
                             })
+            except ExecutionTimeout:
+                self.debug(f"   -> Smart search in {name} hit the request deadline.")
+                if deadline is not None:
+                    deadline.cut("fallback_search", f"maxTimeMS exceeded in '{name}'")
             except Exception as e:
                 self.debug(f"   -> Smart search error in {name}: {e}")
                 if "hnsw segment reader" in str(e):
-                    self.corruption_warnings.add(name)
+                    self._note_corruption(name)
         
         # 3. Rank all collected results by their smart score
         self.debug(f"   -> Re-ranking {len(all_results)} candidates from smart search.")
@@ -2420,15 +2792,67 @@ class AIAnalyst:
         
         return sorted_results
         
-    def execute_reasoning_plan(self, query: str, session: dict) -> tuple[str, Optional[dict], List[dict]]:
+    def execute_reasoning_plan(self, query: str, session: dict,
+                               deadline: Optional[Deadline] = None) -> tuple[str, Optional[dict], List[dict]]:
         """
         [MODIFIED FOR SESSIONS & SUMMARY] The main orchestration method.
+        Plans and runs the tools, synthesizes the answer, then records the turn.
+        With a `deadline`, every LLM call and Mongo query of the turn is bounded by it.
+        """
+        with deadline_scope(deadline or current_deadline()), turn_scope():
+            turn = self._plan_turn(query, session)
+            final_answer = turn["final_answer"]
+            if final_answer is None:
+                final_answer = self.synth_llm.execute(**turn["synth_request"])
+            return self._finish_turn(turn, session, final_answer)
+
+    async def execute_reasoning_plan_async(self, query: str, session: dict,
+                                           deadline: Optional[Deadline] = None) -> tuple[str, Optional[dict], List[dict]]:
+        """
+        Async variant of execute_reasoning_plan(). Planning and tool execution (blocking
+        Mongo + planner calls) run in a worker thread, while the synthesizer call, usually
+        the slowest of the turn, is awaited natively on the event loop.
+        """
+        # asyncio.to_thread copies the context, so the worker threads see the deadline and the
+        # turn's state too, while concurrent turns each keep their own.
+        with deadline_scope(deadline or current_deadline()), turn_scope():
+            turn = await asyncio.to_thread(self._plan_turn, query, session)
+            final_answer = turn["final_answer"]
+            if final_answer is None:
+                final_answer = await self.synth_llm.execute_async(**turn["synth_request"])
+            return await asyncio.to_thread(self._finish_turn, turn, session, final_answer)
+
+    def _finish_turn(self, turn: dict, session: dict, final_answer: str) -> tuple[str, Optional[dict], List[dict]]:
+        """
+        Records the completed turn in the query log and saves the entities it resolved
+        to the session. Returns the (final_answer, plan_json, collected_docs) triple.
+        """
+        if turn["log"] is not None:
+            execution_time = time.time() - turn["start_time"]
+            self.training_system.record_query_result(
+                execution_time=execution_time,
+                final_answer=final_answer,
+                **turn["log"]
+            )
+
+        # --- NEW BLOCK 2: Save newly found entities to the session ---
+        for entity_name in turn["entities"]:
+            self._add_entity_to_session(session['session_id'], entity_name)
+        # --- END NEW BLOCK 2 ---
+
+        return final_answer, turn["plan_json"], turn["collected_docs"]
+
+    def _plan_turn(self, query: str, session: dict) -> dict:
+        """
+        Runs everything up to (but not including) the final synthesizer call: clarification
+        handling, planning, tool execution and fallback search. Returns a 'turn' dict with
+        the synthesizer request, or a ready `final_answer` when no synthesis is needed.
         """
         self.debug("Starting reasoning plan execution...")
         start_time = time.time()
 # --- THIS IS THE CORRECTED CODE ---
 
-        context = session.get("structured_context", {})
+        context = self._structured_context(session)
         if context.get("clarification_pending"):
             self.debug("Clarification is pending. Processing user's answer...")
             
@@ -2443,24 +2867,20 @@ class AIAnalyst:
                 combined_query = f"{original_query} {query}"
                 
                 # IMPORTANT: Fully reset the state before re-running.
-                context["clarification_pending"] = False
-                context["original_ambiguous_query"] = ""
+                self._set_turn_context(session, clarification_pending=False, original_ambiguous_query="")
                 
-                return self.execute_reasoning_plan(combined_query, session)
+                return self._plan_turn(combined_query, session)
 
             # If it IS a new topic, just reset the state and proceed normally.
             self.debug("User changed the topic. Resetting state and processing new query.")
-            context["clarification_pending"] = False
-            context["original_ambiguous_query"] = ""
+            self._set_turn_context(session, clarification_pending=False, original_ambiguous_query="")
             # The function will now proceed below with a clean state.
         # --- END: CLARIFICATION STATE MACHINE (RESOLUTION LOGIC) ---
 
 
-        self.current_query_entities = []
-
-
-        # --- NEW BLOCK 1: Reset and perform pronoun resolution ---
-        self.current_query_entities = [] # Reset for this query
+        # --- NEW BLOCK 1: Perform pronoun resolution ---
+        # Entities and corruption warnings are collected in the TurnState that
+        # execute_reasoning_plan() starts for this query (see turn_state.py).
         
         pronouns = {'his', 'her', 'their', 'him', 'he', 'she'}
         query_words = set(query.lower().split())
@@ -2481,7 +2901,8 @@ class AIAnalyst:
                 self.debug(f"Modified query: '{query}'")
         # --- END NEW BLOCK 1 ---
         # --- NEW: Extract context from the full session object ---
-        chat_history = session.get("chat_history", [])
+        with self._session_lock(session["session_id"]):
+            chat_history = list(session.get("chat_history", []))
         summary = session.get("conversation_summary", "No summary yet.")
         # --- END NEW ---
 
@@ -2492,11 +2913,14 @@ class AIAnalyst:
         
         outcome = "FAIL_UNKNOWN"
         execution_mode = "primary"
+        plan_source = "planner"
         collected_docs = []
         
         try:
-            max_retries = 5
+            max_attempts = 2  # The first reply, plus one re-prompt carrying the parse error
             tool_call_json = None
+            plan_run = None
+            predicted_intent, intent_source = None, None
 
             # ADD THIS ENTIRE BLOCK before the 'for attempt...' loop
 
@@ -2515,75 +2939,136 @@ class AIAnalyst:
             if stripped_query and query_words[-1] in dangling_words:
                 is_ambiguous = True
 
-            if is_ambiguous:
-                self.debug("-> Ambiguity detected. Using the 'Grounded Ambiguity Resolver Prompt'.")
-                # Select the limited prompt and inject the DB schema to ground it
-                sys_prompt = PROMPT_TEMPLATES["ambiguity_resolver_prompt"].format(
-                    db_schema_summary=self.db_schema_summary
-                )
-                # The user_prompt is just the original query
-                planner_user_prompt = query
+            # Plans that don't need the planner LLM (routing rules, cached templates).
+            tool_call_json, plan_source = self._plan_without_llm(query, is_ambiguous)
+            if tool_call_json is not None:
+                plan_json = {"plan": [{"tool_call": tool_call_json}]}
             else:
-                self.debug("-> Query appears complete. Using the 'Full Planner Prompt'.")
-                # If the query is clear, build the full-featured prompt
-                dynamic_examples = self._load_dynamic_examples(query) 
-                structured_context_str = json.dumps(session.get("structured_context", {}), indent=2)
-                sys_prompt = PROMPT_TEMPLATES["planner_agent"].format(
-                    all_programs_list=self.all_programs,
-                    all_departments_list=self.all_departments,
-                    all_positions_list=self.all_positions,
-                    all_doc_types_list=self.all_doc_types,
-                    all_statuses_list=self.all_statuses,
-                    dynamic_examples=dynamic_examples,
-                    structured_context_str=structured_context_str
-                )
-                # The user_prompt is also just the original query
-                planner_user_prompt = query
-            # --- END OF DYNAMIC PROMPT SELECTOR ---
-            
-            for attempt in range(max_retries):
-                self.debug(f"Planner Attempt {attempt + 1}/{max_retries}...")
-                planner_user_prompt = query
-                
-                
-                
-
-                plan_raw = self.planner_llm.execute(
-                    system_prompt=sys_prompt,
-                    user_prompt=planner_user_prompt, # Use the new prompt
-                    json_mode=True, phase="planner",
-                    history=chat_history # Still pass short-term history
-                )
-        
-                tool_call_json = self._repair_json(plan_raw)
-                if tool_call_json and "tool_name" in tool_call_json:
-                    self.debug(f"Valid tool selected on attempt {attempt + 1}.")
-                    plan_json = {"plan": [{"tool_call": tool_call_json}]}
-                    break
+                if is_ambiguous:
+                    self.debug("-> Ambiguity detected. Using the 'Grounded Ambiguity Resolver Prompt'.")
+                    # Select the limited prompt and inject the DB schema to ground it
+                    sys_prompt = PROMPT_TEMPLATES["ambiguity_resolver_prompt"].format(
+                        db_schema_summary=self.db_schema_summary
+                    )
+                    # The user_prompt is just the original query
+                    planner_user_prompt = query
+                    planner_context_blocks = [self.db_schema_summary]
                 else:
-                    self.debug(f"Attempt {attempt + 1} failed to select a valid tool. Retrying...")
-                    time.sleep(1)
+                    self.debug("-> Query appears complete. Using the 'Full Planner Prompt'.")
+                    # If the query is clear, build the full-featured prompt
+                    # Independent pre-planner stages run concurrently; the optional ones are
+                    # dropped when they miss their timeout rather than holding up the planner.
+                    stages = {
+                        "context": Stage(lambda: json.dumps(self._structured_context(session), indent=2),
+                                         optional=False),
+                    }
+                    # The intent is only used to rank examples, so both go when the budget is low.
+                    if self._stage_allowed("dynamic_examples"):
+                        stages["intent"] = Stage(lambda: self._predict_intent(query),
+                                                 timeout=self.stage_timeouts.get("intent"), default=(None, None))
+                        stages["examples"] = Stage(lambda: self._find_example_candidates(query),
+                                                   timeout=self.stage_timeouts.get("examples"), default=[])
+                    stage_run = run_stages(stages, self._stage_executor)
+                    if stage_run.skipped:
+                        self.debug(f"-> Skipped pre-planner stages: {stage_run.skipped}")
+                    self.debug(f"-> Pre-planner stage timings: {stage_run.timings}")
+                    predicted_intent, intent_source = stage_run.values.get("intent", (None, None))
+                    dynamic_examples = self._rank_dynamic_examples(stage_run.values.get("examples", []),
+                                                                   predicted_intent)
+                    structured_context_str = stage_run["context"]
+                    sys_prompt = PROMPT_TEMPLATES["planner_agent"].format(
+                        all_programs_list=self.all_programs,
+                        all_departments_list=self.all_departments,
+                        all_positions_list=self.all_positions,
+                        all_doc_types_list=self.all_doc_types,
+                        all_statuses_list=self.all_statuses,
+                        dynamic_examples=dynamic_examples,
+                        structured_context_str=structured_context_str
+                    )
+                    # The user_prompt is also just the original query
+                    planner_user_prompt = query
+                    # Trimmed first-to-last if the prompt exceeds the planner's token budget
+                    planner_context_blocks = [dynamic_examples, structured_context_str]
+                # --- END OF DYNAMIC PROMPT SELECTOR ---
+
+                # Fail fast while the planner endpoint's circuit breaker is open.
+                if not self.planner_llm.is_available():
+                    outcome = "FAIL_PLANNER"
+                    raise ValueError("The AI planner service is temporarily unavailable. Please try again shortly.")
             
-            if not tool_call_json:
-                outcome = "FAIL_PLANNER"
-                raise ValueError(f"AI failed to select a valid tool after {max_retries} attempts.")
+                metrics = get_llm_metrics()
+                metrics.count("planner", "plans")
+                planner_history = list(chat_history or [])
+                parse_error = None
+                for attempt in range(max_attempts):
+                    self.debug(f"Planner Attempt {attempt + 1}/{max_attempts}...")
+
+                    plan_raw = self.planner_llm.execute(
+                        system_prompt=sys_prompt,
+                        user_prompt=planner_user_prompt,
+                        json_schema=self.planner_tool_schema, phase="planner",
+                        history=planner_history, # Still pass short-term history
+                        context_blocks=planner_context_blocks
+                    )
 
-            # 2. Execute the validated tool call
-            tool_name = tool_call_json["tool_name"]
-            params = tool_call_json.get("parameters", {})
+                    # LLMService already retried transport errors; re-asking won't help.
+                    if LLMService.is_error_response(plan_raw):
+                        self.debug(f"Planner call failed: {plan_raw}")
+                        break
+
+                    plan_json, parse_error = parse_plan(plan_raw, self.planner_tools, self.plan_step_tools,
+                                                        self.max_plan_steps)
+                    if plan_json and len(plan_json["plan"]) > 1:
+                        is_valid, parse_error = self._validate_plan(plan_json)
+                        if not is_valid:
+                            plan_json = None
+                    if plan_json:
+                        self.debug(f"Valid plan with {len(plan_json['plan'])} step(s) on attempt {attempt + 1}.")
+                        if len(plan_json["plan"]) == 1:
+                            tool_call_json = plan_json["plan"][0]["tool_call"]
+                        break
+
+                    self.debug(f"Attempt {attempt + 1} returned an unusable tool call: {parse_error}")
+                    if attempt + 1 < max_attempts:
+                        # Show the model its own reply and exactly what was wrong with it.
+                        metrics.count("planner", "reprompts")
+                        planner_history = planner_history + [
+                            {"role": "user", "content": planner_user_prompt},
+                            {"role": "assistant", "content": plan_raw or ""},
+                        ]
+                        planner_user_prompt = (f"Your previous reply could not be used: {parse_error}. "
+                                               f"Reply again with only the corrected JSON tool call for: {query}")
+
+                if tool_call_json and self.intent_classifier is not None:
+                    self.intent_classifier.record_outcome(predicted_intent, tool_call_json["tool_name"], intent_source)
+
+                if not plan_json:
+                    if parse_error:
+                        metrics.count("planner", "invalid_plans")
+                    outcome = "FAIL_PLANNER"
+                    raise ValueError(f"AI failed to select a valid tool after {max_attempts} attempts.")
+                if len(plan_json["plan"]) > 1:
+                    metrics.count("planner", "multi_step_plans")
+
+            # 2. Execute the validated tool call (tool_call_json is None for a multi-step plan)
+            tool_name = tool_call_json["tool_name"] if tool_call_json else "multi_step_plan"
+            params = tool_call_json.get("parameters", {}) if tool_call_json else {}
 
             # --- NEW: DEDICATED PATH FOR CONVERSATIONAL QUERIES ---
             if tool_name == "answer_conversational_query":
                 self.debug("-> Handling conversational query with a dedicated synth call.")
-                final_answer = self.synth_llm.execute(
-                    system_prompt="You are a friendly and helpful AI assistant for PDM. Respond naturally and conversationally to the user.",
-                    user_prompt=query,
-                    history=chat_history or [],
-                    phase="synth"
-                )
-                execution_time = time.time() - start_time
-                self.training_system.record_query_result(query=query, plan=plan_json, outcome="SUCCESS_CONVERSATIONAL", execution_time=execution_time, final_answer=final_answer, results_count=0)
-                return final_answer, plan_json, []
+                return {
+                    "query": query, "start_time": start_time, "plan_json": plan_json,
+                    "collected_docs": [], "entities": [], "final_answer": None,
+                    "synth_request": {
+                        "system_prompt": "You are a friendly and helpful AI assistant for PDM. Respond naturally and conversationally to the user.",
+                        "user_prompt": query,
+                        "history": chat_history or [],
+                        "phase": "synth"
+                    },
+                    "log": {"query": query, "plan": plan_json, "outcome": "SUCCESS_CONVERSATIONAL", "results_count": 0,
+                            "plan_source": plan_source}
+                }
             # --- END OF NEW PATH ---
 
 
@@ -2596,8 +3081,7 @@ class AIAnalyst:
                 self.debug("Plan requires clarification. Setting state and asking user.")
                 
                 # Set the "Post-it note" memory
-                context["clarification_pending"] = True
-                context["original_ambiguous_query"] = query
+                self._set_turn_context(session, clarification_pending=True, original_ambiguous_query=query)
                 
                 # Extract the question for the user from the plan
                 question_for_user = plan_json["plan"][0]["tool_call"]["parameters"]["question_for_user"]
@@ -2606,10 +3090,20 @@ class AIAnalyst:
                 self._update_session_history(session['session_id'], query, question_for_user)
 
                 # Return the question directly to the user
-                return question_for_user, plan_json, []
+                return {
+                    "query": query, "start_time": start_time, "plan_json": plan_json,
+                    "collected_docs": [], "entities": [], "final_answer": question_for_user,
+                    "synth_request": None, "log": None
+                }
                 
             
-            if tool_name in self.available_tools:
+            if tool_call_json is None:
+                plan_run = self._execute_plan(plan_json)
+                collected_docs = []
+                for number, step in sorted(plan_run.steps.items()):
+                    if step.usable:  # Leave out the "nothing found" notes of steps that came up empty
+                        collected_docs.extend(step.result if isinstance(step.result, list) else [step.result])
+            elif tool_name in self.available_tools:
                 tool_function = self.available_tools[tool_name]
 
                 # Filter out unexpected parameters to prevent errors
@@ -2621,19 +3115,20 @@ class AIAnalyst:
                     self.debug(f"Dropping unexpected parameters for {tool_name}: {dropped}")
 
                 self.debug(f"   -> Executing primary tool: {tool_name} with params: {valid_params}")
-                results = tool_function(**valid_params)
+                with field_scope(self.tool_fields.get(tool_name)):
+                    results = tool_function(**valid_params)
                 collected_docs = results if isinstance(results, list) else [results]
             else:
                 raise ValueError(f"AI selected an unknown tool: '{tool_name}'")
 
 
             # 3. Fallback Logic: If the primary tool fails, try a broad semantic search
-            primary_tool_failed = not collected_docs or "error" in collected_docs[0].get("status", "") or "empty" in collected_docs[0].get("status", "")
+            primary_tool_failed = self._tool_result_failed(collected_docs)
 
             if primary_tool_failed:
                 execution_mode = "fallback" # Update execution mode
                 self.debug(f"Primary tool '{tool_name}' failed or found nothing. Attempting fallback semantic search.")
-                fallback_docs = self._execute_smart_fallback_search(query)
+                fallback_docs = self._execute_smart_fallback_search(query) if self._stage_allowed("fallback_search") else []
                 if fallback_docs:
                     self.debug(f"Fallback search found {len(fallback_docs)} documents.")
                     summary_doc = {
@@ -2648,8 +3143,14 @@ class AIAnalyst:
                     outcome = "FAIL_EMPTY" # Update outcome
             else:
                 outcome = "SUCCESS_DIRECT" # Primary tool succeeded
-                if plan_json:
+                # Examples, the intent classifier and the template cache all describe single tool calls.
+                if tool_call_json:
                     self._save_dynamic_example(query, plan_json, session, outcome)
+                if tool_call_json and self.intent_classifier is not None:
+                    self.intent_classifier.learn(query, tool_name)
+
+            if self.plan_cache is not None:
+                self.plan_cache.record_outcome(query, tool_call_json, outcome, served=(plan_source == "cache"))
 
 
                 # --- ✨ TEMP FIX: De-duplicate results before sending to Synthesizer ---
@@ -2721,11 +3222,17 @@ class AIAnalyst:
             # 4. Build the final context for the synthesizer
             if outcome in ["SUCCESS_DIRECT", "SUCCESS_FALLBACK"]:
                 results_count = len(collected_docs)
+                context_docs, omitted = build_synth_context(collected_docs, query, self.synth_context_tokens,
+                                                            max_documents=self.synth_context_max_docs)
                 final_context = {
                     "status": "success",
                     "summary": f"Found {results_count} relevant document(s).",
-                    "data": collected_docs[:30] # Limit context size
+                    "data": context_docs
                 }
+                if omitted:
+                    final_context["summary"] += " Only the most relevant are shown; 'omitted' counts the rest."
+                    final_context["omitted"] = omitted
+                    self.debug(f"Synthesizer context: {len(context_docs)} document(s) kept, omitted: {omitted}")
             else:
                 final_context = {"status": "empty", "summary": "I tried a precise search and a broad search, but could not find any relevant documents."}
 
@@ -2746,66 +3253,82 @@ class AIAnalyst:
                 outcome = "FAIL_EXECUTION"
             final_context = {"status": "error", "summary": f"I ran into a technical problem: {e}"}
 
-        # 5. Synthesize the final answer
+        # 5. Prepare the final synthesizer request
         self.debug("Synthesizing final answer...")
-        context_for_llm = json.dumps(final_context, indent=2, ensure_ascii=False)
+        context_for_llm = dumps_compact(final_context)
         synth_prompt = PROMPT_TEMPLATES["final_synthesizer"].format(context=context_for_llm, query=query)
-        final_answer = self.synth_llm.execute(
-            system_prompt="You are a careful AI analyst who provides conversational answers based only on the provided facts.",
-            user_prompt=synth_prompt, 
-            history=chat_history or [],
-            phase="synth"
-        )
-
-        corruption_details = sorted(list(self.corruption_warnings)) if self.corruption_warnings else None
-
-        # Record the results for training using the fully corrected signature
-        execution_time = time.time() - start_time
-        self.training_system.record_query_result(
-            query=query,
-            plan=plan_json,
-            results_count=results_count,
-            execution_time=execution_time,
-            error_msg=error_msg,
-            execution_mode=execution_mode,
-            outcome=outcome,
-            analyst_mode=self.execution_mode,
-            final_answer=final_answer,
-            corruption_details=corruption_details
-        )
 
-        # --- NEW BLOCK 2: Save newly found entities to the session ---
-        if self.current_query_entities:
-            for entity_name in self.current_query_entities:
-                self._add_entity_to_session(session['session_id'], entity_name)
-        # --- END NEW BLOCK 2 ---
+        turn_state = current_turn()
+        corruption_details = (turn_state.corruption_warnings or None) if turn_state is not None else None
 
-
-        
-        return final_answer, plan_json, collected_docs
+        return {
+            "query": query, "start_time": start_time, "plan_json": plan_json,
+            "collected_docs": collected_docs, "entities": turn_state.entities if turn_state is not None else [],
+            "final_answer": None,
+            "synth_request": {
+                "system_prompt": "You are a careful AI analyst who provides conversational answers based only on the provided facts.",
+                "user_prompt": synth_prompt,
+                "history": chat_history or [],
+                "phase": "synth",
+                "context_blocks": [context_for_llm]
+            },
+            # Record the results for training using the fully corrected signature
+            "log": {
+                "query": query,
+                "plan": plan_json,
+                "results_count": results_count,
+                "error_msg": error_msg,
+                "execution_mode": execution_mode,
+                "outcome": outcome,
+                "analyst_mode": self.execution_mode,
+                "corruption_details": corruption_details,
+                "plan_source": plan_source,
+                "step_timings": plan_run.to_dict() if plan_run is not None else None
+            }
+        }
     
     # -------------------------------
 # Function use for Web
 # -------------------------------
-    def web_start_ai_analyst(self, user_query: str, session_id: str):
+    def web_start_ai_analyst(self, user_query: str, session_id: str, endpoint: str = "chatprompt"):
         """
-        [CORRECTED VERSION] Executes the AI plan for a specific user session.
+        [CORRECTED VERSION] Executes the AI plan for a specific user session, within the
+        latency budget configured for `endpoint`.
         """
         user_query = user_query.strip()
+        deadline = self._new_deadline(endpoint)
 
-        # 1. Get the specific session for this user (removes all old file logic)
-        session = self._get_or_create_session(session_id)
+        with deadline_scope(deadline):
+            # 1. Get the specific session for this user (removes all old file logic)
+            self._await_pending_summary(session_id)
+            session = self._get_or_create_session(session_id)
 
-        # 2. Execute the AI plan, passing the full session object
-        final_answer, plan_json, collected_docs = self.execute_reasoning_plan(user_query, session=session)
+            # 2. Execute the AI plan, passing the full session object
+            final_answer, plan_json, collected_docs = self.execute_reasoning_plan(user_query, session=session)
 
-        # 3. Update this session's history with the new exchange
-        self._update_session_history(session_id, user_query, final_answer)
+            # 3. Update this session's history with the new exchange
+            self._update_session_history(session_id, user_query, final_answer)
 
-        # 4. Trigger the conversation summarizer
-        self._summarize_conversation(session_id)
+            # 4. Update the structured context in the background; only the next turn needs it
+            self._schedule_summary(session_id)
 
         # 5. Perform data reconciliation for the UI (this logic remains the same)
+        synced_structured_data = self._sync_structured_data(collected_docs, final_answer)
+
+        # 6. Assemble and return the final response
+        final_response = {
+            "ai_response": final_answer,
+            "structured_data": synced_structured_data,
+            "cut_stages": deadline.cut_stages if deadline is not None else []
+        }
+
+        return final_response
+
+    def _sync_structured_data(self, collected_docs: List[dict], final_answer: str) -> List[dict]:
+        """
+        Reconciles the retrieved documents with the final answer for the UI: keeps only
+        people actually named in the answer, or the raw documents when none are.
+        """
         synced_structured_data = []
         if collected_docs and "system_summary" not in collected_docs[0].get("source_collection", ""):
             # ... (your existing reconciliation logic is correct and does not need to change)
@@ -2828,13 +3351,69 @@ class AIAnalyst:
         if not synced_structured_data:
             synced_structured_data = collected_docs
 
-        # 6. Assemble and return the final response
-        final_response = {
+        return synced_structured_data
+
+    async def web_start_ai_analyst_async(self, user_query: str, session_id: str, endpoint: str = "chatprompt"):
+        """
+        Async variant of web_start_ai_analyst() for the FastAPI path. The LLM synthesis is
+        awaited and the blocking session/Mongo work runs in worker threads, so one slow
+        chat no longer freezes the event loop for every other user.
+        """
+        user_query = user_query.strip()
+        deadline = self._new_deadline(endpoint)
+
+        with deadline_scope(deadline):
+            await asyncio.to_thread(self._await_pending_summary, session_id)
+            session = await asyncio.to_thread(self._get_or_create_session, session_id)
+
+            final_answer, plan_json, collected_docs = await self.execute_reasoning_plan_async(user_query, session=session)
+
+            await asyncio.to_thread(self._update_session_history, session_id, user_query, final_answer)
+            self._schedule_summary(session_id)
+
+        return {
             "ai_response": final_answer,
-            "structured_data": synced_structured_data
+            "structured_data": self._sync_structured_data(collected_docs, final_answer),
+            "cut_stages": deadline.cut_stages if deadline is not None else []
         }
+    
 
-        return final_response
+    async def web_stream_ai_analyst_async(self, user_query: str, session_id: str, endpoint: str = "chatprompt_stream"):
+        """
+        Streaming variant of web_start_ai_analyst_async(). Yields event dicts:
+        {"type": "token", "content": ...} for each synthesizer token as it arrives, then a
+        single {"type": "done", "ai_response": ..., "structured_data": ..., "cut_stages": ...}.
+        Session history and the query_log record are saved once the stream has completed, and
+        the summarizer is queued.
+        """
+        user_query = user_query.strip()
+        deadline = self._new_deadline(endpoint)
+
+        with deadline_scope(deadline), turn_scope():
+            await asyncio.to_thread(self._await_pending_summary, session_id)
+            session = await asyncio.to_thread(self._get_or_create_session, session_id)
+
+            turn = await asyncio.to_thread(self._plan_turn, user_query, session)
+            final_answer = turn["final_answer"]
+            if final_answer is None:
+                chunks = []
+                async for token in self.synth_llm.execute_stream_async(**turn["synth_request"]):
+                    chunks.append(token)
+                    yield {"type": "token", "content": token}
+                final_answer = "".join(chunks).strip()
+            else:
+                yield {"type": "token", "content": final_answer}
+
+            final_answer, plan_json, collected_docs = await asyncio.to_thread(self._finish_turn, turn, session, final_answer)
+            await asyncio.to_thread(self._update_session_history, session_id, user_query, final_answer)
+            self._schedule_summary(session_id)
+
+        yield {
+            "type": "done",
+            "ai_response": final_answer,
+            "structured_data": self._sync_structured_data(collected_docs, final_answer),
+            "cut_stages": deadline.cut_stages if deadline is not None else []
+        }
     
 
     # In analyst.py, replace the existing _create_image_map method with this
@@ -2966,7 +3545,7 @@ class AIAnalyst:
                     greeting_message = self.handle_user_recognized_event(event_data)
                     print("\nAnalyst:", greeting_message)
                     self._update_session_history(terminal_session_id, q, greeting_message)
-                    self._summarize_conversation(terminal_session_id)
+                    self._schedule_summary(terminal_session_id)
                     
                 else:
                     print("Analyst: Invalid event format.")
@@ -2980,6 +3559,16 @@ class AIAnalyst:
                 print("\n--- 📊 AI Performance Insights ---")
                 insights = self.training_system.get_training_insights()
                 print(insights)
+                if self.llm_cache is not None:
+                    print(f"LLM cache: {self.llm_cache.get_stats()}")
+                for phase, stats in get_llm_metrics().snapshot()["by_phase"].items():
+                    latency = stats["latency"]
+                    if latency.get("count"):
+                        print(f"LLM {phase:<10} calls={stats['calls']:<4} p50={latency['p50']}s p95={latency['p95']}s "
+                              f"errors={stats['errors']} retries={stats['retries']}")
+                    if "retry_rate" in stats:
+                        print(f"LLM {phase:<10} plans={stats['plans']} re-prompted={stats['retry_rate']:.1%} "
+                              f"invalid={stats.get('invalid_plans', 0)}")
                 print("---------------------------------\n")
                 continue
             # --- END OF NEW BLOCK ---
@@ -2989,13 +3578,14 @@ class AIAnalyst:
                 continue
 
             # --- FIX 1: Pass the entire 'session' object, not just its history ---
+            self._await_pending_summary(terminal_session_id)
             final_answer, plan_json, collected_docs = self.execute_reasoning_plan(q, session=session)
 
             # Update the session history in memory and MongoDB
             self._update_session_history(terminal_session_id, q, final_answer)
 
-            # --- FIX 2: Add the call to the summarizer ---
-            self._summarize_conversation(terminal_session_id)
+            # --- FIX 2: Add the call to the summarizer (runs in the background) ---
+            self._schedule_summary(terminal_session_id)
 
             print("\nAnalyst:", final_answer)
 
@@ -0,0 +1,107 @@
+# backend/utils/ai_core/background.py
+
+"""
+This module contains the CoalescingTaskQueue, a small worker pool for per-key
+background jobs whose result is only needed later, such as updating a
+session's structured context after a turn. Submitting a key that is already
+queued does nothing, because the job reads the latest state when it runs.
+Submitting a key whose job is running schedules exactly one re-run. Callers
+that need the result can wait for a key, with a bound.
+"""
+
+import queue
+import threading
+from typing import Callable, Dict, Hashable, Optional
+
+
+class _KeyState:
+    def __init__(self):
+        self.queued = True
+        self.running = False
+        self.rerun = False
+        self.done = threading.Event()
+
+
+class CoalescingTaskQueue:
+    """Runs `task(key)` on background threads, at most once at a time per key. Thread-safe."""
+
+    def __init__(self, task: Callable[[Hashable], None], workers: int = 2, name: str = "background",
+                 debug_mode: bool = False):
+        self.task = task
+        self.name = name
+        self.debug_mode = debug_mode
+        self._queue: "queue.Queue[Optional[Hashable]]" = queue.Queue()
+        self._states: Dict[Hashable, _KeyState] = {}
+        self._lock = threading.Lock()
+        self.stats = {"submitted": 0, "coalesced": 0, "completed": 0, "failed": 0,
+                      "waits": 0, "wait_timeouts": 0}
+        self._threads = [threading.Thread(target=self._worker, name=f"{name}-{i}", daemon=True)
+                         for i in range(max(1, workers))]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, key: Hashable):
+        """Schedules the task for `key`, merging it with a job that hasn't started yet."""
+        with self._lock:
+            self.stats["submitted"] += 1
+            state = self._states.get(key)
+            if state is None:
+                self._states[key] = _KeyState()
+                self._queue.put(key)
+            elif state.queued or state.rerun:
+                self.stats["coalesced"] += 1
+            else:
+                state.rerun = True  # Running on an older state: run once more afterwards
+
+    def pending(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._states
+
+    def wait(self, key: Hashable, timeout: Optional[float]) -> bool:
+        """Waits up to `timeout` seconds for the key's jobs to finish. True if none is left."""
+        with self._lock:
+            state = self._states.get(key)
+            if state is None:
+                return True
+            self.stats["waits"] += 1
+        finished = state.done.wait(timeout)
+        if not finished:
+            with self._lock:
+                self.stats["wait_timeouts"] += 1
+        return finished
+
+    def _worker(self):
+        while True:
+            key = self._queue.get()
+            if key is None:
+                return
+            with self._lock:
+                state = self._states[key]
+                state.queued, state.running = False, True
+            try:
+                self.task(key)
+                outcome = "completed"
+            except Exception as e:
+                outcome = "failed"
+                if self.debug_mode:
+                    print(f"{self.name}: task for '{key}' failed: {e}")
+            with self._lock:
+                self.stats[outcome] += 1
+                state.running = False
+                if state.rerun:
+                    state.rerun, state.queued = False, True
+                    self._queue.put(key)
+                else:
+                    del self._states[key]
+                    state.done.set()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {**self.stats, "pending": len(self._states), "queue_depth": self._queue.qsize()}
+
+    def shutdown(self, timeout: Optional[float] = None):
+        """Stops the workers after the jobs already queued."""
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
@@ -0,0 +1,92 @@
+# backend/utils/ai_core/cassette.py
+
+"""
+This module contains the record/replay "cassette" format shared by LLMService
+(record mode) and the stub LLM server in benchmarks/ (replay mode).
+
+A cassette is a JSONL file with one recorded request/response pair per line.
+Requests are matched on the messages actually sent and the JSON-mode flag,
+not on the model name, so a cassette recorded against Mistral can be replayed
+while the pipeline is configured for Ollama (and vice versa), as long as the
+same api_mode is used (Ollama's JSON mode appends an instruction to the prompt).
+"""
+
+import json
+import hashlib
+import threading
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+
+def cassette_key(messages: List[dict], json_mode: bool) -> str:
+    """Returns the SHA256 fingerprint used to match a request against recorded entries."""
+    canonical = json.dumps(
+        {"messages": [{"role": m.get("role"), "content": m.get("content")} for m in messages], "json_mode": json_mode},
+        sort_keys=True, ensure_ascii=False
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+_FILE_LOCKS: Dict[str, threading.Lock] = {}
+_FILE_LOCKS_LOCK = threading.Lock()
+
+
+class CassetteRecorder:
+    """Appends real request/response pairs to a cassette file. Safe to share between threads."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with _FILE_LOCKS_LOCK:
+            self._lock = _FILE_LOCKS.setdefault(path, threading.Lock())
+
+    def record(self, *, api_mode: str, model: str, phase: str, json_mode: bool,
+               messages: List[dict], response: str, latency_seconds: float):
+        entry = {
+            "key": cassette_key(messages, json_mode),
+            "api_mode": api_mode,
+            "model": model,
+            "phase": phase,
+            "json_mode": json_mode,
+            "messages": messages,
+            "response": response,
+            "latency_seconds": round(latency_seconds, 4),
+            "recorded_at": datetime.now(timezone.utc).isoformat(),
+        }
+        line = json.dumps(entry, ensure_ascii=False, default=str)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+class CassettePlayer:
+    """
+    Replays a cassette. When a request was recorded several times, the recorded
+    responses are returned in order and then cycle, so replays are deterministic.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[str, List[dict]] = {}
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                entry = json.loads(line)
+                self.entries.setdefault(entry["key"], []).append(entry)
+        self._positions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self.entries.values())
+
+    def lookup(self, messages: List[dict], json_mode: bool) -> Optional[dict]:
+        """Returns the next recorded entry for this request, or None if it was never recorded."""
+        key = cassette_key(messages, json_mode)
+        entries = self.entries.get(key)
+        if not entries:
+            return None
+        with self._lock:
+            position = self._positions.get(key, 0)
+            self._positions[key] = position + 1
+        return entries[position % len(entries)]
@@ -2,13 +2,70 @@
 
 """
 This module contains the MongoCollectionAdapter, which makes a MongoDB collection
-behave like a ChromaDB collection for the AI's query system.
+behave like a ChromaDB collection for the AI's query system. Queries are sent with
+a projection, so large media fields stay in MongoDB; a tool can narrow it further
+to the fields it uses with field_scope(). union_query() runs the same search over
+several collections as one $unionWith aggregation.
 """
 
+import contextvars
 import re
-from typing import Dict, List
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional
 from pymongo.collection import Collection
 
+# Base64 images/audio and face descriptors: hundreds of KB per student, never used by the AI.
+# name_tokens is only there to be queried.
+DEFAULT_EXCLUDED_FIELDS = ("image", "audio", "descriptor", "name_tokens")
+
+# _format_output builds 'content' from these when a document has none, so field lists always include them.
+CONTENT_FIELDS = ("content", "data_type", "full_name", "student_id", "course", "year", "section",
+                  "department", "gwa")
+
+# AI-facing filter names -> the field names used in the collections (see _translate_where_clause).
+FIELD_TRANSLATIONS = {"program": "course", "course": "course", "year_level": "year", "year": "year", "yr": "year"}
+
+# Added to each document of a union_query() so the results can be split per collection again.
+SOURCE_FIELD = "_source_collection"
+
+# Titles and suffixes left out of name comparisons (the same list AIAnalyst._fuzzy_name_match uses).
+_NAME_TITLES_RE = re.compile(r'\b(DR|PROF|MR|MS|MRS|JR|SR|I|II|III|IV)\b\.?', re.IGNORECASE)
+
+# Seconds before a collection without name_tokens is checked again (the backfill may have run since).
+NAME_TOKENS_RECHECK_SECONDS = 300
+
+_FIELDS: contextvars.ContextVar = contextvars.ContextVar("query_fields", default=None)
+
+
+def current_fields() -> Optional[List[str]]:
+    """The field list of the tool running in this context, if it declared one."""
+    return _FIELDS.get()
+
+
+def name_tokens(name: Optional[str]) -> List[str]:
+    """
+    The words of a name, upper-cased, without titles, suffixes or punctuation. Person
+    documents store these as `name_tokens` (see utils/backfill_name_tokens.py and the
+    express-backend ingest), so name lookups can use a multikey index.
+    """
+    if not name:
+        return []
+    # Hyphens separate words ("Santos-Reyes" is found by "Reyes"); other punctuation is dropped.
+    cleaned = re.sub(r'[^\w\s]', '', _NAME_TITLES_RE.sub('', str(name).upper()).replace('-', ' '))
+    return list(dict.fromkeys(part for part in cleaned.split() if part))
+
+
+@contextmanager
+def field_scope(fields: Optional[Iterable[str]]) -> Iterator[None]:
+    """Limits adapter queries in the block to `fields` (None keeps the default projection)."""
+    token = _FIELDS.set(list(fields) if fields else None)
+    try:
+        yield
+    finally:
+        _FIELDS.reset(token)
+
+
 class MongoCollectionAdapter:
     """
     Acts as an adapter to make a MongoDB collection behave like a ChromaDB collection for structured filtering.
@@ -16,13 +73,59 @@ class MongoCollectionAdapter:
     It receives the complex, Chroma-style `where` clause from the AI's `search_database` method
     and translates it into a native MongoDB query.
     """
-    def __init__(self, collection):
+    def __init__(self, collection, excluded_fields: Iterable[str] = DEFAULT_EXCLUDED_FIELDS):
         """
         Initializes the adapter with a pymongo collection object.
         Args:
             collection: An active pymongo.collection.Collection instance.
+            excluded_fields: Fields left out of every result unless a field list is given.
         """
         self.collection = collection
+        self.excluded_fields = tuple(excluded_fields)
+        self._has_name_tokens = False
+        self._name_tokens_checked_at = None
+
+    def uses_name_tokens(self) -> bool:
+        """
+        True once some person document in the collection carries `name_tokens`. Staying
+        True is safe: name_filter() still matches documents without the field by regex.
+        """
+        if self._has_name_tokens:
+            return True
+        now = time.monotonic()
+        if self._name_tokens_checked_at is None or now - self._name_tokens_checked_at >= NAME_TOKENS_RECHECK_SECONDS:
+            self._name_tokens_checked_at = now
+            self._has_name_tokens = self.collection.find_one({"name_tokens": {"$exists": True}}, {"_id": 1}) is not None
+        return self._has_name_tokens
+
+    def name_filter(self, search_text: str) -> Dict:
+        """
+        The filter for people whose name has every word of `search_text`, in any order.
+        Once the collection is tokenized, each word is a prefix match on the multikey
+        index; documents written without `name_tokens` (not backfilled yet, or from a
+        path that skips it) are matched with the regex instead, so none drop out.
+        """
+        # A regex that requires all words to be present, in any order, using positive
+        # lookaheads: `(?=.*word1)(?=.*word2)`
+        regex_pattern = "".join([f"(?=.*{re.escape(word)})" for word in search_text.split()])
+        name_regex = {"full_name": {"$regex": regex_pattern, "$options": "i"}}
+        tokens = name_tokens(search_text)
+        if not tokens or not self.uses_name_tokens():
+            return name_regex
+        return {"$or": [
+            {"name_tokens": {"$all": [re.compile(f"^{re.escape(token)}") for token in tokens]}},
+            {"name_tokens": {"$exists": False}, **name_regex},
+        ]}
+
+    def projection(self, fields: Optional[Iterable[str]] = None) -> Optional[Dict[str, int]]:
+        """
+        The projection for a query: only `fields` (plus the ones 'content' is built from)
+        when given, or the scope's field list, otherwise everything but the excluded fields.
+        """
+        fields = fields or current_fields()
+        if fields:
+            return {field: 1 for field in dict.fromkeys([*CONTENT_FIELDS, *fields])}
+        return {field: 0 for field in self.excluded_fields} or None
 
     def _format_output(self, documents: List[Dict]) -> Dict:
         """
@@ -111,12 +214,8 @@ class MongoCollectionAdapter:
                 continue
             
             # Translate field names from AI context to DB context
-            db_key = key
-            if key in ["program", "course"]:
-                db_key = "course"
-            elif key in ["year_level", "year", "yr"]:
-                db_key = "year"
-            # Add other translations here if needed, e.g., "full_name" -> "name"
+            # Add other translations to FIELD_TRANSLATIONS if needed, e.g., "full_name" -> "name"
+            db_key = FIELD_TRANSLATIONS.get(key, key)
             
             # Recursively translate nested values (e.g., inside an '$in' operator)
             mongo_clause[db_key] = self._translate_where_clause(value)
@@ -127,17 +226,31 @@ class MongoCollectionAdapter:
         """Mimics ChromaDB's .count() method."""
         return self.collection.count_documents({})
 
-    def get(self, where: Dict = None, limit: int = 100, **kwargs) -> Dict:
+    def get(self, where: Dict = None, limit: int = 100, max_time_ms: Optional[int] = None,
+            fields: Optional[List[str]] = None, **kwargs) -> Dict:
         """Mimics ChromaDB's .get() method."""
         filter_query = self._translate_where_clause(where) if where else {}
-        results = list(self.collection.find(filter_query).limit(limit))
-        return self._format_output(results)
+        cursor = self.collection.find(filter_query, self.projection(fields)).limit(limit)
+        if max_time_ms:
+            cursor = cursor.max_time_ms(max_time_ms)
+        return self._format_output(list(cursor))
 
-    def query(self, query_texts: List[str], n_results: int = 10, where: Dict = None, where_document: Dict = None) -> Dict:
+    def query(self, query_texts: List[str], n_results: int = 10, where: Dict = None, where_document: Dict = None,
+              max_time_ms: Optional[int] = None, fields: Optional[List[str]] = None) -> Dict:
         """
         [MODIFIED] A more robust version that handles multi-word name searches
         by splitting the query and searching for all words individually.
+        `max_time_ms` is passed to MongoDB, which aborts the query with ExecutionTimeout
+        once it has run that long. `fields` limits the returned fields (see projection()).
         """
+        filter_query = self.query_filter(query_texts, where, where_document)
+        cursor = self.collection.find(filter_query, self.projection(fields)).limit(n_results)
+        if max_time_ms:
+            cursor = cursor.max_time_ms(max_time_ms)
+        return self._format_output(list(cursor))
+
+    def query_filter(self, query_texts: Optional[List[str]], where: Dict = None, where_document: Dict = None) -> Dict:
+        """The MongoDB filter query() sends for these arguments."""
         filter_query = self._translate_where_clause(where) if where else {}
         search_text = None
 
@@ -146,19 +259,53 @@ class MongoCollectionAdapter:
         elif query_texts and query_texts != ["*"]:
             search_text = query_texts[0]
 
-        if search_text:
-            # --- THIS IS THE FIX ---
-            # Split the search query into individual words
-            words = search_text.split()
-            
-            if words:
-                # Build a regex that requires all words to be present, in any order.
-                # This uses positive lookaheads: `(?=.*word1)(?=.*word2)`
-                regex_pattern = "".join([f"(?=.*{re.escape(word)})" for word in words])
-                
-                # Apply this flexible regex to the 'full_name' field.
-                filter_query.setdefault("full_name", {"$regex": regex_pattern, "$options": "i"})
-            # --- END OF FIX ---
+        if search_text and search_text.split() and "full_name" not in filter_query:
+            name_query = self.name_filter(search_text)
+            if "$or" in name_query and "$or" in filter_query:
+                return {"$and": [filter_query, name_query]}
+            filter_query.update(name_query)
+        return filter_query
+
+    def search_pipeline(self, query_texts: Optional[List[str]], n_results: int = 10, where: Dict = None,
+                        where_document: Dict = None, fields: Optional[List[str]] = None) -> List[dict]:
+        """query() as aggregation stages, with each document tagged with the collection name."""
+        pipeline = [{"$match": self.query_filter(query_texts, where, where_document)}, {"$limit": n_results}]
+        projection = self.projection(fields)
+        if projection:
+            pipeline.append({"$project": projection})
+        pipeline.append({"$addFields": {SOURCE_FIELD: {"$literal": self.collection.name}}})
+        return pipeline
+
+
+def union_query(adapters: Dict[str, "MongoCollectionAdapter"], query_texts: Optional[List[str]], n_results: int = 10,
+                where: Dict = None, where_document: Dict = None, max_time_ms: Optional[int] = None,
+                fields: Optional[List[str]] = None) -> Dict[str, Dict]:
+    """
+    Runs query() against several collections of one database as a single aggregation:
+    the first collection's stages, then a $unionWith per other collection, each limited
+    to `n_results` on the server. One round-trip and one cursor instead of one per
+    collection, but the server runs the branches one after another.
+
+    Returns:
+        query()-style results per collection name, in the order of `adapters`.
+    """
+    if not adapters:
+        return {}
+    names = list(adapters)
+    first = adapters[names[0]]
+    if any(adapters[name].collection.database != first.collection.database for name in names[1:]):
+        raise ValueError("$unionWith only works across collections of the same database")
+
+    pipeline = first.search_pipeline(query_texts, n_results, where, where_document, fields)
+    for name in names[1:]:
+        adapter = adapters[name]
+        pipeline.append({"$unionWith": {
+            "coll": adapter.collection.name,
+            "pipeline": adapter.search_pipeline(query_texts, n_results, where, where_document, fields),
+        }})
+    options = {"maxTimeMS": max_time_ms} if max_time_ms else {}
 
-        results = list(self.collection.find(filter_query).limit(n_results))
-        return self._format_output(results)
+    by_collection_name: Dict[str, List[Dict]] = {adapters[name].collection.name: [] for name in names}
+    for doc in first.collection.aggregate(pipeline, **options):
+        by_collection_name[doc.pop(SOURCE_FIELD)].append(doc)
+    return {name: adapters[name]._format_output(by_collection_name[adapters[name].collection.name]) for name in names}
@@ -0,0 +1,98 @@
+# backend/utils/ai_core/deadline.py
+
+"""
+This module contains the per-request Deadline. A chat request starts one with its
+endpoint's latency budget, and everything below it (planner and synthesizer
+calls, tools, Mongo queries) reads the remaining budget from a context variable
+instead of using its own fixed timeout. Optional stages ask the deadline before
+they run and are cut when too little time is left; the cuts are reported back
+in the response.
+"""
+
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+
+_CURRENT: contextvars.ContextVar = contextvars.ContextVar("request_deadline", default=None)
+
+
+class Deadline:
+    """Thread-safe. A budget in seconds that starts counting when the object is created."""
+
+    def __init__(self, budget_seconds: float, name: str = "request"):
+        self.name = name
+        self.budget_seconds = float(budget_seconds)
+        self.started_at = time.monotonic()
+        self.expires_at = self.started_at + self.budget_seconds
+        self._cut: List[dict] = []
+        self._lock = threading.Lock()
+
+    def remaining(self) -> float:
+        """Seconds left, never negative."""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0.0
+
+    def clamp(self, timeout: Optional[float]) -> float:
+        """Caps a timeout (None meaning 'no limit') at the remaining budget."""
+        remaining = self.remaining()
+        return remaining if timeout is None else min(timeout, remaining)
+
+    def max_time_ms(self) -> int:
+        """The remaining budget as a Mongo maxTimeMS value (at least 1ms, since 0 means no limit)."""
+        return max(1, int(self.remaining() * 1000))
+
+    def within(self, budget_seconds: float, name: str) -> "Deadline":
+        """
+        A shorter deadline inside this one: it ends after `budget_seconds` or with this
+        deadline, whichever comes first. Its cuts are recorded on this deadline too.
+        """
+        inner = Deadline(min(budget_seconds, self.remaining()), name)
+        inner._cut, inner._lock = self._cut, self._lock
+        return inner
+
+    def cut(self, stage: str, reason: str):
+        """Records that a stage was skipped or cut short because of the deadline."""
+        with self._lock:
+            if any(entry["stage"] == stage for entry in self._cut):
+                return
+            self._cut.append({"stage": stage, "reason": reason,
+                              "remaining_seconds": round(self.remaining(), 3)})
+
+    def allows(self, stage: str, min_seconds: float) -> bool:
+        """True if at least `min_seconds` are left; otherwise records the stage as cut and returns False."""
+        remaining = self.remaining()
+        if remaining >= min_seconds:
+            return True
+        self.cut(stage, f"{remaining:.1f}s left, needs {min_seconds}s")
+        return False
+
+    @property
+    def cut_stages(self) -> List[dict]:
+        with self._lock:
+            return [dict(entry) for entry in self._cut]
+
+    def to_dict(self) -> dict:
+        return {"name": self.name, "budget_seconds": self.budget_seconds, "elapsed_seconds": round(self.elapsed(), 3),
+                "remaining_seconds": round(self.remaining(), 3), "cut_stages": self.cut_stages}
+
+
+def current_deadline() -> Optional[Deadline]:
+    """The deadline of the request being served in this context, if any."""
+    return _CURRENT.get()
+
+
+@contextmanager
+def deadline_scope(deadline: Optional[Deadline]) -> Iterator[Optional[Deadline]]:
+    """Makes `deadline` the current one for the block (and for threads started with a copy of the context)."""
+    token = _CURRENT.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _CURRENT.reset(token)
@@ -0,0 +1,129 @@
+# backend/utils/ai_core/index_manager.py
+
+"""
+This module contains the IndexManager, which keeps MongoDB indexes in line with
+the filters the analyst's tools send. The indexed fields come from the adapter's
+field translations and the schema aliases, and a collection only gets indexes
+on fields its documents actually have. Missing indexes are created (never
+dropped), so running it again, or against a live database, is safe; indexes
+that have not served a query since the server started are only reported.
+"""
+
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+from .database import FIELD_TRANSLATIONS
+
+# Fields the tools filter on (search_database filters, schedule/adviser lookups, get_school_info,
+# and name lookups, which use the multikey name_tokens index).
+FILTER_FIELDS = ("course", "year", "section", "student_id", "full_name", "adviser", "staff_name",
+                 "document_type", "department", "position", "name_tokens")
+
+# find_people and the grade/schedule tools filter a class by all three at once.
+COMPOUND_INDEXES = (("course", "year", "section"),)
+
+INDEX_PREFIX = "analyst_"
+
+IndexKey = Tuple[str, ...]
+
+
+def required_filter_fields(reverse_schema_map: Optional[Dict[str, str]] = None) -> List[str]:
+    """
+    The database field names the tools can filter on: FILTER_FIELDS plus every name in
+    the schema alias map, each translated the way MongoCollectionAdapter does.
+    """
+    names = list(FILTER_FIELDS)
+    for alias, standard in (reverse_schema_map or {}).items():
+        names.extend((alias, standard))
+    return list(dict.fromkeys(FIELD_TRANSLATIONS.get(name, name) for name in names))
+
+
+def index_name(key: IndexKey) -> str:
+    return INDEX_PREFIX + "_".join(key)
+
+
+class IndexManager:
+    """Derives, reports and creates the filter indexes of the analyst's collections."""
+
+    def __init__(self, db, collections: Iterable[str], fields: Optional[Iterable[str]] = None,
+                 sample_size: int = 50, debug_mode: bool = False):
+        self.db = db
+        self.collections = list(collections)
+        self.fields = list(fields) if fields else required_filter_fields()
+        self.sample_size = sample_size
+        self.debug_mode = debug_mode
+        self.last_result: Optional[dict] = None
+
+    def _present_fields(self, name: str) -> set:
+        """Filter fields found in a sample of the collection's documents."""
+        projection = {field: 1 for field in self.fields}
+        present = set()
+        for doc in self.db[name].find({}, projection).limit(self.sample_size):
+            present.update(field for field in self.fields if field in doc)
+        return present
+
+    def required_indexes(self, name: str) -> List[IndexKey]:
+        """
+        Single-field indexes on the filter fields the collection has, then the compound
+        indexes it has every field of. A field that leads a compound index is served by
+        it, so it gets no index of its own.
+        """
+        present = self._present_fields(name)
+        compound = [key for key in COMPOUND_INDEXES if all(field in present for field in key)]
+        leading = {key[0] for key in compound}
+        return [(field,) for field in self.fields if field in present and field not in leading] + compound
+
+    def existing_indexes(self, name: str) -> Dict[IndexKey, str]:
+        """Existing indexes by key fields. Direction and index type are ignored."""
+        return {tuple(info["key"].keys()): index for index, info in self.db[name].index_information().items()}
+
+    def index_usage(self, name: str) -> Optional[Dict[str, int]]:
+        """Operations served per index since the server started, or None if $indexStats is not allowed."""
+        try:
+            return {stat["name"]: stat["accesses"]["ops"] for stat in self.db[name].aggregate([{"$indexStats": {}}])}
+        except OperationFailure:
+            return None
+
+    def report(self) -> Dict[str, dict]:
+        """Per collection: present, missing and unused indexes (by name or key fields)."""
+        report = {}
+        for name in self.collections:
+            required = self.required_indexes(name)
+            existing = self.existing_indexes(name)
+            usage = self.index_usage(name)
+            report[name] = {
+                "present": [existing[key] for key in required if key in existing],
+                "missing": [list(key) for key in required if key not in existing],
+                "unused": sorted(index for index, ops in (usage or {}).items() if ops == 0 and index != "_id_"),
+            }
+            if usage is None:
+                report[name]["unused"] = None
+        return report
+
+    def ensure(self, dry_run: bool = False) -> Dict[str, List[str]]:
+        """Creates the missing indexes. Returns the index names created (or to create) per collection."""
+        created = {}
+        for name in self.collections:
+            try:
+                existing = self.existing_indexes(name)
+                for key in self.required_indexes(name):
+                    if key in existing:
+                        continue
+                    if not dry_run:
+                        self.db[name].create_index([(field, 1) for field in key], name=index_name(key))
+                    created.setdefault(name, []).append(index_name(key))
+                    if self.debug_mode:
+                        print(f"IndexManager: {'would create' if dry_run else 'created'} {index_name(key)} on '{name}'")
+            except PyMongoError as e:  # One bad collection (e.g. a view) shouldn't stop the rest
+                if self.debug_mode:
+                    print(f"IndexManager: could not index '{name}': {e}")
+        self.last_result = {"created": created, "dry_run": dry_run}
+        return created
+
+    def ensure_in_background(self) -> threading.Thread:
+        """Runs ensure() on a daemon thread so startup doesn't wait for index builds."""
+        thread = threading.Thread(target=self.ensure, name="index-manager", daemon=True)
+        thread.start()
+        return thread
@@ -0,0 +1,155 @@
+# backend/utils/ai_core/intent_classifier.py
+
+"""
+This module contains the IntentClassifier, an in-process TF-IDF + linear model
+that predicts which tool the planner will pick for a query. The analyst uses
+the prediction to rank dynamic examples, which used to cost an LLM round-trip
+per turn. It is trained from the intent labels in `dynamic_examples` and the
+successful plans in `query_log`, learns incrementally from new successful turns,
+retrains periodically in a background thread, and tracks how often its
+prediction matches the planner's final choice.
+"""
+
+import copy
+import threading
+import time
+from collections import deque
+from typing import Callable, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import SGDClassifier
+
+
+class IntentClassifier:
+    """
+    Thread-safe: predictions read a (vectorizer, model) pair that is never modified
+    once published. Retraining and incremental learning build a new pair and swap it in.
+    """
+
+    def __init__(self, labels: Iterable[str], confidence_threshold: float = 0.6, min_training_samples: int = 30,
+                 retrain_after_samples: int = 50, epochs: int = 10, accuracy_window: int = 500,
+                 debug_mode: bool = False):
+        self.labels = sorted(set(labels))
+        self.confidence_threshold = confidence_threshold
+        self.min_training_samples = min_training_samples
+        self.retrain_after_samples = retrain_after_samples
+        self.epochs = epochs
+        self.debug_mode = debug_mode
+
+        self._model: Optional[Tuple[TfidfVectorizer, SGDClassifier]] = None
+        self._lock = threading.Lock()
+        self._retrain = threading.Event()
+        self._new_samples = 0
+        self._outcomes = {"classifier": deque(maxlen=accuracy_window), "llm": deque(maxlen=accuracy_window)}
+        self.stats = {"predictions": 0, "confident": 0, "llm_fallbacks": 0, "incremental_updates": 0,
+                      "trainings": 0, "training_samples": 0, "trained_at": None}
+
+    @property
+    def trained(self) -> bool:
+        return self._model is not None
+
+    def fit(self, samples: List[Tuple[str, str]]) -> bool:
+        """
+        Trains a fresh model on (query, tool_name) pairs and swaps it in. Samples with
+        unknown labels are ignored. Returns False (keeping the old model) if there are
+        fewer than `min_training_samples` usable samples.
+        """
+        samples = [(q, label) for q, label in samples if q and label in self.labels]
+        if len(samples) < self.min_training_samples:
+            return False
+        queries = [q for q, _ in samples]
+        y = np.array([label for _, label in samples])
+
+        vectorizer = TfidfVectorizer(ngram_range=(1, 2), sublinear_tf=True, lowercase=True)
+        X = vectorizer.fit_transform(queries)
+        model = SGDClassifier(loss="log_loss", alpha=1e-4, random_state=0)
+        rng = np.random.default_rng(0)
+        # partial_fit with every label declared up front, so learn() can add labels not seen yet.
+        for _ in range(self.epochs):
+            order = rng.permutation(len(samples))
+            model.partial_fit(X[order], y[order], classes=self.labels)
+
+        with self._lock:
+            self._model = (vectorizer, model)
+            self._new_samples = 0
+            self.stats["trainings"] += 1
+            self.stats["training_samples"] = len(samples)
+            self.stats["trained_at"] = time.time()
+        if self.debug_mode:
+            print(f"IntentClassifier trained on {len(samples)} samples ({len(set(y))} intents).")
+        return True
+
+    def predict(self, query: str) -> Tuple[Optional[str], float]:
+        """Returns (tool_name, confidence), or (None, 0.0) before the first training."""
+        model = self._model
+        if model is None or not query:
+            return None, 0.0
+        vectorizer, classifier = model
+        proba = classifier.predict_proba(vectorizer.transform([query]))[0]
+        best = int(np.argmax(proba))
+        confidence = float(proba[best])
+        with self._lock:
+            self.stats["predictions"] += 1
+            if confidence >= self.confidence_threshold:
+                self.stats["confident"] += 1
+        return str(classifier.classes_[best]), confidence
+
+    def is_confident(self, confidence: float) -> bool:
+        return confidence >= self.confidence_threshold
+
+    def learn(self, query: str, label: str):
+        """Incremental update from a successful turn. Also schedules a full retrain every N samples."""
+        if label not in self.labels or not query:
+            return
+        with self._lock:
+            model = self._model
+            self._new_samples += 1
+            if self._new_samples >= self.retrain_after_samples:
+                self._retrain.set()
+            if model is None:
+                return
+            vectorizer, classifier = model
+            # Copy-on-write: predict() may be scoring with the published classifier right now.
+            # The vocabulary is fixed until the next retrain; unseen words are simply ignored.
+            classifier = copy.deepcopy(classifier)
+            classifier.partial_fit(vectorizer.transform([query]), [label])
+            self._model = (vectorizer, classifier)
+            self.stats["incremental_updates"] += 1
+
+    def record_outcome(self, predicted: Optional[str], actual: Optional[str], source: str):
+        """Compares a prediction ('classifier' or 'llm' source) with the planner's final tool choice."""
+        if not predicted or not actual or source not in self._outcomes:
+            return
+        with self._lock:
+            if source == "llm":
+                self.stats["llm_fallbacks"] += 1
+            self._outcomes[source].append(predicted == actual)
+        if self.debug_mode and predicted != actual:
+            print(f"IntentClassifier miss ({source}): predicted '{predicted}', planner chose '{actual}'")
+
+    def start_background_training(self, load_samples: Callable[[], List[Tuple[str, str]]],
+                                  interval_seconds: float = 1800.0) -> threading.Thread:
+        """Trains now and then every `interval_seconds`, or sooner once enough new samples were learned."""
+
+        def loop():
+            while True:
+                try:
+                    self.fit(load_samples())
+                except Exception as e:
+                    if self.debug_mode:
+                        print(f"IntentClassifier training failed: {e}")
+                self._retrain.wait(timeout=interval_seconds)
+                self._retrain.clear()
+
+        thread = threading.Thread(target=loop, name="intent-classifier-training", daemon=True)
+        thread.start()
+        return thread
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            accuracy = {source: round(sum(o) / len(o), 4) if o else None for source, o in self._outcomes.items()}
+            compared = {source: len(o) for source, o in self._outcomes.items()}
+            return {**self.stats, "trained": self._model is not None,
+                    "confidence_threshold": self.confidence_threshold,
+                    "accuracy": accuracy, "compared": compared}
@@ -0,0 +1,164 @@
+# backend/utils/ai_core/llm_cache.py
+
+"""
+This module contains the LLMResponseCache class, an opt-in, content-addressed
+cache for LLM responses with an in-process LRU tier and an optional shared
+MongoDB tier.
+"""
+
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone, timedelta
+from typing import Dict, List, Optional
+
+
+class LLMResponseCache:
+    """
+    Caches LLM responses keyed on a hash of (model, messages, json_mode, phase).
+
+    Tier 1 is an in-process LRU with a size limit and per-entry expiry.
+    Tier 2 (optional) is a MongoDB collection with a TTL index, so several
+    workers share hits. Each phase has its own TTL; a TTL of 0 disables caching
+    for that phase (the synthesizer is uncached by default).
+    """
+    DEFAULT_PHASE_TTLS = {
+        "planner": 600,        # Plans depend on the full prompt, which is part of the key
+        "intent": 86400,       # Tool-name predictions for example retrieval
+        "greeting": 3600,      # Personalized greetings for recognized users
+        "summarizer": 0,
+        "synth": 0,
+    }
+
+    def __init__(self, config: dict, mongo_db=None):
+        """
+        Initializes the cache from the 'llm_cache' config section.
+
+        Args:
+            config: Settings such as max_entries, ttl_seconds, phase_ttls and mongo_enabled.
+            mongo_db: An active pymongo Database, required only for the shared tier.
+        """
+        self.max_entries = config.get("max_entries", 512)
+        self.default_ttl = config.get("ttl_seconds", 0)
+        self.phase_ttls = dict(self.DEFAULT_PHASE_TTLS)
+        self.phase_ttls.update(config.get("phase_ttls", {}))
+
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "mongo_hits": 0, "stores": 0, "evictions": 0, "expired": 0}
+        self.phase_stats: Dict[str, Dict[str, int]] = {}
+
+        self.mongo_collection = None
+        if mongo_db is not None and config.get("mongo_enabled", False):
+            self.mongo_collection = mongo_db[config.get("mongo_collection", "llm_cache")]
+            # MongoDB removes documents once 'expires_at' has passed. Idempotent on startup.
+            self.mongo_collection.create_index("expires_at", expireAfterSeconds=0, name="llm_cache_ttl")
+
+    @staticmethod
+    def make_key(model: str, messages: List[dict], json_mode: bool, phase: str,
+                 json_schema: Optional[dict] = None) -> str:
+        """Returns the SHA256 fingerprint of a request's canonical JSON form, schema included."""
+        canonical = json.dumps(
+            {"model": model, "messages": messages, "json_mode": json_mode, "phase": phase, "json_schema": json_schema},
+            sort_keys=True, ensure_ascii=False
+        )
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def ttl_for(self, phase: str) -> int:
+        """Returns the TTL in seconds for a phase; 0 means the phase is not cached."""
+        return self.phase_ttls.get(phase, self.default_ttl)
+
+    def _count(self, phase: str, stat: str):
+        self.stats[stat] += 1
+        phase_counts = self.phase_stats.setdefault(phase, {"hits": 0, "misses": 0})
+        if stat in phase_counts:
+            phase_counts[stat] += 1
+
+    def get(self, key: str, phase: str) -> Optional[str]:
+        """Looks a response up in the LRU tier, then the Mongo tier. Returns None on a miss."""
+        if self.ttl_for(phase) <= 0:
+            return None
+
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._count(phase, "hits")
+                    return value
+                del self._entries[key]
+                self.stats["expired"] += 1
+
+        if self.mongo_collection is not None:
+            try:
+                doc = self.mongo_collection.find_one(
+                    {"_id": key, "expires_at": {"$gt": datetime.now(timezone.utc)}},
+                    {"response": 1, "expires_at": 1}
+                )
+            except Exception:
+                doc = None
+            if doc:
+                expires_at = doc["expires_at"].replace(tzinfo=timezone.utc).timestamp()
+                self._store_local(key, doc["response"], expires_at)
+                with self._lock:
+                    self.stats["mongo_hits"] += 1
+                    self._count(phase, "hits")
+                return doc["response"]
+
+        with self._lock:
+            self._count(phase, "misses")
+        return None
+
+    def set(self, key: str, phase: str, value: str):
+        """Stores a successful response in both tiers, honouring the phase TTL."""
+        ttl = self.ttl_for(phase)
+        if ttl <= 0:
+            return
+
+        self._store_local(key, value, time.time() + ttl)
+        with self._lock:
+            self.stats["stores"] += 1
+
+        if self.mongo_collection is not None:
+            try:
+                self.mongo_collection.update_one(
+                    {"_id": key},
+                    {"$set": {
+                        "response": value,
+                        "phase": phase,
+                        "expires_at": datetime.now(timezone.utc) + timedelta(seconds=ttl)
+                    }},
+                    upsert=True
+                )
+            except Exception:
+                pass  # The shared tier is best-effort; the local tier already has the entry.
+
+    def _store_local(self, key: str, value: str, expires_at: float):
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def clear(self):
+        """Empties the in-process tier (the shared tier expires on its own)."""
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> dict:
+        """Returns hit/miss counters, the hit rate and the current LRU size for monitoring."""
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "hit_rate": round(self.stats["hits"] / lookups, 4) if lookups else 0.0,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "shared_tier": self.mongo_collection is not None,
+                "by_phase": {phase: dict(counts) for phase, counts in self.phase_stats.items()},
+            }
@@ -0,0 +1,200 @@
+# backend/utils/ai_core/llm_metrics.py
+
+"""
+This module contains the per-call LLM metrics collected by LLMService: a
+structured record for every call, aggregated into rolling histograms per
+phase and per (phase, model, backend), with a JSON snapshot and a
+Prometheus text export.
+"""
+
+import bisect
+import json
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+# Upper bounds (seconds) of the exported latency buckets.
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+# Record fields that are aggregated into histograms.
+HISTOGRAM_FIELDS = ("latency", "ttfb", "queue_wait", "tokens_per_sec", "prompt_tokens", "completion_tokens",
+                    "model_load_seconds")
+
+
+class RollingHistogram:
+    """Keeps the samples of the last `window_seconds` (at most `max_samples`) for percentiles."""
+
+    def __init__(self, window_seconds: float = 900.0, max_samples: int = 5000):
+        self.window_seconds = window_seconds
+        self._samples = deque(maxlen=max_samples)  # (timestamp, value)
+
+    def observe(self, value: float, now: Optional[float] = None):
+        self._samples.append((now if now is not None else time.time(), value))
+
+    def _values(self, now: Optional[float] = None) -> List[float]:
+        cutoff = (now if now is not None else time.time()) - self.window_seconds
+        while self._samples and self._samples[0][0] < cutoff:
+            self._samples.popleft()
+        return [value for _, value in self._samples]
+
+    def summary(self) -> dict:
+        values = sorted(self._values())
+        if not values:
+            return {"count": 0}
+
+        def pct(p: float) -> float:
+            return round(values[min(len(values) - 1, int(round(p * (len(values) - 1))))], 4)
+
+        return {
+            "count": len(values), "mean": round(sum(values) / len(values), 4),
+            "p50": pct(0.5), "p90": pct(0.9), "p95": pct(0.95), "p99": pct(0.99), "max": round(values[-1], 4),
+        }
+
+    def buckets(self, bounds: Tuple[float, ...] = LATENCY_BUCKETS) -> Tuple[List[int], float, int]:
+        """Returns cumulative counts per bound, the sum and the count, Prometheus-style."""
+        values = sorted(self._values())
+        return [bisect.bisect_right(values, bound) for bound in bounds], sum(values), len(values)
+
+
+class _Series:
+    def __init__(self, window_seconds: float, max_samples: int):
+        self.histograms = {name: RollingHistogram(window_seconds, max_samples) for name in HISTOGRAM_FIELDS}
+        self.counters = {"calls": 0, "errors": 0, "retries": 0, "cache_hits": 0, "streams": 0}
+
+    def add(self, record: dict):
+        self.counters["calls"] += 1
+        self.counters["retries"] += record.get("retries", 0)
+        if not record.get("ok"):
+            self.counters["errors"] += 1
+        if record.get("cache_hit"):
+            self.counters["cache_hits"] += 1
+        if record.get("stream"):
+            self.counters["streams"] += 1
+        now = record["ts"]
+        for name in HISTOGRAM_FIELDS:
+            value = record.get(name)
+            # Cache hits and failures would skew the latency/throughput picture of the backend.
+            if value is None or (name != "queue_wait" and (record.get("cache_hit") or not record.get("ok"))):
+                continue
+            self.histograms[name].observe(value, now)
+
+    def snapshot(self) -> dict:
+        snapshot = {**self.counters, **{name: hist.summary() for name, hist in self.histograms.items()}}
+        if self.counters.get("plans"):
+            # Share of planner turns that needed a re-prompt after an unusable reply.
+            snapshot["retry_rate"] = round(self.counters.get("reprompts", 0) / self.counters["plans"], 4)
+        return snapshot
+
+
+class LLMMetrics:
+    """Process-wide sink for LLM call records. Thread-safe."""
+
+    def __init__(self, window_seconds: float = 900.0, max_samples: int = 5000, log_path: Optional[str] = None):
+        self.window_seconds = window_seconds
+        self.max_samples = max_samples
+        self.log_path = log_path
+        self._lock = threading.Lock()
+        self._by_phase: Dict[str, _Series] = {}
+        self._by_target: Dict[Tuple[str, str, str], _Series] = {}
+        self.recent = deque(maxlen=200)  # Raw records, newest last
+
+    def configure(self, window_seconds: Optional[float] = None, log_path: Optional[str] = None):
+        """Applies the 'metrics' config section. Existing samples are kept."""
+        with self._lock:
+            if window_seconds:
+                self.window_seconds = window_seconds
+                for series in list(self._by_phase.values()) + list(self._by_target.values()):
+                    for hist in series.histograms.values():
+                        hist.window_seconds = window_seconds
+            if log_path:
+                self.log_path = log_path
+
+    def _series(self, table: dict, key) -> _Series:
+        series = table.get(key)
+        if series is None:
+            series = table[key] = _Series(self.window_seconds, self.max_samples)
+        return series
+
+    def record(self, record: dict):
+        """Adds one call record (see LLMService._record_call for the fields)."""
+        record.setdefault("ts", time.time())
+        with self._lock:
+            self._series(self._by_phase, record["phase"]).add(record)
+            self._series(self._by_target, (record["phase"], record["model"], record["backend"])).add(record)
+            self.recent.append(record)
+            log_path = self.log_path
+        if log_path:
+            try:
+                with open(log_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record, default=str) + "\n")
+            except OSError:
+                pass  # Metrics must never break an LLM call
+
+    def count(self, phase: str, name: str, amount: int = 1):
+        """Bumps a per-phase event counter that isn't tied to a single call (e.g. planner re-prompts)."""
+        with self._lock:
+            counters = self._series(self._by_phase, phase).counters
+            counters[name] = counters.get(name, 0) + amount
+
+    def snapshot(self) -> dict:
+        """Returns counters and latency/throughput percentiles per phase and per (phase, model, backend)."""
+        with self._lock:
+            return {
+                "window_seconds": self.window_seconds,
+                "by_phase": {phase: series.snapshot() for phase, series in self._by_phase.items()},
+                "by_target": [
+                    {"phase": phase, "model": model, "backend": backend, **series.snapshot()}
+                    for (phase, model, backend), series in self._by_target.items()
+                ],
+            }
+
+    def slowest_phase(self, percentile: str = "p95") -> Optional[str]:
+        """Returns the phase with the highest latency percentile, or None without data."""
+        by_phase = self.snapshot()["by_phase"]
+        ranked = [(stats["latency"].get(percentile, 0), phase) for phase, stats in by_phase.items()
+                  if stats["latency"].get("count")]
+        return max(ranked)[1] if ranked else None
+
+    def export_prometheus(self) -> str:
+        """Renders the per-target series in the Prometheus text exposition format."""
+        lines = [
+            "# HELP llm_call_latency_seconds LLM call latency over the rolling window.",
+            "# TYPE llm_call_latency_seconds histogram",
+        ]
+        counter_lines = []
+        with self._lock:
+            items = list(self._by_target.items())
+            phase_counters = {phase: dict(series.counters) for phase, series in self._by_phase.items()}
+            for (phase, model, backend), series in items:
+                labels = f'phase="{phase}",model="{model}",backend="{backend}"'
+                counts, total, count = series.histograms["latency"].buckets()
+                for bound, cumulative in zip(LATENCY_BUCKETS, counts):
+                    lines.append(f'llm_call_latency_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'llm_call_latency_seconds_bucket{{{labels},le="+Inf"}} {count}')
+                lines.append(f"llm_call_latency_seconds_sum{{{labels}}} {round(total, 6)}")
+                lines.append(f"llm_call_latency_seconds_count{{{labels}}} {count}")
+                for name, value in series.counters.items():
+                    counter_lines.append(f"llm_{name}_total{{{labels}}} {value}")
+                tps = series.histograms["tokens_per_sec"].summary()
+                if tps.get("count"):
+                    counter_lines.append(f"llm_tokens_per_second_p50{{{labels}}} {tps['p50']}")
+        for phase, counters in phase_counters.items():
+            for name in ("plans", "reprompts", "invalid_plans", "skipped_rule", "skipped_cache", "multi_step_plans"):
+                if name in counters:
+                    counter_lines.append(f'llm_planner_{name}_total{{phase="{phase}"}} {counters[name]}')
+        return "\n".join(lines + counter_lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._by_phase.clear()
+            self._by_target.clear()
+            self.recent.clear()
+
+
+_METRICS = LLMMetrics()
+
+
+def get_llm_metrics() -> LLMMetrics:
+    """Returns the process-wide metrics sink shared by every LLMService."""
+    return _METRICS
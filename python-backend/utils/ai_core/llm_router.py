@@ -0,0 +1,367 @@
+# backend/utils/ai_core/llm_router.py
+
+"""
+This module contains the LLMRouter class, a latency-aware routing layer over
+several LLMService backends (e.g. a local Ollama and Mistral) with request
+hedging and automatic failover.
+"""
+
+import time
+import asyncio
+import contextvars
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import AsyncIterator, Iterator, List, Optional
+
+from .llm_service import LLMService, run_batch, run_batch_async
+
+
+class BackendStats:
+    """Rolling latency and error-rate window for one backend."""
+
+    def __init__(self, window: int = 50):
+        self._samples = deque(maxlen=window)  # (latency_seconds, ok)
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "errors": 0, "wins": 0}
+
+    def record(self, latency: float, ok: bool):
+        with self._lock:
+            self._samples.append((latency, ok))
+            self.stats["calls"] += 1
+            if not ok:
+                self.stats["errors"] += 1
+
+    def record_win(self):
+        with self._lock:
+            self.stats["wins"] += 1
+
+    def sample_count(self) -> int:
+        with self._lock:
+            return len(self._samples)
+
+    def error_rate(self) -> float:
+        with self._lock:
+            if not self._samples:
+                return 0.0
+            return sum(1 for _, ok in self._samples if not ok) / len(self._samples)
+
+    def latency_percentile(self, percentile: float) -> Optional[float]:
+        """Returns the given percentile (0-1) of recent successful latencies, or None."""
+        with self._lock:
+            latencies = sorted(latency for latency, ok in self._samples if ok)
+        if not latencies:
+            return None
+        index = min(len(latencies) - 1, int(round(percentile * (len(latencies) - 1))))
+        return latencies[index]
+
+    def snapshot(self) -> dict:
+        p50, p90 = self.latency_percentile(0.5), self.latency_percentile(0.9)
+        return {
+            **self.stats,
+            "window_samples": self.sample_count(),
+            "error_rate": round(self.error_rate(), 4),
+            "p50_seconds": round(p50, 3) if p50 is not None else None,
+            "p90_seconds": round(p90, 3) if p90 is not None else None,
+        }
+
+
+class LLMRouter:
+    """
+    Routes calls across an ordered list of LLMService backends.
+
+    - Failover: backends whose circuit breaker is open are skipped, and backends
+      whose recent error rate exceeds `max_error_rate` are demoted behind healthy ones.
+    - Hedging: if the preferred backend has not answered after the hedge delay,
+      the same request is sent to the next backend and the first valid response
+      wins. In the async path the losing request is cancelled. In the sync path a
+      running request cannot be cancelled: it is abandoned and runs to completion
+      (bounded by its timeouts and the request deadline), keeping a hedge worker and
+      its backend's connection or model slot; its result is discarded but still feeds
+      the latency stats. While `max_abandoned_hedges` such requests are running, the
+      sync path stops hedging and waits for the preferred backend instead.
+    - Streams are not hedged (tokens cannot be merged) but fail over before the
+      first token.
+
+    The router exposes the same call API as LLMService, so AIAnalyst can use it
+    in place of a single service.
+    """
+
+    def __init__(self, backends: List[LLMService], config: Optional[dict] = None):
+        """
+        Initializes the router.
+
+        Args:
+            backends: LLMService instances in order of preference.
+            config: The 'llm_routing' config section (hedge_delay, adaptive_hedge,
+                    hedge_percentile, min_hedge_delay, window, max_error_rate,
+                    min_samples, hedge_phases, max_workers, max_abandoned_hedges).
+        """
+        if not backends:
+            raise ValueError("LLMRouter needs at least one backend.")
+        config = config or {}
+        self.backends = backends
+        self.hedge_delay = config.get('hedge_delay', 4.0)
+        self.adaptive_hedge = config.get('adaptive_hedge', True)
+        self.hedge_percentile = config.get('hedge_percentile', 0.9)
+        self.min_hedge_delay = config.get('min_hedge_delay', 1.0)
+        self.max_error_rate = config.get('max_error_rate', 0.5)
+        self.min_samples = config.get('min_samples', 5)
+        # The synthesizer is left out by default: it is the longest call, so a hedge doubles the most work.
+        self.hedge_phases = set(config.get('hedge_phases', ["planner", "intent", "summarizer", "greeting"]))
+        self.max_abandoned_hedges = config.get('max_abandoned_hedges', 2)
+        self.debug_mode = any(b.debug_mode for b in backends)
+
+        window = config.get('window', 50)
+        self.backend_stats = [BackendStats(window) for _ in backends]
+        self.stats = {"calls": 0, "hedged": 0, "hedge_wins": 0, "failovers": 0, "hedges_skipped": 0}
+        self._stats_lock = threading.Lock()
+        self._abandoned = 0  # Sync losers still running, guarded by _stats_lock
+        self._executor = ThreadPoolExecutor(max_workers=config.get('max_workers', 8), thread_name_prefix="llm-hedge")
+
+    def __getattr__(self, name):
+        # Anything the router doesn't define (model names, api_mode, ...) comes from the preferred backend.
+        if name == "backends":
+            raise AttributeError(name)
+        return getattr(self.backends[0], name)
+
+    @staticmethod
+    def is_error_response(text: str) -> bool:
+        return LLMService.is_error_response(text)
+
+    def _count(self, stat: str):
+        with self._stats_lock:
+            self.stats[stat] += 1
+
+    def _label(self, index: int) -> str:
+        backend = self.backends[index]
+        return f"{backend.api_mode}:{backend.endpoint}"
+
+    def _ordered_backends(self) -> List[int]:
+        """
+        Returns backend indexes to try, preferred first. Backends with an open breaker
+        are dropped; unhealthy ones (error rate above the limit) go to the back.
+        """
+        healthy, degraded = [], []
+        for i, backend in enumerate(self.backends):
+            if not backend.is_available():
+                continue
+            stats = self.backend_stats[i]
+            if stats.sample_count() >= self.min_samples and stats.error_rate() > self.max_error_rate:
+                degraded.append(i)
+            else:
+                healthy.append(i)
+        order = healthy + degraded
+        if order and order[0] != 0:
+            self._count("failovers")
+            if self.debug_mode:
+                print(f"LLMRouter -> failing over to {self._label(order[0])}")
+        return order
+
+    def _hedge_delay_for(self, index: int) -> float:
+        """Fixed delay, or the backend's recent latency percentile when adaptive hedging is on."""
+        if self.adaptive_hedge and self.backend_stats[index].sample_count() >= self.min_samples:
+            observed = self.backend_stats[index].latency_percentile(self.hedge_percentile)
+            if observed is not None:
+                return max(self.min_hedge_delay, observed)
+        return self.hedge_delay
+
+    def _timed_execute(self, index: int, kwargs: dict) -> str:
+        t0 = time.perf_counter()
+        result = self.backends[index].execute(**kwargs)
+        self.backend_stats[index].record(time.perf_counter() - t0, not self.is_error_response(result))
+        return result
+
+    async def _timed_execute_async(self, index: int, kwargs: dict) -> str:
+        t0 = time.perf_counter()
+        result = await self.backends[index].execute_async(**kwargs)
+        self.backend_stats[index].record(time.perf_counter() - t0, not self.is_error_response(result))
+        return result
+
+    def _submit(self, index: int, kwargs: dict):
+        # Copy the caller's context so the request deadline (deadline.py) reaches the worker thread.
+        return self._executor.submit(contextvars.copy_context().run, self._timed_execute, index, kwargs)
+
+    def _may_hedge_sync(self) -> bool:
+        """False while too many abandoned sync losers are still holding workers and backends."""
+        with self._stats_lock:
+            if self._abandoned < self.max_abandoned_hedges:
+                return True
+            self.stats["hedges_skipped"] += 1
+            return False
+
+    def _abandon(self, future):
+        """Cancels a losing sync request, or counts it as abandoned until it finishes."""
+        if future.cancel():
+            return
+        with self._stats_lock:
+            self._abandoned += 1
+        future.add_done_callback(self._abandoned_done)
+
+    def _abandoned_done(self, future):
+        with self._stats_lock:
+            self._abandoned -= 1
+
+    def _record_winner(self, index: int, order: List[int]):
+        self.backend_stats[index].record_win()
+        if index != order[0]:
+            self._count("hedge_wins")
+        if self.debug_mode:
+            print(f"LLMRouter -> answered by {self._label(index)}")
+
+    def execute(self, **kwargs) -> str:
+        """Same contract as LLMService.execute, with hedging and failover across backends."""
+        self._count("calls")
+        order = self._ordered_backends()
+        if not order:
+            return self.backends[0].execute(**kwargs)  # Every breaker is open: returns the fail-fast error
+        if len(order) == 1 or kwargs.get('phase', 'planner') not in self.hedge_phases:
+            return self._run_with_failover(order, kwargs)
+
+        futures = {self._submit(order[0], kwargs): order[0]}
+        next_backend = 1
+        done, pending = wait(futures, timeout=self._hedge_delay_for(order[0]))
+        if not done and self._may_hedge_sync():
+            self._count("hedged")
+            if self.debug_mode:
+                print(f"LLMRouter -> hedging to {self._label(order[1])}")
+            futures[self._submit(order[1], kwargs)] = order[1]
+            next_backend = 2
+            pending = set(futures)
+
+        last_result = None
+        while True:
+            for future in done:
+                result = future.result()
+                if not self.is_error_response(result):
+                    for other in pending:
+                        self._abandon(other)
+                    self._record_winner(futures[future], order)
+                    return result
+                last_result = result
+                # A fast failure: move on to the next backend straight away.
+                if not pending and next_backend < len(order):
+                    self._count("failovers")
+                    new_future = self._submit(order[next_backend], kwargs)
+                    futures[new_future] = order[next_backend]
+                    pending = {new_future}
+                    next_backend += 1
+            if not pending:
+                return last_result
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+    def _run_with_failover(self, order: List[int], kwargs: dict) -> str:
+        result = None
+        for position, index in enumerate(order):
+            if position > 0:
+                self._count("failovers")
+            result = self._timed_execute(index, kwargs)
+            if not self.is_error_response(result):
+                self._record_winner(index, order)
+                return result
+        return result
+
+    async def execute_async(self, **kwargs) -> str:
+        """Async variant of execute(); the losing hedged request is cancelled."""
+        self._count("calls")
+        order = self._ordered_backends()
+        if not order:
+            return await self.backends[0].execute_async(**kwargs)
+        hedge = len(order) > 1 and kwargs.get('phase', 'planner') in self.hedge_phases
+
+        tasks = {asyncio.ensure_future(self._timed_execute_async(order[0], kwargs)): order[0]}
+        next_backend = 1
+        timeout = self._hedge_delay_for(order[0]) if hedge else None
+        done, pending = await asyncio.wait(tasks, timeout=timeout)
+        if not done:
+            self._count("hedged")
+            if self.debug_mode:
+                print(f"LLMRouter -> hedging to {self._label(order[1])}")
+            tasks[asyncio.ensure_future(self._timed_execute_async(order[1], kwargs))] = order[1]
+            next_backend = 2
+            pending = set(tasks)
+
+        last_result = None
+        try:
+            while True:
+                for task in done:
+                    result = task.result()
+                    if not self.is_error_response(result):
+                        self._record_winner(tasks[task], order)
+                        return result
+                    last_result = result
+                    if not pending and next_backend < len(order):
+                        self._count("failovers")
+                        new_task = asyncio.ensure_future(self._timed_execute_async(order[next_backend], kwargs))
+                        tasks[new_task] = order[next_backend]
+                        pending = {new_task}
+                        next_backend += 1
+                if not pending:
+                    return last_result
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def execute_many(self, batch: List[dict], max_concurrency: Optional[int] = None) -> List[dict]:
+        """Same contract as LLMService.execute_many, with every item routed through execute()."""
+        return run_batch(self.execute, batch, max_concurrency or self.backends[0].max_concurrency)
+
+    async def execute_many_async(self, batch: List[dict], max_concurrency: Optional[int] = None) -> List[dict]:
+        return await run_batch_async(self.execute_async, batch, max_concurrency or self.backends[0].max_concurrency)
+
+    def execute_stream(self, **kwargs) -> Iterator[str]:
+        """Streams from the preferred backend, failing over if it errors before the first token."""
+        self._count("calls")
+        order = self._ordered_backends() or [0]
+        for position, index in enumerate(order):
+            if position > 0:
+                self._count("failovers")
+            stream = self.backends[index].execute_stream(**kwargs)
+            first = next(stream, None)
+            if first is None:
+                return
+            if self.is_error_response(first) and position < len(order) - 1:
+                self.backend_stats[index].record(0.0, False)
+                continue
+            self._record_winner(index, order)
+            yield first
+            yield from stream
+            return
+
+    async def execute_stream_async(self, **kwargs) -> AsyncIterator[str]:
+        """Async variant of execute_stream()."""
+        self._count("calls")
+        order = self._ordered_backends() or [0]
+        for position, index in enumerate(order):
+            if position > 0:
+                self._count("failovers")
+            stream = self.backends[index].execute_stream_async(**kwargs)
+            try:
+                first = await stream.__anext__()
+            except StopAsyncIteration:
+                return
+            if self.is_error_response(first) and position < len(order) - 1:
+                self.backend_stats[index].record(0.0, False)
+                await stream.aclose()
+                continue
+            self._record_winner(index, order)
+            yield first
+            async for token in stream:
+                yield token
+            return
+
+    def is_available(self) -> bool:
+        return any(backend.is_available() for backend in self.backends)
+
+    def get_health(self) -> dict:
+        """Returns router counters plus each backend's rolling stats and breaker state."""
+        with self._stats_lock:
+            stats = {**self.stats, "abandoned_in_flight": self._abandoned}
+        return {
+            "router": stats,
+            "backends": [
+                {"backend": self._label(i), **self.backend_stats[i].snapshot(), "service": backend.get_health()}
+                for i, backend in enumerate(self.backends)
+            ],
+        }
@@ -7,20 +7,175 @@ Large Language Model APIs (e.g., Mistral, Ollama).
 
 import json
 import time
+import asyncio
+import threading
+import contextvars
+import weakref
+import httpx
 import requests
-from typing import List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from requests.adapters import HTTPAdapter
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from .cassette import CassetteRecorder
+from .deadline import current_deadline
+from .llm_cache import LLMResponseCache
+from .llm_metrics import get_llm_metrics
+from .residency import ResidencySlot, ResidencyTimeout, get_residency_scheduler
+from .resilience import backoff_delay, get_circuit_breaker, parse_retry_after
+from .token_budget import TokenUsage, estimate_message_tokens, estimate_tokens, fit_messages_to_budget
+
+# Phases that run on the synthesizer model; every other phase (planner, intent,
+# summarizer) runs on the planner model.
+SYNTH_PHASES = {"synth", "greeting"}
+
+# HTTP statuses worth retrying; any other 4xx is a request problem that a retry won't fix.
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+# Every failure string returned by LLMService starts with one of these prefixes.
+LLM_ERROR_PREFIXES = ("Error:", "Configuration Error:")
+
+
+# --- Shared HTTP transport ---
+# One keep-alive requests.Session per endpoint (scheme://host:port). Every LLMService
+# that talks to the same backend (e.g. planner_llm and synth_llm in online mode)
+# reuses the same connection pool instead of paying TCP/TLS setup on every call.
+_HTTP_SESSIONS: Dict[str, requests.Session] = {}
+_HTTP_SESSIONS_LOCK = threading.Lock()
+
+
+def _endpoint_key(api_url: str) -> str:
+    """Reduces a full API URL to the endpoint (scheme://host:port) used to share pools."""
+    parsed = urlparse(api_url)
+    return f"{parsed.scheme}://{parsed.netloc}"
+
+
+def get_http_session(api_url: str, pool_maxsize: int = 10) -> requests.Session:
+    """
+    Returns the shared keep-alive session for the endpoint of `api_url`, creating it
+    on first use. The first caller's pool size wins for the lifetime of the process.
+    """
+    key = _endpoint_key(api_url)
+    with _HTTP_SESSIONS_LOCK:
+        session = _HTTP_SESSIONS.get(key)
+        if session is None:
+            session = requests.Session()
+            # Retries are handled by LLMService itself, so the adapter never retries.
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize, max_retries=0)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _HTTP_SESSIONS[key] = session
+        return session
+
+
+def close_http_sessions():
+    """Closes every shared LLM session. Call this on application shutdown."""
+    with _HTTP_SESSIONS_LOCK:
+        for session in _HTTP_SESSIONS.values():
+            session.close()
+        _HTTP_SESSIONS.clear()
+
+
+# httpx.AsyncClient pools are bound to the event loop that created them, so the
+# async clients are shared per (event loop, endpoint) rather than globally.
+_ASYNC_CLIENTS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, httpx.AsyncClient]]" = weakref.WeakKeyDictionary()
+
+
+def get_async_http_client(api_url: str, pool_maxsize: int = 10) -> httpx.AsyncClient:
+    """Returns the keep-alive AsyncClient for `api_url`'s endpoint on the running event loop."""
+    loop = asyncio.get_running_loop()
+    clients = _ASYNC_CLIENTS.setdefault(loop, {})
+    key = _endpoint_key(api_url)
+    client = clients.get(key)
+    if client is None or client.is_closed:
+        limits = httpx.Limits(max_connections=pool_maxsize, max_keepalive_connections=pool_maxsize)
+        client = httpx.AsyncClient(limits=limits)
+        clients[key] = client
+    return client
+
+
+async def close_async_http_clients():
+    """Closes the async clients owned by the running event loop."""
+    clients = _ASYNC_CLIENTS.pop(asyncio.get_running_loop(), {})
+    for client in clients.values():
+        await client.aclose()
+
+
+# Seconds the current call spent queued (waiting for a batch slot or for its Ollama model
+# to be resident). Added to by the queueing layers; read and reset when metrics are recorded.
+_QUEUE_WAIT: contextvars.ContextVar = contextvars.ContextVar("llm_queue_wait", default=0.0)
+
+
+# --- Batch execution ---
+# Batch concurrency is capped per endpoint, so several execute_many() calls running
+# at the same time cannot overload one backend (a local Ollama in particular).
+_BATCH_LIMITS: Dict[str, threading.BoundedSemaphore] = {}
+_BATCH_LIMITS_LOCK = threading.Lock()
+
+
+def _batch_semaphore(endpoint: str, limit: int) -> threading.BoundedSemaphore:
+    with _BATCH_LIMITS_LOCK:
+        semaphore = _BATCH_LIMITS.get(endpoint)
+        if semaphore is None:
+            semaphore = threading.BoundedSemaphore(limit)
+            _BATCH_LIMITS[endpoint] = semaphore
+        return semaphore
+
+
+def _batch_result(content: Optional[str] = None, error: Optional[str] = None) -> dict:
+    if error is None and LLMService.is_error_response(content):
+        content, error = None, content
+    return {"ok": error is None, "content": content, "error": error}
+
+
+def run_batch(execute: Callable[..., str], batch: List[dict], max_workers: int) -> List[dict]:
+    """
+    Runs `execute(**request)` for every request in `batch` on a thread pool and returns
+    one {"ok", "content", "error"} dict per request, in input order. A failing request
+    never affects the others.
+    """
+    def run_one(request: dict) -> dict:
+        try:
+            return _batch_result(content=execute(**request))
+        except Exception as e:
+            return _batch_result(error=f"Error: {type(e).__name__}: {e}")
+
+    if not batch:
+        return []
+    # Each request runs in a copy of the caller's context, so the request deadline still applies.
+    contexts = [contextvars.copy_context() for _ in batch]
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(batch))), thread_name_prefix="llm-batch") as pool:
+        return list(pool.map(lambda ctx, request: ctx.run(run_one, request), contexts, batch))
+
+
+async def run_batch_async(execute_async: Callable[..., "asyncio.Future"], batch: List[dict], limit: int) -> List[dict]:
+    """Async counterpart of run_batch(): at most `limit` requests are in flight at once."""
+    semaphore = asyncio.Semaphore(max(1, limit))
+
+    async def run_one(request: dict) -> dict:
+        async with semaphore:
+            try:
+                return _batch_result(content=await execute_async(**request))
+            except Exception as e:
+                return _batch_result(error=f"Error: {type(e).__name__}: {e}")
+
+    return list(await asyncio.gather(*(run_one(request) for request in batch)))
+
 
 class LLMService:
     """
     A client for interacting with Large Language Model APIs (e.g., Mistral, Ollama).
     It handles request preparation, execution, and retries.
     """
-    def __init__(self, config: dict):
+    def __init__(self, config: dict, cache: Optional[LLMResponseCache] = None):
         """
         Initializes the LLM service with configuration settings.
 
         Args:
             config: A dictionary containing API keys, URLs, and model names.
+            cache: An optional shared response cache (see llm_cache.py).
         """
         self.api_mode = config.get('api_mode', 'online')
         self.debug_mode = config.get('debug_mode', False)
@@ -30,26 +185,189 @@ class LLMService:
         self.planner_model = config.get('planner_model')
         self.synth_model   = config.get('synth_model')
 
-    def _prepare_request(self, messages: list, json_mode: bool, phase: str = "planner"):
+        # Transport settings: a pooled keep-alive session per endpoint, and timeouts
+        # split into a short connect phase and a per-phase read budget.
+        self.pool_maxsize = config.get('pool_maxsize', 10)
+        self.max_concurrency = config.get('max_concurrency', self.pool_maxsize)  # Cap for execute_many()
+        self.connect_timeout = config.get('connect_timeout', 10)
+        self.read_timeouts = {"planner": 180, "synth": 360}
+        self.read_timeouts.update(config.get('read_timeouts', {}))
+        self.cache = cache
+
+        # Retry policy: exponential backoff with full jitter, honouring Retry-After.
+        retry_cfg = config.get('retry_policy', {})
+        self.retry_base_delay = retry_cfg.get('base_delay', 0.5)
+        self.retry_max_delay = retry_cfg.get('max_delay', 8.0)
+        self.max_retry_after = retry_cfg.get('max_retry_after', 30.0)
+
+        # One circuit breaker per endpoint, shared by every service that calls it.
+        breaker_cfg = config.get('circuit_breaker', {})
+        self.endpoint = _endpoint_key(self.mistral_api_url if self.api_mode == 'online' else self.ollama_api_url)
+        self.breaker = get_circuit_breaker(
+            self.endpoint,
+            failure_threshold=breaker_cfg.get('failure_threshold', 5),
+            recovery_timeout=breaker_cfg.get('recovery_timeout', 30.0),
+            # A probe still out after one full attempt's timeouts was lost (cancelled, killed worker).
+            probe_timeout=breaker_cfg.get('probe_timeout', self.connect_timeout + max(self.read_timeouts.values()))
+        )
+        self.stats = {"calls": 0, "retries": 0, "failures": 0, "short_circuited": 0, "deadline_exceeded": 0}
+        self._stats_lock = threading.Lock()
+
+        # Per-phase prompt budgets in estimated tokens; phases without a budget are not trimmed.
+        self.token_budgets = dict(config.get('token_budgets', {}))
+        self.min_history_messages = config.get('min_history_messages', 2)
+        self.token_usage = TokenUsage()
+        self.metrics = get_llm_metrics()
+
+        # Ollama model residency: keep_alive hints, and a scheduler that runs calls for the
+        # loaded model before making the server swap weights (see residency.py).
+        residency_cfg = config.get('residency', {}) if self.api_mode == 'offline' else {}
+        self.keep_alive = residency_cfg.get('keep_alive')
+        self.residency = None
+        if residency_cfg.get('enabled'):
+            self.residency = get_residency_scheduler(
+                self.endpoint,
+                max_loaded_models=residency_cfg.get('max_loaded_models', 1),
+                max_hold_seconds=residency_cfg.get('max_hold_seconds', 2.0)
+            )
+
+        # Record mode: append every real request/response pair to a cassette file that
+        # benchmarks/stub_llm_server.py can replay offline.
+        record_path = config.get('record_cassette')
+        self.recorder = CassetteRecorder(record_path) if record_path else None
+
+    def _count(self, stat: str, amount: int = 1):
+        with self._stats_lock:
+            self.stats[stat] += amount
+
+    @staticmethod
+    def is_error_response(text: str) -> bool:
+        """True if `text` is one of LLMService's failure strings rather than model output."""
+        return isinstance(text, str) and text.startswith(LLM_ERROR_PREFIXES)
+
+    def is_available(self) -> bool:
+        """False while this endpoint's circuit breaker is open, so callers can degrade early."""
+        return self.breaker.is_available()
+
+    def get_health(self) -> dict:
+        """Returns breaker state and retry counters for monitoring."""
+        with self._stats_lock:
+            stats = dict(self.stats)
+        return {"endpoint": self.endpoint, "api_mode": self.api_mode, "breaker": self.breaker.snapshot(),
+                "tokens": self.token_usage.snapshot(),
+                "residency": self.residency.snapshot() if self.residency is not None else None, **stats}
+
+    def _unavailable_message(self) -> str:
+        snapshot = self.breaker.snapshot()
+        return (f"Error: The AI service at {self.endpoint} is temporarily unavailable "
+                f"(circuit open, retry in {snapshot['retry_in_seconds']}s).")
+
+    def _after_failure(self, err: Exception, attempt: int, retries: int) -> Optional[float]:
+        """
+        Records a failed attempt with the circuit breaker, unless the request deadline cut
+        it short. Returns how long to wait before the next attempt, or None when the call
+        should give up (non-retryable error, no retries left, deadline reached, or the
+        breaker has opened).
+        """
+        response = getattr(err, "response", None)
+        status = getattr(response, "status_code", None)
+        # Connection errors, timeouts and malformed bodies have no status and are retryable.
+        retryable = status is None or status in RETRYABLE_STATUS
+        retry_after = None
+        if status in (429, 503):
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+
+        deadline = current_deadline()
+        if status is None and deadline is not None and deadline.expired():
+            # Timed out because the deadline (e.g. an optional stage's) clamped the timeout:
+            # the budget ran out, which says nothing about the backend's health.
+            if self.debug_mode:
+                print(f"LLM attempt {attempt+1}/{retries+1} cut by the deadline: {err}")
+            return None
+        if retryable:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()  # The backend answered; the request itself was bad.
+
+        if self.debug_mode:
+            print(f"LLM attempt {attempt+1}/{retries+1} failed (status={status}, retryable={retryable}): {err}")
+
+        if not retryable or attempt >= retries:
+            return None
+        if not self.breaker.is_available():  # The retry reuses this call's permit rather than taking another
+            self._count("short_circuited")
+            return None
+        delay = backoff_delay(attempt, self.retry_base_delay, self.retry_max_delay,
+                              retry_after=retry_after, max_retry_after=self.max_retry_after)
+        if deadline is not None and delay >= deadline.remaining():
+            return None  # The retry could not finish before the request deadline anyway
+        self._count("retries")
+        return delay
+
+    @staticmethod
+    def _phase_role(phase: str) -> str:
+        """Maps a call phase to the model role ('planner' or 'synth') that serves it."""
+        return "synth" if phase in SYNTH_PHASES else "planner"
+
+    def _get_timeout(self, phase: str) -> Tuple[float, float]:
+        """Returns the (connect, read) timeout tuple for the given phase, capped by the request deadline."""
+        read_timeout = self.read_timeouts.get(phase, self.read_timeouts.get(self._phase_role(phase), 360))
+        deadline = current_deadline()
+        if deadline is not None:
+            # Neither requests nor httpx accept a zero timeout.
+            return max(0.01, deadline.clamp(self.connect_timeout)), max(0.01, deadline.clamp(read_timeout))
+        return self.connect_timeout, read_timeout
+
+    def _slot_wait_exceeded(self, phase: str) -> str:
+        """The error for a call whose deadline ran out while it was held by the residency scheduler."""
+        self._count("deadline_exceeded")
+        deadline = current_deadline()
+        if deadline is not None:
+            deadline.cut(f"llm_{phase}", "deadline exceeded waiting for the model")
+        return f"Error: The request deadline was exceeded before the {phase} call."
+
+    def _deadline_exceeded(self, phase: str) -> Optional[str]:
+        """Returns an error string when the current request has no time left for this call."""
+        deadline = current_deadline()
+        if deadline is None or not deadline.expired():
+            return None
+        self._count("deadline_exceeded")
+        deadline.cut(f"llm_{phase}", "deadline exceeded")
+        return f"Error: The request deadline was exceeded before the {phase} call."
+
+    def _prepare_request(self, messages: list, json_mode: bool, phase: str = "planner", stream: bool = False,
+                         json_schema: Optional[dict] = None):
         """
         Constructs the appropriate API request (URL, headers, payload) based on the
         configured API mode (online/offline) and whether JSON output is required.
+        With stream=True, Mistral answers with SSE chunks and Ollama with NDJSON lines.
+        With a json_schema, decoding is constrained to it (Mistral structured output,
+        Ollama's schema-valued 'format') instead of to any JSON object.
         """
         headers, payload, api_url = {}, {}, ""
-        model_override = self.planner_model if phase == "planner" else self.synth_model
+        model_override = self.synth_model if self._phase_role(phase) == "synth" else self.planner_model
 
         if self.api_mode == 'online':
             api_url = self.mistral_api_url
             headers = {"Authorization": f"Bearer {self.mistral_api_key}", "Content-Type": "application/json"}
             payload = {"model": model_override or "mistral-small-latest", "messages": messages}
-            if json_mode:
+            if json_schema is not None:
+                payload["response_format"] = {
+                    "type": "json_schema",
+                    "json_schema": {"name": json_schema.get("title", "response"), "schema": json_schema, "strict": True},
+                }
+            elif json_mode:
                 payload["response_format"] = {"type": "json_object"}
+            if stream:
+                payload["stream"] = True
         else: # Handles 'offline' mode
             api_url = self.ollama_api_url
             headers = {"Content-Type": "application/json"}
-            payload = {"model": model_override or "mistral:instruct", "messages": messages, "stream": False}
+            payload = {"model": model_override or "mistral:instruct", "messages": messages, "stream": stream}
+            if self.keep_alive:
+                payload["keep_alive"] = self.keep_alive
             if json_mode:
-                payload["format"] = "json"
+                payload["format"] = json_schema if json_schema is not None else "json"
                 # Add a forceful instruction for Ollama to ensure JSON output
                 if messages and messages[0].get("role") == "system":
                     messages[0]["content"] += (
@@ -58,8 +376,253 @@ class LLMService:
                     )
         return api_url, headers, payload
 
+    def _build_messages(self, system_prompt: str, user_prompt: str, history: Optional[List[dict]],
+                        phase: str = "planner", context_blocks: Optional[List[str]] = None) -> List[dict]:
+        """
+        Assembles messages in the correct order: system, history, then user. If the phase
+        has a token budget, trims history and context blocks to fit (see token_budget.py).
+        """
+        messages = [{"role": "system", "content": system_prompt}]
+        if history:
+            messages.extend(history)
+        messages.append({"role": "user", "content": user_prompt})
+
+        budget = self.token_budgets.get(phase)
+        actions = []
+        if budget:
+            messages, actions = fit_messages_to_budget(messages, budget, context_blocks, self.min_history_messages)
+
+        prompt_tokens = estimate_message_tokens(messages)
+        self.token_usage.record_prompt(phase, prompt_tokens, trimmed=bool(actions))
+        if self.debug_mode:
+            print(f"LLMService tokens | phase={phase} | prompt~{prompt_tokens}"
+                  f"{f' / budget {budget}' if budget else ''} | messages={len(messages)}")
+            for action in actions:
+                print(f"LLMService budget | phase={phase} | {action}")
+        return messages
+
+    def _record_cassette(self, payload: dict, phase: str, json_mode: bool, content: str, started_at: float):
+        if self.recorder is None:
+            return
+        try:
+            self.recorder.record(api_mode=self.api_mode, model=payload["model"], phase=phase, json_mode=json_mode,
+                                 messages=payload["messages"], response=content,
+                                 latency_seconds=time.perf_counter() - started_at)
+        except OSError as e:
+            if self.debug_mode:
+                print(f"LLMService could not write cassette {self.recorder.path}: {e}")
+
+    def _record_completion(self, phase: str, content: str):
+        tokens = estimate_tokens(content)
+        self.token_usage.record_completion(phase, tokens)
+        if self.debug_mode:
+            print(f"LLMService tokens | phase={phase} | completion~{tokens}")
+
+    @staticmethod
+    def _ollama_model_name(model: str) -> str:
+        """Ollama reports 'phi3' as 'phi3:latest'; residency is tracked on the full name."""
+        return model if ":" in model else f"{model}:latest"
+
+    @contextmanager
+    def _model_slot(self, model: str):
+        """
+        Holds the model's residency slot around a call. A no-op unless residency is enabled.
+        Waiting is capped by the request deadline; if it runs out first the slot is None.
+        """
+        if self.residency is None:
+            yield ResidencySlot(model)
+            return
+        try:
+            slot = self.residency.acquire(self._ollama_model_name(model), self._slot_timeout())
+        except ResidencyTimeout:
+            yield None
+            return
+        try:
+            _QUEUE_WAIT.set(_QUEUE_WAIT.get() + slot.queue_wait)
+            if self.debug_mode and (slot.swapped or slot.queue_wait > 0.01):
+                print(f"LLMService residency | model={slot.model} | swap={slot.swapped} | waited={slot.queue_wait:.2f}s")
+            yield slot
+        finally:
+            self.residency.release(slot)
+
+    @asynccontextmanager
+    async def _model_slot_async(self, model: str):
+        """Async counterpart of _model_slot(); waiting happens off the event loop and is safe to cancel."""
+        if self.residency is None:
+            yield ResidencySlot(model)
+            return
+        try:
+            slot = await self.residency.acquire_async(self._ollama_model_name(model), self._slot_timeout())
+        except ResidencyTimeout:
+            yield None
+            return
+        _QUEUE_WAIT.set(_QUEUE_WAIT.get() + slot.queue_wait)
+        try:
+            yield slot
+        finally:
+            self.residency.release(slot)
+
+    @staticmethod
+    def _slot_timeout() -> Optional[float]:
+        deadline = current_deadline()
+        return deadline.remaining() if deadline is not None else None
+
+    def warm_models(self, models: Optional[List[str]] = None) -> Dict[str, float]:
+        """
+        Loads Ollama models ahead of the first real call, so the first user doesn't pay
+        for it. Seeds the residency scheduler from /api/ps first. Offline mode only.
+
+        Args:
+            models: Models to load. Defaults to the planner then the synth model, limited
+                    to what the server can keep loaded at once.
+
+        Returns:
+            Seconds taken per model loaded (an empty dict if nothing was warmed).
+        """
+        if self.api_mode != 'offline':
+            return {}
+        session = get_http_session(self.ollama_api_url, self.pool_maxsize)
+        connect_timeout, read_timeout = self._get_timeout("planner")
+
+        try:
+            resp = session.get(f"{self.endpoint}/api/ps", timeout=(connect_timeout, 10))
+            resp.raise_for_status()
+            loaded = [m.get("name") for m in resp.json().get("models", []) if m.get("name")]
+            if self.residency is not None:
+                self.residency.seed(loaded)
+        except Exception as e:
+            if self.debug_mode:
+                print(f"LLMService could not read loaded models from {self.endpoint}: {e}")
+
+        if models is None:
+            models = list(dict.fromkeys(m for m in (self.planner_model, self.synth_model) if m))
+            capacity = self.residency.max_loaded_models if self.residency is not None else 1
+            models = models[:capacity]
+
+        timings = {}
+        for model in models:
+            payload = {"model": model}
+            if self.keep_alive:
+                payload["keep_alive"] = self.keep_alive
+            try:
+                with self._model_slot(model) as slot:
+                    t0 = time.perf_counter()
+                    # /api/generate without a prompt only loads the model.
+                    resp = session.post(f"{self.endpoint}/api/generate", data=json.dumps(payload),
+                                        headers={"Content-Type": "application/json"},
+                                        timeout=(connect_timeout, read_timeout))
+                    resp.raise_for_status()
+                    slot.load_seconds = self._extract_usage(resp.json()).get("load_seconds")
+                    timings[model] = round(time.perf_counter() - t0, 3)
+                    _QUEUE_WAIT.set(0.0)
+            except Exception as e:
+                if self.debug_mode:
+                    print(f"LLMService could not warm model '{model}': {e}")
+        if self.debug_mode and timings:
+            print(f"LLMService warmed models: {timings}")
+        return timings
+
+    @staticmethod
+    def _extract_usage(chunk: dict) -> dict:
+        """
+        Pulls server-reported token counts out of a response body or stream chunk:
+        Mistral's 'usage' block, or Ollama's prompt_eval_count/eval_count/eval_duration.
+        """
+        usage = {}
+        if isinstance(chunk.get("usage"), dict):
+            usage["prompt_tokens"] = chunk["usage"].get("prompt_tokens")
+            usage["completion_tokens"] = chunk["usage"].get("completion_tokens")
+        if "prompt_eval_count" in chunk:
+            usage["prompt_tokens"] = chunk["prompt_eval_count"]
+        if "eval_count" in chunk:
+            usage["completion_tokens"] = chunk["eval_count"]
+        if chunk.get("eval_duration"):
+            usage["generation_seconds"] = chunk["eval_duration"] / 1e9
+        if chunk.get("load_duration"):
+            usage["load_seconds"] = chunk["load_duration"] / 1e9
+        return {k: v for k, v in usage.items() if v is not None}
+
+    def _record_call(self, *, phase: str, model: str, messages: List[dict], started_at: float, ok: bool,
+                     attempts: int = 1, ttfb: Optional[float] = None, usage: Optional[dict] = None,
+                     content: str = "", cache_hit: bool = False, stream: bool = False):
+        """Sends one structured call record to the shared metrics sink (see llm_metrics.py)."""
+        latency = time.perf_counter() - started_at
+        usage = usage or {}
+        prompt_tokens = usage.get("prompt_tokens")
+        completion_tokens = usage.get("completion_tokens")
+        usage_source = "server" if completion_tokens is not None else "estimate"
+        if prompt_tokens is None:
+            prompt_tokens = estimate_message_tokens(messages)
+        if completion_tokens is None:
+            completion_tokens = estimate_tokens(content)
+
+        # Prefer the backend's own generation time; otherwise time after the first byte
+        # for streams, or the whole call.
+        gen_seconds = usage.get("generation_seconds")
+        if not gen_seconds:
+            gen_seconds = latency - ttfb if stream and ttfb is not None else latency
+        tokens_per_sec = None
+        if ok and not cache_hit and completion_tokens and gen_seconds > 0:
+            tokens_per_sec = round(completion_tokens / gen_seconds, 2)
+
+        record = {
+            "phase": phase, "model": model, "backend": self.api_mode, "endpoint": self.endpoint,
+            "ok": ok, "cache_hit": cache_hit, "stream": stream,
+            "attempts": attempts, "retries": max(0, attempts - 1),
+            "queue_wait": round(_QUEUE_WAIT.get(), 4),
+            "model_load_seconds": usage.get("load_seconds"),
+            "ttfb": round(ttfb, 4) if ttfb is not None else None,
+            "latency": round(latency, 4),
+            "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "tokens_per_sec": tokens_per_sec, "usage_source": usage_source,
+        }
+        self.metrics.record(record)
+        _QUEUE_WAIT.set(0.0)
+        if self.debug_mode and not cache_hit:
+            print(f"LLMService metrics | phase={phase} | ok={ok} | latency={record['latency']}s | "
+                  f"ttfb={record['ttfb']}s | retries={record['retries']} | tok/s={tokens_per_sec}")
+
+    @staticmethod
+    def _extract_content(rj: dict) -> str:
+        """Pulls the assistant text out of a Mistral or Ollama chat response body."""
+        if 'choices' in rj and rj['choices']:
+            return rj['choices'][0]['message']['content'].strip()
+        if 'message' in rj and 'content' in rj['message']:
+            return rj['message']['content'].strip()
+        raise ValueError("No content in LLM response")
+
+    @staticmethod
+    def _parse_stream_line(line: str, usage: Optional[dict] = None) -> Optional[str]:
+        """
+        Parses one line of a streamed response into a token. Handles Mistral SSE
+        ('data: {...}' / 'data: [DONE]') and Ollama NDJSON ('{"message": {...}}').
+        Returns None for keep-alive blanks and end-of-stream markers. Token counts
+        reported in the stream are merged into `usage` when it is given.
+        """
+        line = line.strip()
+        if not line or line.startswith(":"):
+            return None
+        if line.startswith("data:"):
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                return None
+            chunk = json.loads(data)
+            if usage is not None:
+                usage.update(LLMService._extract_usage(chunk))
+            choices = chunk.get("choices") or []
+            if not choices:
+                return None
+            return (choices[0].get("delta") or {}).get("content") or None
+        chunk = json.loads(line)
+        if "error" in chunk:
+            raise ValueError(f"LLM stream error: {chunk['error']}")
+        if usage is not None and chunk.get("done"):
+            usage.update(LLMService._extract_usage(chunk))
+        return (chunk.get("message") or {}).get("content") or None
+
     def execute(self, *, system_prompt: str, user_prompt: str, json_mode: bool = False,
-                history: Optional[List[dict]] = None, retries: int = 2, phase: str = "planner") -> str:
+                history: Optional[List[dict]] = None, retries: int = 2, phase: str = "planner",
+                context_blocks: Optional[List[str]] = None, json_schema: Optional[dict] = None) -> str:
         """
         Executes a request to the configured LLM API with retry logic.
 
@@ -69,41 +632,375 @@ class LLMService:
             json_mode: If True, requests a JSON object as the response.
             history: A list of previous conversation turns.
             retries: The number of times to retry the request on failure.
-            phase: The current phase ('planner' or 'synth') to select the correct model.
+            phase: The current phase ('planner', 'intent', 'summarizer', 'synth' or 'greeting').
+                   Selects the model, the read timeout, the cache policy and the token budget.
+            context_blocks: Substrings of the prompts (retrieved documents, examples, ...) that
+                   may be truncated, in this order, when the prompt exceeds the phase budget.
+            json_schema: Optional JSON schema the response must follow. Implies json_mode.
 
         Returns:
             The content of the LLM's response as a string.
         """
-        # Assemble messages in the correct order: system, history, then user.
-        messages = [{"role": "system", "content": system_prompt}]
-        if history:
-            messages.extend(history)
-        messages.append({"role": "user", "content": user_prompt})
+        started_at = time.perf_counter()
+        json_mode = json_mode or json_schema is not None
+        messages = self._build_messages(system_prompt, user_prompt, history, phase, context_blocks)
 
-        api_url, headers, payload = self._prepare_request(messages, json_mode, phase=phase)
+        api_url, headers, payload = self._prepare_request(messages, json_mode, phase=phase, json_schema=json_schema)
         if not api_url:
             return "Configuration Error: API URL is not set."
 
         if self.debug_mode:
             print(f"LLMService -> {self.api_mode.upper()} | phase={phase} | json={json_mode}")
 
-        last_err = None
-        for attempt in range(retries + 1):
-            try:
-                payload["messages"] = messages 
-                resp = requests.post(api_url, headers=headers, data=json.dumps(payload), timeout=360)
-                resp.raise_for_status()
-                rj = resp.json()
-                if 'choices' in rj and rj['choices']:
-                    return rj['choices'][0]['message']['content'].strip()
-                if 'message' in rj and 'content' in rj['message']:
-                    return rj['message']['content'].strip()
-                raise ValueError("No content in LLM response")
-            except Exception as e:
-                last_err = e
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self.cache.make_key(payload["model"], messages, json_mode, phase, json_schema)
+            cached = self.cache.get(cache_key, phase)
+            if cached is not None:
+                if self.debug_mode:
+                    print(f"LLMService cache hit | phase={phase}")
+                self._record_completion(phase, cached)
+                self._record_call(phase=phase, model=payload["model"], messages=messages, started_at=started_at,
+                                  ok=True, attempts=0, content=cached, cache_hit=True)
+                return cached
+
+        self._count("calls")
+        # Before the breaker: an expired call must not take a half-open probe it never reports back.
+        expired = self._deadline_exceeded(phase)
+        if expired:
+            self._record_call(phase=phase, model=payload["model"], messages=messages, started_at=started_at,
+                              ok=False, attempts=0)
+            return expired
+
+        permit = self.breaker.acquire()
+        if permit is None:
+            self._count("short_circuited")
+            self._record_call(phase=phase, model=payload["model"], messages=messages, started_at=started_at,
+                              ok=False, attempts=0)
+            return self._unavailable_message()
+
+        session = get_http_session(api_url, self.pool_maxsize)
+
+        with permit, self._model_slot(payload["model"]) as slot:
+            if slot is None:  # The deadline ran out while the call waited for its model
+                self._record_call(phase=phase, model=payload["model"], messages=messages, started_at=started_at,
+                                  ok=False, attempts=0)
+                return self._slot_wait_exceeded(phase)
+            last_err = None
+            for attempt in range(retries + 1):
+                attempt_started = time.perf_counter()
+                timeout = self._get_timeout(phase)  # Per attempt: the deadline keeps shrinking
+                try:
+                    payload["messages"] = messages 
+                    resp = session.post(api_url, headers=headers, data=json.dumps(payload), timeout=timeout)
+                    # requests' 'elapsed' stops when the response headers arrive.
+                    ttfb = attempt_started - started_at + resp.elapsed.total_seconds()
+                    resp.raise_for_status()
+                    rj = resp.json()
+                    content = self._extract_content(rj)
+                    usage = self._extract_usage(rj)
+                    slot.load_seconds = usage.get("load_seconds")
+                    self.breaker.record_success()
+                    self._record_completion(phase, content)
+                    self._record_call(phase=phase, model=payload["model"], messages=messages, started_at=started_at,
+                                      ok=True, attempts=attempt + 1, ttfb=ttfb, usage=usage, content=content)
+                    self._record_cassette(payload, phase, json_mode, content, started_at)
+                    if cache_key is not None:
+                        self.cache.set(cache_key, phase, content)
+                    return content
+                except Exception as e:
+                    last_err = e
+                    delay = self._after_failure(e, attempt, retries)
+                    if delay is None:
+                        break
+                    time.sleep(delay)
+
+        self._count("failures")
+        self._record_call(phase=phase, model=payload["model"], messages=messages, started_at=started_at,
+                          ok=False, attempts=attempt + 1)
+        return f"Error: Could not connect to the AI service. Details: {last_err}"
+
+    async def execute_async(self, *, system_prompt: str, user_prompt: str, json_mode: bool = False,
+                            history: Optional[List[dict]] = None, retries: int = 2, phase: str = "planner",
+                            context_blocks: Optional[List[str]] = None, json_schema: Optional[dict] = None) -> str:
+        """
+        Async counterpart of execute(). Builds the same Mistral/Ollama request and applies
+        the same retry semantics, but awaits the HTTP call so the event loop stays free.
+
+        Returns:
+            The content of the LLM's response as a string.
+        """
+        started_at = time.perf_counter()
+        json_mode = json_mode or json_schema is not None
+        messages = self._build_messages(system_prompt, user_prompt, history, phase, context_blocks)
+
+        api_url, headers, payload = self._prepare_request(messages, json_mode, phase=phase, json_schema=json_schema)
+        if not api_url:
+            return "Configuration Error: API URL is not set."
+
+        if self.debug_mode:
+            print(f"LLMService (async) -> {self.api_mode.upper()} | phase={phase} | json={json_mode}")
+
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self.cache.make_key(payload["model"], messages, json_mode, phase, json_schema)
+            # The shared Mongo tier is blocking I/O, so lookups run off the event loop.
+            cached = await asyncio.to_thread(self.cache.get, cache_key, phase)
+            if cached is not None:
                 if self.debug_mode:
-                    print(f"LLM attempt {attempt+1}/{retries+1} failed: {e}")
-                if attempt < retries:
-                    time.sleep(1)
-                    
-        return f"Error: Could not connect to the AI service. Details: {last_err}"
\ No newline at end of file
+                    print(f"LLMService (async) cache hit | phase={phase}")
+                self._record_completion(phase, cached)
+                self._record_call(phase=phase, model=payload["model"], messages=messages, started_at=started_at,
+                                  ok=True, attempts=0, content=cached, cache_hit=True)
+                return cached
+
+        self._count("calls")
+        expired = self._deadline_exceeded(phase)
+        if expired:
+            self._record_call(phase=phase, model=payload["model"], messages=messages, started_at=started_at,
+                              ok=False, attempts=0)
+            return expired
+
+        permit = self.breaker.acquire()
+        if permit is None:
+            self._count("short_circuited")
+            self._record_call(phase=phase, model=payload["model"], messages=messages, started_at=started_at,
+                              ok=False, attempts=0)
+            return self._unavailable_message()
+
+        client = get_async_http_client(api_url, self.pool_maxsize)
+
+        async with permit, self._model_slot_async(payload["model"]) as slot:
+            if slot is None:  # The deadline ran out while the call waited for its model
+                self._record_call(phase=phase, model=payload["model"], messages=messages, started_at=started_at,
+                                  ok=False, attempts=0)
+                return self._slot_wait_exceeded(phase)
+            last_err = None
+            for attempt in range(retries + 1):
+                connect_timeout, read_timeout = self._get_timeout(phase)
+                timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+                try:
+                    payload["messages"] = messages
+                    # Opened as a stream so the time to first byte can be measured.
+                    async with client.stream("POST", api_url, headers=headers, content=json.dumps(payload), timeout=timeout) as resp:
+                        ttfb = time.perf_counter() - started_at
+                        resp.raise_for_status()
+                        await resp.aread()
+                    rj = resp.json()
+                    content = self._extract_content(rj)
+                    usage = self._extract_usage(rj)
+                    slot.load_seconds = usage.get("load_seconds")
+                    self.breaker.record_success()
+                    self._record_completion(phase, content)
+                    self._record_call(phase=phase, model=payload["model"], messages=messages, started_at=started_at,
+                                      ok=True, attempts=attempt + 1, ttfb=ttfb, usage=usage, content=content)
+                    self._record_cassette(payload, phase, json_mode, content, started_at)
+                    if cache_key is not None:
+                        await asyncio.to_thread(self.cache.set, cache_key, phase, content)
+                    return content
+                except Exception as e:
+                    last_err = e
+                    delay = self._after_failure(e, attempt, retries)
+                    if delay is None:
+                        break
+                    await asyncio.sleep(delay)
+
+        self._count("failures")
+        self._record_call(phase=phase, model=payload["model"], messages=messages, started_at=started_at,
+                          ok=False, attempts=attempt + 1)
+        return f"Error: Could not connect to the AI service. Details: {last_err}"
+
+    def execute_many(self, batch: List[dict], max_concurrency: Optional[int] = None) -> List[dict]:
+        """
+        Runs many independent execute() calls concurrently over the pooled transport.
+
+        Args:
+            batch: A list of execute() keyword-argument dicts.
+            max_concurrency: Optional lower cap for this batch. The backend-wide cap
+                             ('max_concurrency' in the config) always applies.
+
+        Returns:
+            One {"ok": bool, "content": str | None, "error": str | None} dict per request,
+            in the same order as `batch`.
+        """
+        semaphore = _batch_semaphore(self.endpoint, self.max_concurrency)
+        queued_at = time.perf_counter()
+
+        def execute_limited(**kwargs) -> str:
+            with semaphore:
+                # Time spent waiting for a worker thread and a backend slot.
+                _QUEUE_WAIT.set(time.perf_counter() - queued_at)
+                return self.execute(**kwargs)
+
+        return run_batch(execute_limited, batch, max_concurrency or self.max_concurrency)
+
+    async def execute_many_async(self, batch: List[dict], max_concurrency: Optional[int] = None) -> List[dict]:
+        """Async counterpart of execute_many(), built on execute_async()."""
+        limit = min(max_concurrency or self.max_concurrency, self.max_concurrency)
+        return await run_batch_async(self.execute_async, batch, limit)
+
+    def execute_stream(self, *, system_prompt: str, user_prompt: str, history: Optional[List[dict]] = None,
+                       retries: int = 2, phase: str = "synth", context_blocks: Optional[List[str]] = None) -> Iterator[str]:
+        """
+        Streams the LLM's answer token by token. Retries only apply until the first token
+        arrives; once text has been yielded a broken stream simply ends. On total failure
+        the usual error string is yielded as a single chunk.
+        """
+        started_at = time.perf_counter()
+        messages = self._build_messages(system_prompt, user_prompt, history, phase, context_blocks)
+        api_url, headers, payload = self._prepare_request(messages, False, phase=phase, stream=True)
+        if not api_url:
+            yield "Configuration Error: API URL is not set."
+            return
+
+        if self.debug_mode:
+            print(f"LLMService (stream) -> {self.api_mode.upper()} | phase={phase}")
+
+        self._count("calls")
+        expired = self._deadline_exceeded(phase)
+        if expired:
+            self._record_call(phase=phase, model=payload["model"], messages=messages, started_at=started_at,
+                              ok=False, attempts=0, stream=True)
+            yield expired
+            return
+
+        permit = self.breaker.acquire()
+        if permit is None:
+            self._count("short_circuited")
+            self._record_call(phase=phase, model=payload["model"], messages=messages, started_at=started_at,
+                              ok=False, attempts=0, stream=True)
+            yield self._unavailable_message()
+            return
+
+        session = get_http_session(api_url, self.pool_maxsize)
+
+        with permit, self._model_slot(payload["model"]) as slot:
+            if slot is None:  # The deadline ran out while the call waited for its model
+                self._record_call(phase=phase, model=payload["model"], messages=messages, started_at=started_at,
+                                  ok=False, attempts=0, stream=True)
+                yield self._slot_wait_exceeded(phase)
+                return
+            last_err = None
+            for attempt in range(retries + 1):
+                started = False
+                streamed, usage, ttfb = [], {}, None
+                timeout = self._get_timeout(phase)
+                try:
+                    with session.post(api_url, headers=headers, data=json.dumps(payload), timeout=timeout, stream=True) as resp:
+                        resp.raise_for_status()
+                        for raw_line in resp.iter_lines():
+                            token = self._parse_stream_line(raw_line.decode("utf-8"), usage)
+                            if token:
+                                if not started:
+                                    started = True
+                                    ttfb = time.perf_counter() - started_at
+                                    self.breaker.record_success()
+                                streamed.append(token)
+                                yield token
+                    slot.load_seconds = usage.get("load_seconds")
+                    self._record_completion(phase, "".join(streamed))
+                    self._record_cassette(payload, phase, False, "".join(streamed), started_at)
+                    self._record_call(phase=phase, model=payload["model"], messages=messages, started_at=started_at,
+                                      ok=True, attempts=attempt + 1, ttfb=ttfb, usage=usage,
+                                      content="".join(streamed), stream=True)
+                    return
+                except Exception as e:
+                    if started:
+                        if self.debug_mode:
+                            print(f"LLM stream interrupted after first token: {e}")
+                        self._record_call(phase=phase, model=payload["model"], messages=messages, started_at=started_at,
+                                          ok=False, attempts=attempt + 1, ttfb=ttfb, usage=usage,
+                                          content="".join(streamed), stream=True)
+                        return
+                    last_err = e
+                    delay = self._after_failure(e, attempt, retries)
+                    if delay is None:
+                        break
+                    time.sleep(delay)
+
+        self._count("failures")
+        self._record_call(phase=phase, model=payload["model"], messages=messages, started_at=started_at,
+                          ok=False, attempts=attempt + 1, stream=True)
+        yield f"Error: Could not connect to the AI service. Details: {last_err}"
+
+    async def execute_stream_async(self, *, system_prompt: str, user_prompt: str, history: Optional[List[dict]] = None,
+                                   retries: int = 2, phase: str = "synth",
+                                   context_blocks: Optional[List[str]] = None) -> AsyncIterator[str]:
+        """Async counterpart of execute_stream(), built on the shared httpx.AsyncClient."""
+        started_at = time.perf_counter()
+        messages = self._build_messages(system_prompt, user_prompt, history, phase, context_blocks)
+        api_url, headers, payload = self._prepare_request(messages, False, phase=phase, stream=True)
+        if not api_url:
+            yield "Configuration Error: API URL is not set."
+            return
+
+        if self.debug_mode:
+            print(f"LLMService (async stream) -> {self.api_mode.upper()} | phase={phase}")
+
+        self._count("calls")
+        expired = self._deadline_exceeded(phase)
+        if expired:
+            self._record_call(phase=phase, model=payload["model"], messages=messages, started_at=started_at,
+                              ok=False, attempts=0, stream=True)
+            yield expired
+            return
+
+        permit = self.breaker.acquire()
+        if permit is None:
+            self._count("short_circuited")
+            self._record_call(phase=phase, model=payload["model"], messages=messages, started_at=started_at,
+                              ok=False, attempts=0, stream=True)
+            yield self._unavailable_message()
+            return
+
+        client = get_async_http_client(api_url, self.pool_maxsize)
+
+        async with permit, self._model_slot_async(payload["model"]) as slot:
+            if slot is None:  # The deadline ran out while the call waited for its model
+                self._record_call(phase=phase, model=payload["model"], messages=messages, started_at=started_at,
+                                  ok=False, attempts=0, stream=True)
+                yield self._slot_wait_exceeded(phase)
+                return
+            last_err = None
+            for attempt in range(retries + 1):
+                started = False
+                streamed, usage, ttfb = [], {}, None
+                connect_timeout, read_timeout = self._get_timeout(phase)
+                timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+                try:
+                    async with client.stream("POST", api_url, headers=headers, content=json.dumps(payload), timeout=timeout) as resp:
+                        resp.raise_for_status()
+                        async for line in resp.aiter_lines():
+                            token = self._parse_stream_line(line, usage)
+                            if token:
+                                if not started:
+                                    started = True
+                                    ttfb = time.perf_counter() - started_at
+                                    self.breaker.record_success()
+                                streamed.append(token)
+                                yield token
+                    slot.load_seconds = usage.get("load_seconds")
+                    self._record_completion(phase, "".join(streamed))
+                    self._record_cassette(payload, phase, False, "".join(streamed), started_at)
+                    self._record_call(phase=phase, model=payload["model"], messages=messages, started_at=started_at,
+                                      ok=True, attempts=attempt + 1, ttfb=ttfb, usage=usage,
+                                      content="".join(streamed), stream=True)
+                    return
+                except Exception as e:
+                    if started:
+                        if self.debug_mode:
+                            print(f"LLM async stream interrupted after first token: {e}")
+                        self._record_call(phase=phase, model=payload["model"], messages=messages, started_at=started_at,
+                                          ok=False, attempts=attempt + 1, ttfb=ttfb, usage=usage,
+                                          content="".join(streamed), stream=True)
+                        return
+                    last_err = e
+                    delay = self._after_failure(e, attempt, retries)
+                    if delay is None:
+                        break
+                    await asyncio.sleep(delay)
+
+        self._count("failures")
+        self._record_call(phase=phase, model=payload["model"], messages=messages, started_at=started_at,
+                          ok=False, attempts=attempt + 1, stream=True)
+        yield f"Error: Could not connect to the AI service. Details: {last_err}"
@@ -0,0 +1,182 @@
+# backend/utils/ai_core/plan_cache.py
+
+"""
+This module contains the PlanCache, which skips the planner LLM for queries
+whose delexicalized pattern (e.g. "schedule of {PROGRAM} {YEAR}") has already
+been planned successfully. The cached plan_template is re-filled with the
+entities extracted from the new query and executed directly. Templates are only
+served once they have proven themselves, and are demoted automatically when
+their cached plans keep ending in FAIL_EMPTY or a fallback search.
+"""
+
+import copy
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional
+
+# Outcomes (see TrainingSystem) that count for or against a cached template.
+SUCCESS_OUTCOMES = {"SUCCESS_DIRECT"}
+FAILURE_OUTCOMES = {"FAIL_EMPTY", "SUCCESS_FALLBACK"}
+
+_PLACEHOLDER_RE = re.compile(r"\{(PROGRAM|YEAR|PERSON_NAME)\}")
+
+
+def normalize_pattern(pattern: str) -> str:
+    """Lowercases and collapses whitespace/trailing punctuation so trivially different phrasings share a key."""
+    return re.sub(r"\s+", " ", pattern.strip().lower()).rstrip(" ?.!")
+
+
+class PlanTemplate:
+    """One delexicalized tool call and how it has fared."""
+
+    def __init__(self, pattern: str, plan_template: dict, successes: int = 0):
+        self.pattern = pattern
+        self.plan_template = plan_template
+        self.successes = successes
+        self.failures = 0
+        self.served_failures = 0
+        self.hits = 0
+        self.demoted = False
+
+    @property
+    def success_rate(self) -> float:
+        total = self.successes + self.failures
+        return self.successes / total if total else 0.0
+
+    def to_dict(self) -> dict:
+        return {"pattern": self.pattern, "tool_name": self.plan_template.get("tool_name"), "hits": self.hits,
+                "successes": self.successes, "failures": self.failures,
+                "success_rate": round(self.success_rate, 3), "demoted": self.demoted}
+
+
+class PlanCache:
+    """
+    In-memory index of plan templates keyed on the normalized delexicalized query.
+    Thread-safe. Patterns come from PolicyEngine.delexicalize_query, the same
+    delexicalization used when dynamic examples are saved.
+    """
+
+    def __init__(self, policy_engine, config: Optional[dict] = None, debug_mode: bool = False):
+        config = config or {}
+        self.policy_engine = policy_engine
+        self.min_successes = config.get("min_successes", 2)
+        self.min_success_rate = config.get("min_success_rate", 0.8)
+        self.demote_after_failures = config.get("demote_after_failures", 2)
+        self.max_templates = config.get("max_templates", 2000)
+        self.debug_mode = debug_mode
+
+        self._templates: "OrderedDict[str, PlanTemplate]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"lookups": 0, "hits": 0, "misses": 0, "unfillable": 0, "demotions": 0, "replaced": 0}
+
+    def _add(self, key: str, pattern: str, plan_template: dict, successes: int) -> PlanTemplate:
+        entry = PlanTemplate(pattern, copy.deepcopy(plan_template), successes)
+        self._templates[key] = entry
+        self._templates.move_to_end(key)
+        while len(self._templates) > self.max_templates:
+            self._templates.popitem(last=False)
+        return entry
+
+    def seed(self, examples: Iterable[dict]) -> int:
+        """Loads saved dynamic examples ({user_pattern, plan_template, quality_label}). Returns the count."""
+        count = 0
+        with self._lock:
+            for example in examples:
+                pattern, template = example.get("user_pattern"), example.get("plan_template")
+                if not pattern or not isinstance(template, dict) or not template.get("tool_name"):
+                    continue
+                successes = 1 if str(example.get("quality_label", "")) in SUCCESS_OUTCOMES else 0
+                self._add(normalize_pattern(pattern), pattern, template, successes)
+                count += 1
+        return count
+
+    def _servable(self, entry: PlanTemplate) -> bool:
+        return (not entry.demoted and entry.successes >= self.min_successes
+                and entry.success_rate >= self.min_success_rate)
+
+    @staticmethod
+    def _fill(value: Any, entities: Dict[str, List[str]]) -> Any:
+        """Re-fills placeholders; raises KeyError when a placeholder has no single value to use."""
+        if isinstance(value, dict):
+            return {k: PlanCache._fill(v, entities) for k, v in value.items()}
+        if isinstance(value, list):
+            return [PlanCache._fill(v, entities) for v in value]
+        if not isinstance(value, str) or "{" not in value:
+            return value
+
+        def single(name: str) -> str:
+            values = set(entities.get(name) or [])
+            if len(values) != 1:
+                raise KeyError(name)
+            return values.pop()
+
+        whole = _PLACEHOLDER_RE.fullmatch(value)
+        if whole and whole.group(1) == "YEAR":
+            return int(single("YEAR"))
+        return _PLACEHOLDER_RE.sub(lambda m: single(m.group(1)), value)
+
+    def lookup(self, query: str) -> Optional[dict]:
+        """Returns a ready tool call for the query, or None if no servable template matches."""
+        pattern, entities = self.policy_engine.delexicalize_query(query)
+        key = normalize_pattern(pattern)
+        with self._lock:
+            self.stats["lookups"] += 1
+            entry = self._templates.get(key)
+            if entry is None or not self._servable(entry):
+                self.stats["misses"] += 1
+                return None
+            try:
+                tool_call = self._fill(entry.plan_template, entities)
+            except KeyError:
+                self.stats["unfillable"] += 1
+                return None
+            entry.hits += 1
+            self.stats["hits"] += 1
+        if self.debug_mode:
+            print(f"PlanCache hit for pattern '{entry.pattern}' -> {tool_call.get('tool_name')}")
+        return tool_call
+
+    def record_outcome(self, query: str, tool_call: Optional[dict], outcome: str, served: bool):
+        """
+        Updates the template for this query after the tool ran. Planner successes add or
+        reinforce templates; failures of served plans count towards demotion.
+        """
+        if not tool_call or not tool_call.get("tool_name"):
+            return
+        if outcome not in SUCCESS_OUTCOMES and outcome not in FAILURE_OUTCOMES:
+            return
+        templates = self.policy_engine.delexicalize(query, tool_call)
+        pattern, plan_template = templates["user_pattern"], templates["plan_template"]
+        key = normalize_pattern(pattern)
+        with self._lock:
+            entry = self._templates.get(key)
+            if entry is not None and entry.plan_template != plan_template and not served:
+                # The planner chose differently for this pattern. Only replace a template that isn't trusted yet.
+                if outcome in SUCCESS_OUTCOMES and not self._servable(entry):
+                    entry = self._add(key, pattern, plan_template, 0)
+                    self.stats["replaced"] += 1
+                else:
+                    return
+            if entry is None:
+                if outcome not in SUCCESS_OUTCOMES:
+                    return
+                entry = self._add(key, pattern, plan_template, 0)
+
+            if outcome in SUCCESS_OUTCOMES:
+                entry.successes += 1
+            else:
+                entry.failures += 1
+                entry.served_failures += served
+                if not entry.demoted and entry.served_failures >= self.demote_after_failures:
+                    entry.demoted = True
+                    self.stats["demotions"] += 1
+                    if self.debug_mode:
+                        print(f"PlanCache demoted pattern '{entry.pattern}' after outcome {outcome}")
+
+    def get_stats(self, top: int = 10) -> dict:
+        with self._lock:
+            entries = sorted(self._templates.values(), key=lambda e: e.hits, reverse=True)
+            return {**self.stats, "templates": len(self._templates),
+                    "servable": sum(1 for e in entries if self._servable(e)),
+                    "top_templates": [e.to_dict() for e in entries[:top]]}
@@ -0,0 +1,151 @@
+# backend/utils/ai_core/plan_executor.py
+
+"""
+This module contains the multi-step plan executor. A plan is a list of tool
+calls whose parameters may reference earlier results with `$field_from_step_N`
+placeholders (resolved by AIAnalyst._resolve_placeholders). The references form
+a dependency graph; every step whose dependencies have finished is started on
+the executor straight away, so independent steps (both halves of a schedule
+comparison, a profile and its grades) run concurrently.
+"""
+
+import contextvars
+import re
+import time
+from concurrent.futures import Executor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from .deadline import current_deadline
+
+PLACEHOLDER_RE = re.compile(r"^\$(\w+?)_from_step_(\d+)$")
+
+
+def placeholder_refs(value: Any) -> Set[int]:
+    """Step numbers referenced by `$field_from_step_N` strings anywhere in `value`."""
+    if isinstance(value, dict):
+        return set().union(*(placeholder_refs(v) for v in value.values())) if value else set()
+    if isinstance(value, list):
+        return set().union(*(placeholder_refs(v) for v in value)) if value else set()
+    if isinstance(value, str):
+        m = PLACEHOLDER_RE.match(value.strip())
+        return {int(m.group(2))} if m else set()
+    return set()
+
+
+def build_step_graph(steps: List[dict]) -> Dict[int, Set[int]]:
+    """
+    Maps each (1-based) step number to the steps it depends on. Steps may only reference
+    earlier steps, which keeps the graph acyclic; anything else raises ValueError.
+    """
+    graph = {}
+    for number, tool_call in enumerate(steps, start=1):
+        refs = placeholder_refs(tool_call.get("parameters") or {})
+        bad = sorted(ref for ref in refs if ref < 1 or ref >= number)
+        if bad:
+            raise ValueError(f"step {number} references step {bad[0]}, but steps can only use results of earlier steps")
+        graph[number] = refs
+    return graph
+
+
+class StepResult:
+    """Outcome of one plan step. `started_at` is relative to the start of the plan."""
+
+    def __init__(self, number: int, tool_name: str):
+        self.number = number
+        self.tool_name = tool_name
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.skipped: Optional[str] = None
+        self.usable = False
+        self.started_at: Optional[float] = None
+        self.duration: Optional[float] = None
+
+    def to_dict(self) -> dict:
+        return {"step": self.number, "tool_name": self.tool_name, "started_at": self.started_at,
+                "duration": self.duration, "usable": self.usable, "error": self.error, "skipped": self.skipped}
+
+
+class PlanRun:
+    """Outcome of run_plan(): one StepResult per step, plus the wall time of the whole plan."""
+
+    def __init__(self):
+        self.steps: Dict[int, StepResult] = {}
+        self.wall_time = 0.0
+
+    @property
+    def results(self) -> Dict[int, Any]:
+        return {n: step.result for n, step in self.steps.items() if step.error is None and step.skipped is None}
+
+    @property
+    def timings(self) -> Dict[int, Optional[float]]:
+        return {n: step.duration for n, step in sorted(self.steps.items())}
+
+    def to_dict(self) -> dict:
+        return {"wall_time": self.wall_time, "steps": [self.steps[n].to_dict() for n in sorted(self.steps)]}
+
+
+def run_plan(steps: List[dict], run_step: Callable[[int, dict, Dict[int, Any]], Any], executor: Executor,
+             is_usable: Callable[[Any], bool] = bool) -> PlanRun:
+    """
+    Runs the plan's tool calls as a DAG.
+
+    Args:
+        steps: Tool calls ({"tool_name", "parameters"}), in plan order.
+        run_step: Called as run_step(step_number, tool_call, results_of_finished_steps).
+        executor: Pool the steps run on. Each step gets a copy of the caller's context.
+        is_usable: Decides whether a step's result can feed later steps. Steps depending
+                   on an unusable, failed or skipped step are skipped rather than run
+                   with unresolved placeholders.
+    """
+    graph = build_step_graph(steps)
+    run = PlanRun()
+    plan_started = time.monotonic()
+    deadline = current_deadline()
+    pending = set(graph)
+    running = {}
+
+    def timed(number: int, tool_call: dict, results: Dict[int, Any]):
+        step = run.steps[number]
+        step.started_at = round(time.monotonic() - plan_started, 4)
+        t0 = time.monotonic()
+        try:
+            return run_step(number, tool_call, results)
+        finally:
+            step.duration = round(time.monotonic() - t0, 4)
+
+    def start_ready():
+        progressed = True
+        while progressed:
+            progressed = False
+            for number in sorted(pending):
+                deps = graph[number]
+                if any(dep in pending or dep in running.values() for dep in deps):
+                    continue
+                pending.discard(number)
+                progressed = True
+                step = run.steps[number] = StepResult(number, steps[number - 1].get("tool_name"))
+                unusable = [dep for dep in sorted(deps) if not run.steps[dep].usable]
+                if unusable:
+                    step.skipped = f"step {unusable[0]} produced no usable result"
+                elif deadline is not None and deadline.expired():
+                    step.skipped = "request deadline reached"
+                    deadline.cut(f"plan_step_{number}", "request deadline reached")
+                else:
+                    future = executor.submit(contextvars.copy_context().run, timed, number,
+                                             steps[number - 1], run.results)
+                    running[future] = number
+
+    start_ready()
+    while running:
+        done, _ = wait(running, return_when=FIRST_COMPLETED)
+        for future in done:
+            step = run.steps[running.pop(future)]
+            try:
+                step.result = future.result()
+                step.usable = bool(is_usable(step.result))
+            except Exception as e:
+                step.error = f"{type(e).__name__}: {e}"
+        start_ready()
+
+    run.wall_time = round(time.monotonic() - plan_started, 4)
+    return run
@@ -0,0 +1,281 @@
+# backend/utils/ai_core/plan_schema.py
+
+"""
+This module contains the planner's output contract: a JSON schema generated
+from the analyst's tool signatures (sent to Ollama as `format` and to Mistral
+as a `json_schema` response format, so the model can only emit a well-formed
+tool call or a multi-step plan), and a parser that validates a reply against
+the same signatures and explains what is wrong when it doesn't match.
+"""
+
+import inspect
+import json
+import re
+import typing
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .plan_executor import PLACEHOLDER_RE, build_step_graph
+
+_JSON_TYPES = {str: "string", int: "integer", float: "number", bool: "boolean", dict: "object", list: "array"}
+_FENCE_RE = re.compile(r"```(?:json)?\s*(.*?)```", re.DOTALL)
+
+
+def _request_clarification(question_for_user: str):
+    """Pseudo-tool: the planner asks the user a question instead of running a tool."""
+
+
+# Tool names the planner may emit that are handled by the plan loop, not by a tool method.
+PLANNER_PSEUDO_TOOLS: Dict[str, Callable] = {"request_clarification": _request_clarification}
+
+
+def _annotation_schema(annotation: Any) -> dict:
+    """Maps a parameter annotation to a JSON schema fragment ({} accepts anything)."""
+    if annotation is inspect.Parameter.empty or annotation is Any:
+        return {}
+    origin, args = typing.get_origin(annotation), typing.get_args(annotation)
+    if origin is typing.Union:
+        options = [_annotation_schema(a) for a in args if a is not type(None)]
+        schema = options[0] if len(options) == 1 else {}
+        return {"anyOf": [schema, {"type": "null"}]} if type(None) in args and schema else schema
+    if origin in (list, tuple):
+        return {"type": "array", "items": _annotation_schema(args[0])} if args else {"type": "array"}
+    if origin is dict:
+        return {"type": "object"}
+    return {"type": _JSON_TYPES[annotation]} if annotation in _JSON_TYPES else {}
+
+
+def _tool_parameters(tool: Callable) -> Dict[str, inspect.Parameter]:
+    return {name: p for name, p in inspect.signature(tool).parameters.items()
+            if name != "self" and p.kind not in (p.VAR_POSITIONAL, p.VAR_KEYWORD)}
+
+
+def _parameter_schema(param: inspect.Parameter) -> dict:
+    """The JSON schema fragment of one tool parameter; a parameter defaulting to None also accepts null."""
+    schema = _annotation_schema(param.annotation)
+    if param.default is None and schema and "anyOf" not in schema:
+        schema = {"anyOf": [schema, {"type": "null"}]}
+    return schema
+
+
+def _matches(value: Any, schema: dict) -> bool:
+    """True if a decoded JSON value fits a _parameter_schema() fragment. Numeric strings pass as numbers."""
+    if not schema:
+        return True
+    if "anyOf" in schema:
+        return any(_matches(value, option) for option in schema["anyOf"])
+    expected = schema.get("type")
+    if expected == "null":
+        return value is None
+    if expected == "boolean":
+        return isinstance(value, bool)
+    if expected in ("integer", "number"):
+        if isinstance(value, str):  # The tools take "2" as well as 2 for a year level
+            value = value.strip()
+            return value.lstrip("-").isdigit() if expected == "integer" else _is_float(value)
+        return isinstance(value, (int, float) if expected == "number" else int) and not isinstance(value, bool)
+    if expected == "array":
+        return isinstance(value, list) and all(_matches(item, schema.get("items", {})) for item in value)
+    return isinstance(value, {"string": str, "object": dict}.get(expected, object))
+
+
+def _is_float(text: str) -> bool:
+    try:
+        float(text)
+        return True
+    except ValueError:
+        return False
+
+
+def _describe(schema: dict) -> str:
+    if "anyOf" in schema:
+        return " or ".join(_describe(option) for option in schema["anyOf"])
+    if schema.get("type") == "array" and schema.get("items"):
+        return f"an array of {_describe(schema['items'])}"
+    return schema.get("type", "any value")
+
+
+def _json_type(value: Any) -> str:
+    if value is None:
+        return "null"
+    return next((name for py_type, name in reversed(list(_JSON_TYPES.items())) if isinstance(value, py_type)
+                 and not (py_type is int and isinstance(value, bool))), type(value).__name__)
+
+
+def _tool_call_branches(tools: Dict[str, Callable], allow_placeholders: bool = False) -> list:
+    branches = []
+    for name, tool in tools.items():
+        properties, required = {}, []
+        for param_name, param in _tool_parameters(tool).items():
+            schema = _parameter_schema(param)
+            if allow_placeholders and schema:
+                schema = {"anyOf": [schema, {"type": "string"}]}  # "$field_from_step_N"
+            properties[param_name] = schema
+            if param.default is inspect.Parameter.empty:
+                required.append(param_name)
+        branches.append({
+            "type": "object",
+            "properties": {
+                "tool_name": {"type": "string", "const": name},
+                "parameters": {"type": "object", "properties": properties, "required": required,
+                               "additionalProperties": False},
+            },
+            "required": ["tool_name", "parameters"],
+            "additionalProperties": False,
+        })
+    return branches
+
+
+def build_tool_call_schema(tools: Dict[str, Callable]) -> dict:
+    """
+    Builds the schema of a single planner tool call, {"tool_name": ..., "parameters": {...}},
+    with one branch per tool so each tool only accepts its own parameters.
+
+    Args:
+        tools: Tool name -> callable. Parameter names, annotations and defaults are used;
+               a parameter defaulting to None also accepts null.
+    """
+    return {"title": "tool_call", "anyOf": _tool_call_branches(tools)}
+
+
+def build_plan_schema(tools: Dict[str, Callable], step_tools: Dict[str, Callable], max_steps: int) -> dict:
+    """
+    Builds the schema of a planner reply: either a single tool call (any of `tools`), or
+    {"plan": [{"tool_call": ...}, ...]} with up to `max_steps` calls to `step_tools`, whose
+    parameters may also be "$field_from_step_N" placeholders.
+    """
+    plan = {
+        "type": "object",
+        "properties": {
+            "plan": {
+                "type": "array", "minItems": 1, "maxItems": max_steps,
+                "items": {
+                    "type": "object",
+                    "properties": {"tool_call": {"anyOf": _tool_call_branches(step_tools, allow_placeholders=True)}},
+                    "required": ["tool_call"],
+                    "additionalProperties": False,
+                },
+            },
+        },
+        "required": ["plan"],
+        "additionalProperties": False,
+    }
+    return {"title": "plan", "anyOf": _tool_call_branches(tools) + [plan]}
+
+
+def extract_json_object(text: Optional[str]) -> Tuple[Optional[dict], Optional[str]]:
+    """
+    Returns the first complete JSON object in `text` (which may be wrapped in markdown
+    fences or prose), or (None, reason) if there is none. Unlike a greedy regex, trailing
+    text containing braces doesn't break the match.
+    """
+    if not text or not text.strip():
+        return None, "the reply was empty"
+    fenced = _FENCE_RE.search(text)
+    if fenced:
+        text = fenced.group(1)
+    decoder = json.JSONDecoder()
+    first_error = None
+    start = text.find("{")
+    while start != -1:
+        try:
+            value, _ = decoder.raw_decode(text, start)
+            if isinstance(value, dict):
+                return value, None
+        except json.JSONDecodeError as e:
+            first_error = first_error or f"invalid JSON: {e.msg} at line {e.lineno} column {e.colno}"
+        start = text.find("{", start + 1)
+    return None, first_error or "the reply contains no JSON object"
+
+
+def parse_tool_call(text: Optional[str], tools: Dict[str, Callable]) -> Tuple[Optional[dict], Optional[str]]:
+    """
+    Parses and validates a planner reply against the tool signatures.
+
+    Returns:
+        ({"tool_name": ..., "parameters": {...}}, None) on success, or (None, error) where
+        the error is specific enough to be sent back to the model in a re-prompt.
+    """
+    call, error = extract_json_object(text)
+    if call is None:
+        return None, error
+    return validate_tool_call(call, tools)
+
+
+def validate_tool_call(call: Any, tools: Dict[str, Callable],
+                       allow_placeholders: bool = False) -> Tuple[Optional[dict], Optional[str]]:
+    """
+    Checks one decoded tool call against the tool signatures: the tool exists, required
+    parameters are there, and every parameter is known and of its annotated type. With
+    `allow_placeholders` (plan steps), "$field_from_step_N" strings pass for any type.
+    Same return contract as parse_tool_call.
+    """
+    if not isinstance(call, dict):
+        return None, "the tool call is not an object"
+    tool_name = call.get("tool_name")
+    if not isinstance(tool_name, str) or not tool_name:
+        return None, "the object has no 'tool_name' string"
+    if tool_name not in tools:
+        return None, f"'{tool_name}' is not an available tool; choose one of: {', '.join(sorted(tools))}"
+    params = call.get("parameters")
+    if params is None:
+        params = {}
+    if not isinstance(params, dict):
+        return None, f"'parameters' for '{tool_name}' must be an object, got {type(params).__name__}"
+    expected = _tool_parameters(tools[tool_name])
+    missing = [name for name, p in expected.items() if p.default is inspect.Parameter.empty and name not in params]
+    if missing:
+        return None, f"'{tool_name}' is missing required parameter(s): {', '.join(missing)}"
+    unknown = [name for name in params if name not in expected]
+    if unknown:
+        return None, (f"'{tool_name}' has no parameter(s) {', '.join(unknown)}; "
+                      f"its parameters are: {', '.join(expected) or 'none'}")
+    for name, value in params.items():
+        if allow_placeholders and isinstance(value, str) and PLACEHOLDER_RE.match(value.strip()):
+            continue
+        schema = _parameter_schema(expected[name])
+        if not _matches(value, schema):
+            return None, (f"parameter '{name}' of '{tool_name}' must be {_describe(schema)}, "
+                          f"got {_json_type(value)} {json.dumps(value, default=str)[:60]}")
+    return {"tool_name": tool_name, "parameters": params}, None
+
+
+def parse_plan(text: Optional[str], tools: Dict[str, Callable], step_tools: Dict[str, Callable],
+               max_steps: int) -> Tuple[Optional[dict], Optional[str]]:
+    """
+    Parses a planner reply that is either a single tool call or a multi-step plan.
+
+    Returns:
+        ({"plan": [{"tool_call": ...}, ...]}, None) on success, or (None, error). A trailing
+        "finish_plan" step is accepted and dropped; placeholders may only point backwards.
+    """
+    obj, error = extract_json_object(text)
+    if obj is None:
+        return None, error
+    if "plan" not in obj:
+        call, error = validate_tool_call(obj, tools)
+        return ({"plan": [{"tool_call": call}]}, None) if call else (None, error)
+
+    steps = obj["plan"]
+    if not isinstance(steps, list) or not steps:
+        return None, "'plan' must be a non-empty list of {\"tool_call\": ...} steps"
+    if isinstance(steps[-1], dict) and (steps[-1].get("tool_call") or {}).get("tool_name") == "finish_plan":
+        steps = steps[:-1]
+    if len(steps) > max_steps:
+        return None, f"the plan has {len(steps)} steps; use at most {max_steps}"
+
+    calls = []
+    for number, step in enumerate(steps, start=1):
+        call, error = validate_tool_call(step.get("tool_call") if isinstance(step, dict) else None, step_tools,
+                                         allow_placeholders=True)
+        if call is None:
+            if isinstance(step, dict) and isinstance(step.get("tool_call"), dict) \
+                    and step["tool_call"].get("tool_name") in tools \
+                    and step["tool_call"].get("tool_name") not in step_tools:
+                error = f"'{step['tool_call']['tool_name']}' can only be used on its own, not as a plan step"
+            return None, f"step {number}: {error}"
+        calls.append(call)
+    try:
+        build_step_graph(calls)
+    except ValueError as e:
+        return None, str(e)
+    return {"plan": [{"tool_call": call} for call in calls]}, None
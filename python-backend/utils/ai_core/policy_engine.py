@@ -3,7 +3,7 @@
 import re
 import copy
 import spacy # <-- Import spacy
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
 
 class PolicyEngine:
     """
@@ -12,6 +12,7 @@ class PolicyEngine:
     """
     def __init__(self, known_programs: List[str]):
         self.known_programs = {p.lower() for p in known_programs}
+        self.program_names = {p.lower(): p for p in known_programs}  # Lowercase -> canonical spelling
         
         # Load the small English SpaCy model.
         # This happens once when the AIAnalyst starts.
@@ -24,39 +25,56 @@ class PolicyEngine:
 
     # In policy_engine.py
 
-    def delexicalize(self, query: str, plan: Dict[str, Any]) -> Dict[str, Any]:
+    def delexicalize_query(self, query: str) -> Tuple[str, Dict[str, List[str]]]:
+        """
+        Replaces programs, year levels and person names in a query with the {PROGRAM},
+        {YEAR} and {PERSON_NAME} placeholders. Returns the pattern and the values that
+        were replaced, per placeholder (programs in canonical spelling, years as digits).
+        """
         user_pattern = query
-        plan_template = copy.deepcopy(plan)
-        params = plan_template.get("parameters", {})
+        entities = {"PROGRAM": [], "YEAR": [], "PERSON_NAME": []}
 
         # --- Phase 1: Use Regex for simple, predictable entities ---
         # 1. Replace known programs
         for prog in self.known_programs:
             prog_pattern = re.compile(r'\b' + re.escape(prog) + r'\b', re.IGNORECASE)
-            if prog_pattern.search(user_pattern):
+            matches = prog_pattern.findall(user_pattern)
+            if matches:
+                entities["PROGRAM"].extend(self.program_names.get(prog, m) for m in matches)
                 user_pattern = prog_pattern.sub('{PROGRAM}', user_pattern)
-            for key, value in params.items():
-                if isinstance(value, str) and prog_pattern.search(value):
-                    params[key] = '{PROGRAM}'
 
-        # --- START OF NEWLY ADDED BLOCK ---
         # 2. Replace year levels (e.g., "2", "3rd year")
         year_pattern = re.compile(r'\b\d(?:st|nd|rd|th)?\s*year\b|\b\d\b', re.IGNORECASE)
-        if year_pattern.search(user_pattern):
-            user_pattern = year_pattern.sub('{YEAR}', user_pattern)
-        for key, value in params.items():
-            # Check for the specific parameter name and that it has a value
-            if key == "year_level" and value:
-                params[key] = '{YEAR}'
-        # --- END OF NEWLY ADDED BLOCK ---
+        for match in year_pattern.finditer(user_pattern):
+            entities["YEAR"].append(re.search(r'\d', match.group(0)).group(0))
+        user_pattern = year_pattern.sub('{YEAR}', user_pattern)
 
         # --- Phase 2: Use SpaCy for robust Person Name Recognition ---
         if self.nlp:
             doc = self.nlp(user_pattern)
             for ent in doc.ents:
                 if ent.label_ == "PERSON":
+                    entities["PERSON_NAME"].append(ent.text)
                     user_pattern = user_pattern.replace(ent.text, '{PERSON_NAME}')
 
+        return user_pattern, entities
+
+    def delexicalize(self, query: str, plan: Dict[str, Any]) -> Dict[str, Any]:
+        user_pattern, _ = self.delexicalize_query(query)
+        plan_template = copy.deepcopy(plan)
+        params = plan_template.get("parameters", {})
+
+        for prog in self.known_programs:
+            prog_pattern = re.compile(r'\b' + re.escape(prog) + r'\b', re.IGNORECASE)
+            for key, value in params.items():
+                if isinstance(value, str) and prog_pattern.search(value):
+                    params[key] = '{PROGRAM}'
+
+        for key, value in params.items():
+            # Check for the specific parameter name and that it has a value
+            if key == "year_level" and value:
+                params[key] = '{YEAR}'
+
         for key, value in params.items():
             if "name" in key and isinstance(value, str) and value:
                 params[key] = '{PERSON_NAME}'
@@ -114,6 +114,32 @@ PROMPT_TEMPLATES = {
           
         
 
+        --- MULTI-STEP PLANS (compound questions only) ---
+        If the query asks for two or more things that need different tool calls, respond with a plan instead of a single tool call: {{"plan": [{{"tool_call": ...}}, {{"tool_call": ...}}]}}.
+        - Steps that don't depend on each other run at the same time.
+        - A step can use a field from an earlier step's result with the placeholder "$<field>_from_step_<N>" (e.g., "$program_from_step_1"). Only refer to EARLIER steps.
+        - Use a single tool call whenever one tool can answer the query. Never put `answer_conversational_query` or `request_clarification` in a plan.
+
+        EXAMPLE (Independent steps -> plan):
+        User Query: "show the profile and the grades of -name-"
+        Your JSON Response:
+        {{
+            "plan": [
+                {{"tool_call": {{"tool_name": "get_person_profile", "parameters": {{"person_name": "-name-"}}}}}},
+                {{"tool_call": {{"tool_name": "get_student_grades", "parameters": {{"student_name": "-name-"}}}}}}
+            ]
+        }}
+
+        EXAMPLE (Dependent steps -> plan):
+        User Query: "who is the adviser of -name-'s class?"
+        Your JSON Response:
+        {{
+            "plan": [
+                {{"tool_call": {{"tool_name": "get_person_profile", "parameters": {{"person_name": "-name-"}}}}}},
+                {{"tool_call": {{"tool_name": "get_adviser_info", "parameters": {{"program": "$program_from_step_1", "year_level": "$year_level_from_step_1"}}}}}}
+            ]
+        }}
+
         --- HOW TO USE EXAMPLES ---
         The examples from memory use placeholders like {{PERSON_NAME}} or {{PROGRAM}}. You MUST NOT copy these placeholders literally. Your job is to fill them with the actual values found in the current user's query.
           
@@ -176,7 +202,7 @@ PROMPT_TEMPLATES = {
         {dynamic_examples}
         ---
         CRITICAL FINAL INSTRUCTION:
-        Your entire response MUST be a single, raw JSON object containing "tool_name" and "parameters".
+        Your entire response MUST be a single, raw JSON object containing "tool_name" and "parameters", or a "plan" for a compound question.
         """,
     
 
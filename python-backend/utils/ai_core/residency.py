@@ -0,0 +1,207 @@
+# backend/utils/ai_core/residency.py
+
+"""
+This module contains the ModelResidencyScheduler, which keeps track of which
+models a local Ollama server has loaded and orders concurrent calls so that
+calls for an already-loaded model run before the server is made to swap
+weights (a multi-second reload on CPU-only machines).
+"""
+
+import time
+import asyncio
+import threading
+from collections import OrderedDict, defaultdict
+from contextlib import contextmanager
+from typing import Dict, Iterable, Optional
+
+from .llm_metrics import RollingHistogram
+
+
+class ResidencyTimeout(TimeoutError):
+    """Raised by acquire() when the model could not be admitted within the timeout."""
+
+
+class ResidencySlot:
+    """Handed to a call while it holds its model. Set `load_seconds` from the response if known."""
+
+    def __init__(self, model: Optional[str] = None, queue_wait: float = 0.0, swapped: bool = False):
+        self.model = model
+        self.queue_wait = queue_wait
+        self.swapped = swapped
+        self.load_seconds: Optional[float] = None
+
+
+class ModelResidencyScheduler:
+    """
+    Admission control for one Ollama endpoint that can hold `max_loaded_models` models.
+
+    - A call for a resident model runs at once, unless a call for another model has
+      already been held for `max_hold_seconds` (so a swap can never be starved).
+    - A call for a non-resident model runs once a slot is free, or once the least
+      recently used resident model has no calls in flight or queued. Held calls for
+      the resident model therefore run before the swap, which batches calls per model.
+    """
+
+    def __init__(self, name: str, max_loaded_models: int = 1, max_hold_seconds: float = 2.0):
+        self.name = name
+        self.max_loaded_models = max(1, max_loaded_models)
+        self.max_hold_seconds = max_hold_seconds
+
+        self._cond = threading.Condition()
+        self._resident: "OrderedDict[str, float]" = OrderedDict()  # model -> last admission time
+        self._in_flight: Dict[str, int] = defaultdict(int)
+        self._waiting: Dict[str, list] = defaultdict(list)  # model -> enqueue times of held calls
+        self.swap_seconds = RollingHistogram()
+        self.stats = {"admitted": 0, "held": 0, "swaps": 0, "reordered": 0, "timed_out": 0}
+
+    # --- state (call with the condition held) ---
+
+    def _overdue_other(self, model: str, now: float) -> bool:
+        """True if a call for a different, non-resident model has waited past the hold limit."""
+        for other, times in self._waiting.items():
+            if other != model and other not in self._resident and times and now - min(times) >= self.max_hold_seconds:
+                return True
+        return False
+
+    def _eviction_victim(self, model: str, now: float) -> Optional[str]:
+        """Returns the resident model to unload for `model`, or None if none can go yet."""
+        overdue = bool(self._waiting[model]) and now - min(self._waiting[model]) >= self.max_hold_seconds
+        for candidate in self._resident:  # Least recently used first
+            if self._in_flight[candidate]:
+                continue
+            if self._waiting[candidate] and not overdue:
+                continue  # Let the queued calls for the loaded model go first
+            return candidate
+        return None
+
+    def _can_run(self, model: str, now: float) -> bool:
+        if model in self._resident:
+            return not (len(self._resident) >= self.max_loaded_models and self._overdue_other(model, now))
+        if len(self._resident) < self.max_loaded_models:
+            return True
+        return self._eviction_victim(model, now) is not None
+
+    # --- public API ---
+
+    def acquire(self, model: str, timeout: Optional[float] = None) -> ResidencySlot:
+        """
+        Blocks until `model` may run, then marks it in flight. Raises ResidencyTimeout
+        if that takes longer than `timeout` seconds (None waits as long as needed).
+        """
+        with self._cond:
+            enqueued = time.monotonic()
+            self._waiting[model].append(enqueued)
+            held = False
+            while not self._can_run(model, time.monotonic()):
+                wait = max(0.05, self.max_hold_seconds / 4)
+                if timeout is not None:
+                    left = enqueued + timeout - time.monotonic()
+                    if left <= 0:
+                        self._waiting[model].remove(enqueued)
+                        self.stats["timed_out"] += 1
+                        self._cond.notify_all()  # Another model may be admissible without this call queued
+                        raise ResidencyTimeout(f"{model} was not admitted on {self.name} within {timeout:.2f}s")
+                    wait = min(wait, left)
+                held = True
+                self._cond.wait(timeout=wait)
+            now = time.monotonic()
+            swapped = model not in self._resident
+            if swapped and len(self._resident) >= self.max_loaded_models:
+                # Picked while this call still counts as waiting, so an overdue swap can evict.
+                victim = self._eviction_victim(model, now)
+                if victim is not None:
+                    del self._resident[victim]
+            self._waiting[model].remove(enqueued)
+
+            if any(times and min(times) < enqueued for other, times in self._waiting.items() if other != model):
+                self.stats["reordered"] += 1  # Admitted ahead of an older call for another model
+            if swapped:
+                self.stats["swaps"] += 1
+            self._resident[model] = now
+            self._resident.move_to_end(model)
+            self._in_flight[model] += 1
+            self.stats["admitted"] += 1
+            if held:
+                self.stats["held"] += 1
+            return ResidencySlot(model, now - enqueued, swapped)
+
+    def release(self, slot: ResidencySlot):
+        with self._cond:
+            self._in_flight[slot.model] -= 1
+            if slot.swapped and slot.load_seconds:
+                self.swap_seconds.observe(slot.load_seconds)
+            self._cond.notify_all()
+
+    async def acquire_async(self, model: str, timeout: Optional[float] = None) -> ResidencySlot:
+        """
+        acquire() on a worker thread. A cancelled await cannot stop that thread, so if
+        the caller is cancelled the slot the thread goes on to get is released at once
+        instead of leaking.
+        """
+        lock = threading.Lock()
+        handoff = {"abandoned": False, "slot": None}
+
+        def acquire() -> Optional[ResidencySlot]:
+            slot = self.acquire(model, timeout)
+            with lock:
+                if not handoff["abandoned"]:
+                    handoff["slot"] = slot
+                    return slot
+            self.release(slot)
+            return None
+
+        try:
+            return await asyncio.to_thread(acquire)
+        except asyncio.CancelledError:
+            with lock:
+                handoff["abandoned"] = True
+                slot = handoff["slot"]  # Acquired, but the caller was cancelled before it resumed
+            if slot is not None:
+                self.release(slot)
+            raise
+
+    @contextmanager
+    def slot(self, model: str, timeout: Optional[float] = None):
+        slot = self.acquire(model, timeout)
+        try:
+            yield slot
+        finally:
+            self.release(slot)
+
+    def seed(self, models: Iterable[str]):
+        """Marks models as already loaded (e.g. from Ollama's /api/ps at startup)."""
+        with self._cond:
+            for model in list(models)[-self.max_loaded_models:]:
+                self._resident[model] = time.monotonic()
+            while len(self._resident) > self.max_loaded_models:
+                self._resident.popitem(last=False)
+
+    def resident_models(self) -> list:
+        with self._cond:
+            return list(self._resident)
+
+    def snapshot(self) -> dict:
+        with self._cond:
+            return {
+                "name": self.name,
+                "resident": list(self._resident),
+                "in_flight": {m: n for m, n in self._in_flight.items() if n},
+                "waiting": {m: len(t) for m, t in self._waiting.items() if t},
+                "max_loaded_models": self.max_loaded_models,
+                **self.stats,
+                "swap_seconds": self.swap_seconds.summary(),
+            }
+
+
+_SCHEDULERS: Dict[str, ModelResidencyScheduler] = {}
+_SCHEDULERS_LOCK = threading.Lock()
+
+
+def get_residency_scheduler(name: str, **settings) -> ModelResidencyScheduler:
+    """Returns the process-wide scheduler for an Ollama endpoint, creating it on first use."""
+    with _SCHEDULERS_LOCK:
+        scheduler = _SCHEDULERS.get(name)
+        if scheduler is None:
+            scheduler = ModelResidencyScheduler(name, **settings)
+            _SCHEDULERS[name] = scheduler
+        return scheduler
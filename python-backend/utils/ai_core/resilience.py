@@ -0,0 +1,213 @@
+# backend/utils/ai_core/resilience.py
+
+"""
+This module contains the retry and failure-isolation helpers used by LLMService:
+exponential backoff with jitter, Retry-After parsing, and a per-endpoint
+circuit breaker.
+"""
+
+import itertools
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+
+def backoff_delay(attempt: int, base_delay: float = 0.5, max_delay: float = 8.0,
+                  retry_after: Optional[float] = None, max_retry_after: float = 30.0) -> float:
+    """
+    Returns how long to sleep before retry number `attempt` (0-based).
+
+    Uses "full jitter" exponential backoff: a random delay between 0 and
+    min(max_delay, base_delay * 2**attempt). If the server sent Retry-After,
+    that value wins, capped at max_retry_after so one header cannot stall a worker.
+    """
+    if retry_after is not None and retry_after >= 0:
+        return min(retry_after, max_retry_after)
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parses a Retry-After header given either as delta-seconds or as an HTTP date."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class BreakerPermit:
+    """
+    Returned by CircuitBreaker.acquire() for a call that may proceed. Holds the
+    half-open probe slot, if the call took one, until release() - which the call
+    makes in a `finally` (or by using the permit as a context manager) so that a
+    cancelled or abandoned probe does not leave the breaker waiting for a result.
+    """
+
+    def __init__(self, breaker: "CircuitBreaker", probe_id: Optional[int] = None):
+        self.breaker = breaker
+        self.probe_id = probe_id
+
+    @property
+    def is_probe(self) -> bool:
+        return self.probe_id is not None
+
+    def release(self):
+        """Frees the probe slot if it is still held. Safe to call more than once."""
+        if self.probe_id is not None:
+            self.breaker._release_probe(self.probe_id)
+            self.probe_id = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.release()
+
+
+class CircuitBreaker:
+    """
+    A classic three-state circuit breaker for one backend endpoint.
+
+    - CLOSED: calls flow normally; consecutive failures are counted.
+    - OPEN: after `failure_threshold` consecutive failures, calls fail fast
+      for `recovery_timeout` seconds instead of waiting on a dead backend.
+    - HALF_OPEN: after the timeout, a limited number of probe calls are let
+      through. A success closes the breaker; a failure re-opens it. A probe
+      that ends without either (cancelled, abandoned) frees its slot through
+      its BreakerPermit, and one that has been out for `probe_timeout` seconds
+      is reclaimed so a lost probe cannot hold the breaker half-open for good.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_timeout: float = 30.0,
+                 half_open_max_calls: int = 1, probe_timeout: float = 120.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.probe_timeout = probe_timeout
+
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probes: Dict[int, float] = {}  # probe id -> start time, while HALF_OPEN
+        self._probe_ids = itertools.count(1)
+        self.stats = {"successes": 0, "failures": 0, "short_circuited": 0, "times_opened": 0,
+                      "probes_reclaimed": 0}
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        # Must be called with the lock held. Moves OPEN -> HALF_OPEN once the timeout passes,
+        # and reclaims half-open probes that have been out for longer than probe_timeout.
+        now = time.monotonic()
+        if self._state == self.OPEN and now - self._opened_at >= self.recovery_timeout:
+            self._state = self.HALF_OPEN
+            self._probes.clear()
+        elif self._state == self.HALF_OPEN:
+            for probe_id, started in list(self._probes.items()):
+                if now - started >= self.probe_timeout:
+                    del self._probes[probe_id]
+                    self.stats["probes_reclaimed"] += 1
+        return self._state
+
+    def acquire(self) -> Optional[BreakerPermit]:
+        """Returns a permit if a call may proceed, or None to fail fast. Release the permit when the call ends."""
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return BreakerPermit(self)
+            if state == self.HALF_OPEN and len(self._probes) < self.half_open_max_calls:
+                probe_id = next(self._probe_ids)
+                self._probes[probe_id] = time.monotonic()
+                return BreakerPermit(self, probe_id)
+            self.stats["short_circuited"] += 1
+            return None
+
+    def allow_request(self) -> bool:
+        """
+        Returns True if a call may proceed; False means fail fast. A probe taken this
+        way is only freed by record_success()/record_failure() or probe_timeout, so
+        prefer acquire() where the call can be cancelled.
+        """
+        return self.acquire() is not None
+
+    def _release_probe(self, probe_id: int):
+        with self._lock:
+            self._probes.pop(probe_id, None)
+
+    def is_available(self) -> bool:
+        """Non-mutating check used by callers that want to degrade before trying."""
+        with self._lock:
+            state = self._current_state()
+            return state == self.CLOSED or (state == self.HALF_OPEN and len(self._probes) < self.half_open_max_calls)
+
+    def record_success(self):
+        with self._lock:
+            self.stats["successes"] += 1
+            self._consecutive_failures = 0
+            self._probes.clear()
+            self._state = self.CLOSED
+
+    def record_failure(self):
+        with self._lock:
+            self.stats["failures"] += 1
+            self._consecutive_failures += 1
+            state = self._current_state()
+            if state == self.HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+                if state != self.OPEN:
+                    self.stats["times_opened"] += 1
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probes.clear()
+
+    def snapshot(self) -> dict:
+        """Returns the breaker's state and counters for monitoring."""
+        with self._lock:
+            state = self._current_state()
+            retry_in = max(0.0, self.recovery_timeout - (time.monotonic() - self._opened_at)) if state == self.OPEN else 0.0
+            return {
+                "name": self.name,
+                "state": state,
+                "consecutive_failures": self._consecutive_failures,
+                "retry_in_seconds": round(retry_in, 2),
+                **self.stats,
+            }
+
+
+_BREAKERS: Dict[str, CircuitBreaker] = {}
+_BREAKERS_LOCK = threading.Lock()
+
+
+def get_circuit_breaker(name: str, **settings) -> CircuitBreaker:
+    """Returns the process-wide breaker for an endpoint, creating it on first use."""
+    with _BREAKERS_LOCK:
+        breaker = _BREAKERS.get(name)
+        if breaker is None:
+            breaker = CircuitBreaker(name, **settings)
+            _BREAKERS[name] = breaker
+        return breaker
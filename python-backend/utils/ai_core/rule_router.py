@@ -0,0 +1,208 @@
+# backend/utils/ai_core/rule_router.py
+
+"""
+This module contains the RuleRouter, a tier-0 router that sits in front of the
+planner LLM. Queries that match exactly one rule (a PDM ID, a greeting, "schedule
+of BSIT 2nd year", "grades of <name>", ...) are turned into a complete tool call
+without any LLM. Rules live in a JSON file (config/routing_rules.json) that is
+reloaded automatically when it changes. Entities are matched against the values
+the analyst preloads from the database (programs, departments, positions).
+
+Rule fields:
+    name         Identifier, reported in the stats.
+    tool_name    Tool to call.
+    exact        Match only these whole queries (case-insensitive, trailing punctuation ignored).
+    pattern      Regex searched in the query; named groups become parameters.
+    keywords     At least one must appear in the query.
+    exclude      None of these may appear in the query.
+    require      Entities that must be found exactly once (program, department, position,
+                 year_level, section).
+    optional     Entities used if found; a rule never guesses between several values.
+    forbid       Entities that must NOT be found (e.g. a program in "grades of <name>").
+    param_names  Entity -> parameter name, when they differ (e.g. {"position": "role"}).
+    params       Constant parameters added to the call.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+ENTITY_TYPES = ("program", "department", "position", "year_level", "section")
+
+_WORD_YEARS = {"first": 1, "second": 2, "third": 3, "fourth": 4}
+_YEAR_RE = re.compile(r"\b(?:([1-4])(?:st|nd|rd|th)?|(first|second|third|fourth))[\s-]*year\b|\byear[\s-]*([1-4])\b",
+                      re.IGNORECASE)
+_YEAR_SECTION_RE = re.compile(r"\b([1-4])([a-z])\b", re.IGNORECASE)  # "BSIT 2A"
+_SECTION_RE = re.compile(r"\bsection\s+([a-z0-9]{1,3})\b", re.IGNORECASE)
+
+
+def _normalize(query: str) -> str:
+    return re.sub(r"\s+", " ", query.strip().lower()).rstrip(" ?.!")
+
+
+class RuleRouter:
+    """Thread-safe. route() returns (tool_call, rule_name) or (None, None)."""
+
+    def __init__(self, rules_path: str, vocabularies: Optional[Dict[str, Iterable[str]]] = None,
+                 reload_interval_seconds: float = 2.0, debug_mode: bool = False):
+        self.rules_path = rules_path
+        self.reload_interval_seconds = reload_interval_seconds
+        self.debug_mode = debug_mode
+        self._lock = threading.Lock()
+        self._rules: List[dict] = []
+        self._mtime: Optional[float] = None
+        self._checked_at = 0.0
+        self._vocab_patterns: Dict[str, List[Tuple[re.Pattern, str]]] = {}
+        self.stats = {"routed": 0, "no_match": 0, "ambiguous": 0, "reloads": 0, "by_rule": {}}
+        self.set_vocabularies(vocabularies or {})
+        self.reload()
+
+    # --- rules file ---
+
+    def set_vocabularies(self, vocabularies: Dict[str, Iterable[str]]):
+        """Sets the known values per entity type, e.g. {"program": all_programs}. Longest values match first."""
+        patterns = {}
+        for entity, values in vocabularies.items():
+            values = sorted({str(v).strip() for v in values if v and str(v).strip()}, key=len, reverse=True)
+            patterns[entity] = [(re.compile(r"(?<!\w)" + re.escape(v) + r"(?!\w)", re.IGNORECASE), v) for v in values]
+        with self._lock:
+            self._vocab_patterns = patterns
+
+    def reload(self) -> bool:
+        """(Re)reads the rules file. On a bad file the previous rules are kept. Returns True if reloaded."""
+        try:
+            mtime = os.path.getmtime(self.rules_path)
+            with open(self.rules_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            rules = [self._compile(rule) for rule in data.get("rules", [])]
+        except (OSError, ValueError, re.error) as e:
+            if self.debug_mode:
+                print(f"RuleRouter could not load '{self.rules_path}': {e}")
+            return False
+        with self._lock:
+            self._rules, self._mtime = rules, mtime
+            self.stats["reloads"] += 1
+        if self.debug_mode:
+            print(f"RuleRouter loaded {len(rules)} rules from '{self.rules_path}'.")
+        return True
+
+    @staticmethod
+    def _compile(rule: dict) -> dict:
+        if not rule.get("name") or not rule.get("tool_name"):
+            raise ValueError(f"rule needs 'name' and 'tool_name': {rule}")
+        unknown = set(rule.get("require", []) + rule.get("optional", []) + rule.get("forbid", [])) - set(ENTITY_TYPES)
+        if unknown:
+            raise ValueError(f"rule '{rule['name']}' uses unknown entities: {sorted(unknown)}")
+        compiled = dict(rule)
+        compiled["exact"] = {_normalize(q) for q in rule.get("exact", [])}
+        compiled["pattern"] = re.compile(rule["pattern"], re.IGNORECASE) if rule.get("pattern") else None
+        compiled["keywords"] = [k.lower() for k in rule.get("keywords", [])]
+        compiled["exclude"] = [k.lower() for k in rule.get("exclude", [])]
+        return compiled
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now - self._checked_at < self.reload_interval_seconds:
+            return
+        self._checked_at = now
+        try:
+            mtime = os.path.getmtime(self.rules_path)
+        except OSError:
+            return
+        if mtime != self._mtime:
+            self.reload()
+
+    # --- entity extraction ---
+
+    def _vocab_matches(self, entity: str, query: str) -> List[str]:
+        """Distinct known values found in the query, without counting a value inside a longer one."""
+        taken, found = [], []
+        for pattern, value in self._vocab_patterns.get(entity, []):
+            for m in pattern.finditer(query):
+                if any(m.start() < end and start < m.end() for start, end in taken):
+                    continue
+                taken.append((m.start(), m.end()))
+                if value not in found:
+                    found.append(value)
+        return found
+
+    def extract_entities(self, query: str) -> Dict[str, list]:
+        """Returns every candidate value per entity type. More than one value means ambiguous."""
+        entities = {entity: self._vocab_matches(entity, query) for entity in ("program", "department", "position")}
+        years, sections = [], []
+        for m in _YEAR_RE.finditer(query):
+            digit = m.group(1) or m.group(3)
+            years.append(int(digit) if digit else _WORD_YEARS[m.group(2).lower()])
+        for m in _YEAR_SECTION_RE.finditer(query):
+            years.append(int(m.group(1)))
+            sections.append(m.group(2).upper())
+        sections += [m.group(1).upper() for m in _SECTION_RE.finditer(query)]
+        entities["year_level"] = list(dict.fromkeys(years))
+        entities["section"] = list(dict.fromkeys(sections))
+        return entities
+
+    # --- routing ---
+
+    def _apply(self, rule: dict, query: str, normalized: str, entities: Dict[str, list]) -> Optional[dict]:
+        if rule["exact"] and normalized not in rule["exact"]:
+            return None
+        if rule["keywords"] and not any(k in normalized for k in rule["keywords"]):
+            return None
+        if any(k in normalized for k in rule["exclude"]):
+            return None
+        params = {}
+        if rule["pattern"] is not None:
+            m = rule["pattern"].search(query)
+            if not m:
+                return None
+            params.update({k: v.strip() for k, v in m.groupdict().items() if v})
+        if any(entities[e] for e in rule.get("forbid", [])):
+            return None
+        names = rule.get("param_names", {})
+        for entity in rule.get("require", []):
+            if len(entities[entity]) != 1:
+                return None
+            params[names.get(entity, entity)] = entities[entity][0]
+        for entity in rule.get("optional", []):
+            if len(entities[entity]) > 1:
+                return None  # Several candidates: leave it to the planner
+            if entities[entity]:
+                params[names.get(entity, entity)] = entities[entity][0]
+        params.update(rule.get("params", {}))
+        return {"tool_name": rule["tool_name"], "parameters": params}
+
+    def route(self, query: str) -> Tuple[Optional[dict], Optional[str]]:
+        """Returns (tool_call, rule_name) when exactly one rule produces a call, else (None, None)."""
+        if not query or not query.strip():
+            return None, None
+        self._maybe_reload()
+        with self._lock:
+            rules = self._rules
+        normalized = _normalize(query)
+        entities = self.extract_entities(query)
+
+        matches = []
+        for rule in rules:
+            tool_call = self._apply(rule, query, normalized, entities)
+            if tool_call is not None and all(tool_call != call for call, _ in matches):
+                matches.append((tool_call, rule["name"]))
+
+        with self._lock:
+            if len(matches) != 1:
+                self.stats["ambiguous" if matches else "no_match"] += 1
+                return None, None
+            tool_call, name = matches[0]
+            self.stats["routed"] += 1
+            self.stats["by_rule"][name] = self.stats["by_rule"].get(name, 0) + 1
+        if self.debug_mode:
+            print(f"RuleRouter '{name}' -> {tool_call}")
+        return tool_call, name
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            total = self.stats["routed"] + self.stats["no_match"] + self.stats["ambiguous"]
+            return {**self.stats, "by_rule": dict(self.stats["by_rule"]), "rules": len(self._rules),
+                    "route_rate": round(self.stats["routed"] / total, 4) if total else None}
@@ -0,0 +1,90 @@
+# backend/utils/ai_core/stages.py
+
+"""
+This module contains a small helper for running independent pipeline stages
+concurrently and joining them with per-stage timeouts. Optional stages that
+miss their timeout (or fail) are reported as skipped and replaced by a
+default value, so a slow extra never delays the stages that depend on it.
+Stages run with the caller's context, and optional ones never wait past the
+request deadline (see deadline.py). A stage with a timeout runs under a deadline
+that ends with it, so the LLM calls and Mongo queries inside a dropped stage give
+up too instead of holding their connection, model slot or breaker probe.
+"""
+
+import contextvars
+import time
+from concurrent.futures import Executor, TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, Optional
+
+from .deadline import Deadline, current_deadline, deadline_scope
+
+
+class Stage:
+    """One unit of work. `timeout` is measured from the moment all stages are started."""
+
+    def __init__(self, fn: Callable[[], Any], timeout: Optional[float] = None, default: Any = None,
+                 optional: bool = True):
+        self.fn = fn
+        self.timeout = timeout
+        self.default = default
+        self.optional = optional
+
+
+class StageRun:
+    """Outcome of run_stages(): values per stage, skipped stages with the reason, and durations."""
+
+    def __init__(self):
+        self.values: Dict[str, Any] = {}
+        self.skipped: Dict[str, str] = {}
+        self.timings: Dict[str, float] = {}
+
+    def __getitem__(self, name: str) -> Any:
+        return self.values[name]
+
+
+def run_stages(stages: Dict[str, Stage], executor: Executor) -> StageRun:
+    """
+    Starts every stage on the executor, then joins them in order. A required stage that
+    fails re-raises its error; an optional one falls back to its default.
+    """
+    run = StageRun()
+    started = time.monotonic()
+    deadline = current_deadline()
+
+    def timed(name: str, stage: Stage):
+        t0 = time.monotonic()
+        try:
+            if stage.timeout is None:
+                return stage.fn()
+            budget = max(0.0, stage.timeout - (t0 - started))
+            stage_deadline = deadline.within(budget, name) if deadline is not None else Deadline(budget, name)
+            with deadline_scope(stage_deadline):
+                return stage.fn()
+        finally:
+            run.timings[name] = round(time.monotonic() - t0, 4)
+
+    futures = {name: executor.submit(contextvars.copy_context().run, timed, name, stage)
+               for name, stage in stages.items()}
+    for name, stage in stages.items():
+        remaining = None if stage.timeout is None else max(0.0, stage.timeout - (time.monotonic() - started))
+        capped = False
+        if stage.optional and deadline is not None and (remaining is None or deadline.remaining() < remaining):
+            remaining, capped = deadline.remaining(), True
+        try:
+            run.values[name] = futures[name].result(timeout=remaining)
+        except FutureTimeout:
+            if not stage.optional:
+                raise
+            futures[name].cancel()  # Only helps if it never started; a running stage just gets ignored
+            run.values[name] = stage.default
+            if capped:
+                run.skipped[name] = "request deadline reached"
+                deadline.cut(name, "request deadline reached")
+            else:
+                run.skipped[name] = f"timeout after {stage.timeout}s"
+        except Exception as e:
+            if not stage.optional:
+                raise
+            run.values[name] = stage.default
+            run.skipped[name] = f"error: {e}"
+    return run
@@ -0,0 +1,163 @@
+# backend/utils/ai_core/synth_context.py
+
+"""
+This module builds the synthesizer's document context. Documents are ranked by
+how many of the query's terms they contain, stripped of internal fields (ids,
+field_status, timestamps, copies of the content), serialized compactly and
+added until the configured token budget is used. Whatever does not fit is
+replaced by counts: per collection for plain documents, per group for grouped
+student lists.
+"""
+
+import json
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from .token_budget import estimate_tokens
+
+# Never useful to the synthesizer; `_`-prefixed keys are dropped as well.
+INTERNAL_FIELDS = {"field_status", "created_at", "updated_at", "last_used_at", "uploaded_at",
+                   "timestamp", "raw", "image", "audio", "relevance", "embedding"}
+EMPTY_VALUES = {"", "none", "null", "nan", "n/a"}
+
+# Notes from the pipeline itself (fallback notices, clarifications) always go first.
+PINNED_PREFIX = "system_"
+
+_TERM_RE = re.compile(r"\w+", re.UNICODE)
+_STOPWORDS = {"the", "a", "an", "of", "in", "on", "for", "to", "and", "or", "is", "are", "was", "what",
+              "who", "whom", "which", "show", "me", "list", "all", "give", "find", "with", "about", "his",
+              "her", "their", "does", "do", "how", "many", "much", "please", "can", "you", "i", "my"}
+
+
+def dumps_compact(value) -> str:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def query_terms(query: Optional[str]) -> List[str]:
+    """Lower-cased query words worth matching against documents."""
+    terms = []
+    for term in _TERM_RE.findall((query or "").lower()):
+        if term not in _STOPWORDS and term not in terms and (len(term) > 1 or term.isdigit()):
+            terms.append(term)
+    return terms
+
+
+def compact_document(doc: dict) -> dict:
+    """A copy of a {source_collection, content, metadata} document without the internal fields."""
+    content = doc.get("content")
+    compact = {key: value for key, value in doc.items()
+               if key not in ("metadata", "students") and key not in INTERNAL_FIELDS and not key.startswith("_")}
+    metadata = {}
+    for key, value in (doc.get("metadata") or {}).items():
+        if key in INTERNAL_FIELDS or key.startswith("_") or key == "content":
+            continue
+        if value is None or (isinstance(value, str) and (value.strip().lower() in EMPTY_VALUES or value == content)):
+            continue
+        metadata[key] = value
+    if metadata:
+        compact["metadata"] = metadata
+    return compact
+
+
+def _document_text(doc: dict) -> str:
+    parts = [str(doc.get("content") or "")]
+    parts.extend(str(v) for v in (doc.get("metadata") or {}).values())
+    parts.extend(_document_text(student) for student in doc.get("students") or [])
+    return " ".join(parts).lower()
+
+
+def score_document(doc: dict, terms: List[str]) -> int:
+    """Number of query terms the document (or, for a group, any of its students) contains."""
+    if not terms:
+        return 0
+    words = set(_TERM_RE.findall(_document_text(doc)))
+    return sum(1 for term in terms if term in words)
+
+
+def rank_documents(docs: List[dict], query: Optional[str]) -> List[dict]:
+    """
+    Pinned system notes first, then by query-term matches, then by the search's own
+    `relevance` score. The sort is stable, so ties keep the tool's order.
+    """
+    terms = query_terms(query)
+
+    def key(item):
+        _, doc = item
+        pinned = str(doc.get("source_collection", "")).startswith(PINNED_PREFIX)
+        return (not pinned, -score_document(doc, terms), -(doc.get("relevance") or 0))
+
+    return [doc for _, doc in sorted(enumerate(docs), key=key)]
+
+
+def _group_name(doc: dict) -> str:
+    return doc.get("group_name", "unnamed group")
+
+
+def build_synth_context(docs: List[dict], query: Optional[str], max_tokens: int,
+                        max_documents: Optional[int] = None) -> Tuple[List[dict], Dict]:
+    """
+    Selects and compacts documents for the synthesizer prompt.
+
+    Args:
+        docs: The turn's collected documents; grouped student results
+              ({"source_collection": "grouped_students", "group_name", "students"}) are
+              filled student by student.
+        query: The user's question, used for ranking.
+        max_tokens: Budget for the serialized documents.
+        max_documents: Optional cap on the number of (top-level) documents.
+
+    Returns:
+        The documents to send, and an `omitted` summary (empty if everything fit):
+        {"documents": n, "by_collection": {...}, "groups": [{"group_name", "shown", "total"}]}.
+    """
+    terms = query_terms(query)
+    selected: List[dict] = []
+    used = 0
+    omitted_by_collection: Counter = Counter()
+    omitted_groups: List[dict] = []
+
+    def fits(tokens: int) -> bool:
+        return used + tokens + 1 <= max_tokens  # +1 for the separator
+
+    for doc in rank_documents(docs, query):
+        full = max_documents is not None and len(selected) >= max_documents
+        students = doc.get("students")
+        if isinstance(students, list):
+            group = compact_document(doc)
+            group["students"] = []
+            shown_tokens = estimate_tokens(dumps_compact(group))
+            if not full and fits(shown_tokens):
+                ranked_students = sorted(students, key=lambda s: -score_document(s, terms))
+                for student in ranked_students:
+                    student_tokens = estimate_tokens(dumps_compact(compact_document(student))) + 1
+                    if not fits(shown_tokens + student_tokens):
+                        break
+                    group["students"].append(compact_document(student))
+                    shown_tokens += student_tokens
+            shown = len(group["students"])
+            if shown:
+                if shown < len(students):
+                    group["students_shown"], group["students_total"] = shown, len(students)
+                    omitted_groups.append({"group_name": _group_name(doc), "shown": shown, "total": len(students)})
+                selected.append(group)
+                used += shown_tokens + 1
+            else:
+                omitted_groups.append({"group_name": _group_name(doc), "shown": 0, "total": len(students)})
+            continue
+
+        compact = compact_document(doc)
+        tokens = estimate_tokens(dumps_compact(compact))
+        if not full and fits(tokens):
+            selected.append(compact)
+            used += tokens + 1
+        else:
+            omitted_by_collection[doc.get("source_collection", "unknown")] += 1
+
+    omitted = {}
+    if omitted_by_collection:
+        omitted["documents"] = sum(omitted_by_collection.values())
+        omitted["by_collection"] = dict(omitted_by_collection)
+    if omitted_groups:
+        omitted["groups"] = omitted_groups
+    return selected, omitted
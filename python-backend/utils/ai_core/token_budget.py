@@ -0,0 +1,152 @@
+# backend/utils/ai_core/token_budget.py
+
+"""
+This module contains a lightweight token estimator and the prompt-budget
+trimming used by LLMService. The estimator approximates BPE tokenizers
+(Mistral, Llama 3, Phi-3) without loading one: roughly one token per 4
+characters of a word, plus one per punctuation mark.
+"""
+
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+
+_PIECE_RE = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+# Per-message overhead for role markers and separators in chat templates.
+MESSAGE_OVERHEAD_TOKENS = 4
+
+TRUNCATION_MARKER = "\n...[truncated {count} tokens to fit the prompt budget]...\n"
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    """Approximates the number of tokens in `text`."""
+    if not text:
+        return 0
+    total = 0
+    for piece in _PIECE_RE.findall(text):
+        total += (len(piece) + 3) // 4 if piece[0].isalnum() or piece[0] == "_" else 1
+    return total
+
+
+def estimate_message_tokens(messages: List[dict]) -> int:
+    """Approximates the prompt size of a chat message list."""
+    return sum(estimate_tokens(m.get("content", "")) + MESSAGE_OVERHEAD_TOKENS for m in messages)
+
+
+def _truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Keeps the head of `text` so that it fits in roughly `max_tokens`."""
+    if max_tokens <= 0:
+        return ""
+    pieces = list(_PIECE_RE.finditer(text))
+    used = 0
+    for match in pieces:
+        piece = match.group()
+        used += (len(piece) + 3) // 4 if piece[0].isalnum() or piece[0] == "_" else 1
+        if used > max_tokens:
+            return text[:match.start()]
+    return text
+
+
+def fit_messages_to_budget(messages: List[dict], budget: int, context_blocks: Optional[List[str]] = None,
+                           min_history_messages: int = 2) -> Tuple[List[dict], List[str]]:
+    """
+    Trims a [system, *history, user] message list until it fits `budget` tokens.
+
+    Trimming happens in this priority order, stopping as soon as the prompt fits:
+      1. Drop the oldest history messages, keeping the last `min_history_messages`.
+      2. Truncate the caller's context blocks (substrings of the system or user
+         prompt, e.g. retrieved documents or few-shot examples), in the order given.
+      3. Drop the remaining history.
+    The system instructions and the user's question are never cut.
+
+    Returns:
+        The (possibly) trimmed messages and a list describing each trim applied.
+    """
+    messages = [dict(m) for m in messages]
+    actions = []
+    overflow = estimate_message_tokens(messages) - budget
+    if overflow <= 0:
+        return messages, actions
+
+    # 1. Oldest history first.
+    history_start, history_end = 1, len(messages) - 1
+    dropped = 0
+    while overflow > 0 and history_end - history_start > min_history_messages:
+        overflow -= estimate_tokens(messages[history_start].get("content", "")) + MESSAGE_OVERHEAD_TOKENS
+        del messages[history_start]
+        history_end -= 1
+        dropped += 1
+    if dropped:
+        actions.append(f"dropped {dropped} oldest history message(s)")
+
+    # 2. Context blocks, in priority order.
+    for block in context_blocks or []:
+        if overflow <= 0:
+            break
+        if not block:
+            continue
+        block_tokens = estimate_tokens(block)
+        for message in (messages[0], messages[-1]):
+            content = message.get("content", "")
+            if block in content:
+                keep = max(0, block_tokens - overflow - estimate_tokens(TRUNCATION_MARKER))
+                removed = block_tokens - keep
+                shortened = _truncate_to_tokens(block, keep) + TRUNCATION_MARKER.format(count=removed)
+                message["content"] = content.replace(block, shortened, 1)
+                overflow -= block_tokens - estimate_tokens(shortened)
+                actions.append(f"truncated a context block by ~{removed} tokens")
+                break
+
+    # 3. Whatever history is left.
+    if overflow > 0 and len(messages) > 2:
+        remaining = len(messages) - 2
+        for message in messages[1:-1]:
+            overflow -= estimate_tokens(message.get("content", "")) + MESSAGE_OVERHEAD_TOKENS
+        messages = [messages[0], messages[-1]]
+        actions.append(f"dropped the remaining {remaining} history message(s)")
+
+    if overflow > 0:
+        actions.append(f"still ~{overflow} tokens over budget")
+    return messages, actions
+
+
+class TokenUsage:
+    """Per-phase prompt/completion size counters for one LLMService."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._phases: Dict[str, Dict[str, int]] = {}
+
+    def _phase(self, phase: str) -> Dict[str, int]:
+        return self._phases.setdefault(phase, {
+            "calls": 0, "prompt_tokens": 0, "max_prompt_tokens": 0,
+            "completion_tokens": 0, "max_completion_tokens": 0, "trimmed_calls": 0
+        })
+
+    def record_prompt(self, phase: str, tokens: int, trimmed: bool):
+        with self._lock:
+            counts = self._phase(phase)
+            counts["calls"] += 1
+            counts["prompt_tokens"] += tokens
+            counts["max_prompt_tokens"] = max(counts["max_prompt_tokens"], tokens)
+            if trimmed:
+                counts["trimmed_calls"] += 1
+
+    def record_completion(self, phase: str, tokens: int):
+        with self._lock:
+            counts = self._phase(phase)
+            counts["completion_tokens"] += tokens
+            counts["max_completion_tokens"] = max(counts["max_completion_tokens"], tokens)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            result = {}
+            for phase, counts in self._phases.items():
+                calls = counts["calls"] or 1
+                result[phase] = {
+                    **counts,
+                    "avg_prompt_tokens": round(counts["prompt_tokens"] / calls),
+                    "avg_completion_tokens": round(counts["completion_tokens"] / calls),
+                }
+            return result
@@ -47,7 +47,8 @@ class TrainingSystem:
                             execution_time: float, error_msg: str = None,
                             execution_mode: str = "unknown", outcome: str = "FAIL_UNKNOWN",
                             analyst_mode: str = "unknown", final_answer: str = "",
-                            corruption_details: Optional[List[str]] = None):
+                            corruption_details: Optional[List[str]] = None, plan_source: str = "planner",
+                            step_timings: Optional[dict] = None):
         """
         [UPGRADED] Records the outcome of a single query as a document directly into MongoDB.
         """
@@ -62,7 +63,9 @@ class TrainingSystem:
             "timestamp": datetime.now(),  # Using native BSON datetime is better for querying
             "final_answer": final_answer,
             "error_message": error_msg,
-            "corruption_details": corruption_details
+            "corruption_details": corruption_details,
+            "plan_source": plan_source,  # 'planner', or how the planner LLM was skipped
+            "step_timings": step_timings  # Per-step timings of a multi-step plan
         }
         # Insert the document directly into the MongoDB collection.
         self.log_collection.insert_one(record)
@@ -0,0 +1,60 @@
+# backend/utils/ai_core/turn_state.py
+
+"""
+This module contains the per-turn TurnState. One AIAnalyst serves every chat
+request, and async requests plan their turns concurrently on worker threads, so
+what a turn collects along the way (the people it resolved, the collections that
+failed with index corruption) is kept in a context variable rather than on the
+analyst. Tool and search threads started with a copy of the context add to the
+same TurnState.
+"""
+
+import contextvars
+import threading
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Set
+
+_CURRENT: contextvars.ContextVar = contextvars.ContextVar("analyst_turn", default=None)
+
+
+class TurnState:
+    """Thread-safe. What one turn has collected so far."""
+
+    def __init__(self):
+        self._entities: List[str] = []
+        self._corruption_warnings: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def add_entity(self, name: str):
+        with self._lock:
+            self._entities.append(name)
+
+    def add_corruption_warning(self, collection_name: str):
+        with self._lock:
+            self._corruption_warnings.add(collection_name)
+
+    @property
+    def entities(self) -> List[str]:
+        with self._lock:
+            return list(self._entities)
+
+    @property
+    def corruption_warnings(self) -> List[str]:
+        with self._lock:
+            return sorted(self._corruption_warnings)
+
+
+def current_turn() -> Optional[TurnState]:
+    """The state of the turn being planned in this context, if any."""
+    return _CURRENT.get()
+
+
+@contextmanager
+def turn_scope() -> Iterator[TurnState]:
+    """Starts a fresh TurnState for the block (and for threads started with a copy of the context)."""
+    turn = TurnState()
+    token = _CURRENT.set(turn)
+    try:
+        yield turn
+    finally:
+        _CURRENT.reset(token)
@@ -0,0 +1,86 @@
+# backend/utils/backfill_name_tokens.py
+
+"""
+Adds the normalized `name_tokens` array to every person document (anything with a
+`full_name`) and creates its multikey index, so MongoCollectionAdapter name
+lookups are prefix matches on the index instead of a regex scan. Documents
+without the field are still found by regex, but only through a slower branch.
+The express-backend ingest writes the field for new documents; run this once
+for existing data, after bulk edits, and after changing name_tokens(). Documents whose tokens are already
+up to date are not touched, so it is safe to re-run against a live database.
+
+Usage (from python-backend/):
+    python utils/backfill_name_tokens.py --dry-run
+    python utils/backfill_name_tokens.py --collections students_ccs,faculty_ccs
+"""
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+os.chdir(Path(__file__).resolve().parents[1])
+sys.path.append(str(Path(__file__).resolve().parent))
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from run_ai import CustomPlaceholderError, get_mongo_params, list_all_collections, load_config  # noqa: E402
+
+
+def backfill_collection(collection, batch_size: int = 500, dry_run: bool = False) -> dict:
+    """Sets name_tokens where it is missing or stale. Returns scanned/updated counts."""
+    from pymongo import UpdateOne
+    from ai_core.database import name_tokens
+
+    counts = {"scanned": 0, "updated": 0}
+    batch = []
+    cursor = collection.find({"full_name": {"$exists": True}}, {"full_name": 1, "name_tokens": 1})
+    for doc in cursor:
+        counts["scanned"] += 1
+        tokens = name_tokens(doc.get("full_name"))
+        if doc.get("name_tokens") == tokens:
+            continue
+        counts["updated"] += 1
+        batch.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"name_tokens": tokens}}))
+        if len(batch) >= batch_size:
+            if not dry_run:
+                collection.bulk_write(batch, ordered=False)
+            batch = []
+    if batch and not dry_run:
+        collection.bulk_write(batch, ordered=False)
+    if counts["scanned"] and not dry_run:
+        collection.create_index([("name_tokens", 1)], name="analyst_name_tokens")
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill name_tokens on person documents")
+    parser.add_argument("--collections", help="Comma-separated collections (default: discover like run_ai.py)")
+    parser.add_argument("--batch-size", type=int, default=500, help="Updates per bulk write")
+    parser.add_argument("--dry-run", action="store_true", help="Count the documents to update without writing")
+    args = parser.parse_args()
+
+    try:
+        config = load_config(Path("config/config.json"))
+    except CustomPlaceholderError:
+        return 1
+
+    from pymongo import MongoClient
+
+    mongo_uri, mongo_db = get_mongo_params(config)
+    collections = args.collections.split(",") if args.collections else list_all_collections(config)
+    client = MongoClient(mongo_uri, serverSelectionTimeoutMS=4000)
+    db = client[mongo_db]
+
+    total = 0
+    for name in collections:
+        counts = backfill_collection(db[name], batch_size=args.batch_size, dry_run=args.dry_run)
+        if counts["scanned"]:
+            verb = "would update" if args.dry_run else "updated"
+            print(f"📚 {name}: {counts['scanned']} person document(s), {verb} {counts['updated']}")
+        total += counts["updated"]
+    client.close()
+    print(f"\n{'Would update' if args.dry_run else 'Updated'} {total} document(s) in total.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
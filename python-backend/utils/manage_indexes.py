@@ -0,0 +1,73 @@
+# backend/utils/manage_indexes.py
+
+"""
+Reports and creates the MongoDB indexes the AI Analyst's tools rely on
+(see ai_core/index_manager.py). Uses the same database and collection
+discovery as run_ai.py. Nothing is ever dropped; unused indexes are only listed.
+
+Usage (from python-backend/):
+    python utils/manage_indexes.py                 # report only
+    python utils/manage_indexes.py --apply         # create missing indexes
+    python utils/manage_indexes.py --apply --collections students_ccs,grades_ccs
+"""
+
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+os.chdir(Path(__file__).resolve().parents[1])
+sys.path.append(str(Path(__file__).resolve().parent))
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from run_ai import CustomPlaceholderError, get_mongo_params, list_all_collections, load_config  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report or create the AI Analyst's MongoDB indexes")
+    parser.add_argument("--apply", action="store_true", help="Create the missing indexes")
+    parser.add_argument("--collections", help="Comma-separated collections (default: discover like run_ai.py)")
+    parser.add_argument("--sample-size", type=int, default=50, help="Documents sampled per collection to find fields")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    try:
+        config = load_config(Path("config/config.json"))
+    except CustomPlaceholderError:
+        return 1
+
+    from pymongo import MongoClient
+    from ai_core.analyst import AIAnalyst
+    from ai_core.index_manager import IndexManager, required_filter_fields
+
+    mongo_uri, mongo_db = get_mongo_params(config)
+    collections = args.collections.split(",") if args.collections else list_all_collections(config)
+    client = MongoClient(mongo_uri, serverSelectionTimeoutMS=4000)
+    manager = IndexManager(client[mongo_db], collections,
+                           fields=required_filter_fields(AIAnalyst._create_reverse_schema_map()),
+                           sample_size=args.sample_size, debug_mode=True)
+
+    created = manager.ensure() if args.apply else {}
+    report = manager.report()
+    client.close()
+
+    if args.json:
+        print(json.dumps({"created": created, "report": report}, indent=2))
+        return 0
+
+    for name, entry in report.items():
+        print(f"\n📚 {name}")
+        if created.get(name):
+            print(f"   created: {', '.join(created[name])}")
+        print(f"   present: {', '.join(entry['present']) or '-'}")
+        print(f"   missing: {', '.join('+'.join(key) for key in entry['missing']) or '-'}")
+        unused = entry["unused"]
+        print(f"   unused since server start: {'(no $indexStats permission)' if unused is None else ', '.join(unused) or '-'}")
+    missing = sum(len(entry["missing"]) for entry in report.values())
+    if missing and not args.apply:
+        print(f"\n{missing} missing index(es). Run with --apply to create them.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
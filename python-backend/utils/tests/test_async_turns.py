@@ -0,0 +1,107 @@
+import asyncio
+import threading
+import unittest
+
+try:
+    from utils.ai_core.analyst import AIAnalyst
+except ImportError as e:  # ai_core needs the full backend requirements
+    raise unittest.SkipTest(f"ai_core dependencies not installed: {e}")
+
+
+class LastWordRouter:
+    """Rule router stand-in: every query goes to lookup_person with its last word."""
+
+    def route(self, query):
+        return {"tool_name": "lookup_person", "parameters": {"name": query.split()[-1]}}, "test"
+
+
+class Synth:
+    async def execute_async(self, **kwargs):
+        await asyncio.sleep(0.01)
+        return f"answer: {kwargs['user_prompt'][-20:]}"
+
+    async def execute_stream_async(self, **kwargs):
+        for token in ("an", "swer"):
+            await asyncio.sleep(0.01)
+            yield token
+
+
+class QueryLog:
+    def __init__(self):
+        self.records = []
+
+    def record_query_result(self, **kwargs):
+        self.records.append(kwargs)
+
+
+class TestConcurrentAsyncTurns(unittest.TestCase):
+    def setUp(self):
+        # _plan_turn only needs these attributes on the rule-router path; the real constructor needs MongoDB.
+        analyst = self.analyst = AIAnalyst.__new__(AIAnalyst)
+        analyst.debug_mode = False
+        analyst.execution_mode = "test"
+        analyst._session_locks = {}
+        analyst.rule_router = LastWordRouter()
+        analyst.plan_cache = None
+        analyst.intent_classifier = None
+        analyst.tool_fields = {}
+        analyst._save_dynamic_example = lambda *args: None
+        analyst.synth_llm = Synth()
+        analyst.training_system = QueryLog()
+        self.saved_entities = []
+        analyst._add_entity_to_session = lambda session_id, name: self.saved_entities.append((session_id, name))
+        both_in_tools = threading.Barrier(2, timeout=5)
+
+        def lookup_person(name):
+            both_in_tools.wait()  # Both turns are inside their tool at the same time
+            analyst._note_entity(name.title())
+            analyst._note_corruption(f"students_{name}")
+            return [{"source_collection": f"students_{name}", "content": f"{name} profile",
+                     "metadata": {"full_name": name.title()}}]
+
+        analyst.available_tools = {"lookup_person": lookup_person}
+
+    def test_turns_keep_their_own_entities_and_warnings(self):
+        sessions = [{"session_id": name, "chat_history": [], "structured_context": {}} for name in ("s1", "s2")]
+
+        async def two_turns():
+            return await asyncio.gather(self.analyst.execute_reasoning_plan_async("who is ana", sessions[0]),
+                                        self.analyst.execute_reasoning_plan_async("who is ben", sessions[1]))
+
+        (_, _, docs_ana), (_, _, docs_ben) = asyncio.run(two_turns())
+        self.assertEqual(docs_ana[0]["content"], "ana profile")
+        self.assertEqual(docs_ben[0]["content"], "ben profile")
+        self.assertEqual(sorted(self.saved_entities), [("s1", "Ana"), ("s2", "Ben")])
+        warnings = {record["query"]: record["corruption_details"] for record in self.analyst.training_system.records}
+        self.assertEqual(warnings, {"who is ana": ["students_ana"], "who is ben": ["students_ben"]})
+
+    def test_streaming_turns_keep_their_own_entities_and_warnings(self):
+        self.analyst.endpoint_deadlines, self.analyst.default_deadline = {}, None
+        self.analyst.summary_queue = None
+        self.analyst._summarize_conversation = lambda session_id: None
+        self.analyst._update_session_history = lambda *args: None
+        self.analyst.sessions_cache = {name: {"session_id": name, "chat_history": [], "structured_context": {}}
+                                       for name in ("s1", "s2")}
+
+        async def stream(query, session_id):
+            return [event async for event in self.analyst.web_stream_ai_analyst_async(query, session_id)]
+
+        async def two_turns():
+            return await asyncio.gather(stream("who is ana", "s1"), stream("who is ben", "s2"))
+
+        for events in asyncio.run(two_turns()):
+            self.assertEqual(events[-1]["ai_response"], "answer")
+        self.assertEqual(sorted(self.saved_entities), [("s1", "Ana"), ("s2", "Ben")])
+        warnings = {record["query"]: record["corruption_details"] for record in self.analyst.training_system.records}
+        self.assertEqual(warnings, {"who is ana": ["students_ana"], "who is ben": ["students_ben"]})
+
+    def test_warnings_do_not_carry_over_to_the_next_turn(self):
+        self.analyst.available_tools = {"lookup_person": lambda name: [{"content": "ok", "metadata": {}}]}
+        session = {"session_id": "s1", "chat_history": [], "structured_context": {}}
+        self.analyst._note_corruption("students_ccs")  # Outside any turn: not recorded anywhere
+        asyncio.run(self.analyst.execute_reasoning_plan_async("who is ana", session))
+        self.assertIsNone(self.analyst.training_system.records[0]["corruption_details"])
+
+
+if __name__ == "__main__":
+    unittest.main()
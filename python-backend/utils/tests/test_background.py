@@ -0,0 +1,63 @@
+import unittest
+import threading
+import time
+
+try:
+    from utils.ai_core.background import CoalescingTaskQueue
+except ImportError as e:  # ai_core needs the full backend requirements
+    raise unittest.SkipTest(f"ai_core dependencies not installed: {e}")
+
+
+class TestCoalescingTaskQueue(unittest.TestCase):
+    def setUp(self):
+        self.calls = []
+        self.gate = threading.Event()
+
+        def task(key):
+            self.gate.wait(2)
+            self.calls.append(key)
+
+        self.queue = CoalescingTaskQueue(task, workers=1, name="test")
+
+    def tearDown(self):
+        self.gate.set()
+        self.queue.shutdown(timeout=2)
+
+    def test_queued_jobs_are_coalesced_and_running_jobs_rerun_once(self):
+        self.queue.submit("a")
+        time.sleep(0.05)          # "a" is now running (blocked on the gate)
+        self.queue.submit("a")    # -> one re-run
+        self.queue.submit("a")    # -> merged into that re-run
+        self.queue.submit("b")
+        self.queue.submit("b")    # -> merged, "b" hasn't started
+        self.assertTrue(self.queue.pending("a"))
+
+        self.gate.set()
+        self.assertTrue(self.queue.wait("a", timeout=2))
+        self.assertTrue(self.queue.wait("b", timeout=2))
+        self.assertEqual(sorted(self.calls), ["a", "a", "b"])
+        stats = self.queue.get_stats()
+        self.assertEqual((stats["submitted"], stats["coalesced"], stats["completed"]), (5, 2, 3))
+        self.assertEqual(stats["pending"], 0)
+
+    def test_wait_is_bounded(self):
+        self.assertTrue(self.queue.wait("idle", timeout=0))
+        self.queue.submit("slow")
+        t0 = time.perf_counter()
+        self.assertFalse(self.queue.wait("slow", timeout=0.05))
+        self.assertLess(time.perf_counter() - t0, 0.5)
+        self.assertEqual(self.queue.get_stats()["wait_timeouts"], 1)
+
+    def test_failures_do_not_stop_the_worker(self):
+        def boom(key):
+            raise RuntimeError(key)
+
+        failing = CoalescingTaskQueue(boom, workers=1)
+        failing.submit("x")
+        self.assertTrue(failing.wait("x", timeout=2))
+        self.assertEqual(failing.get_stats()["failed"], 1)
+        failing.shutdown(timeout=2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+try:
+    from utils.ai_core.cassette import CassettePlayer, CassetteRecorder, cassette_key
+    from utils.ai_core.llm_service import LLMService, close_http_sessions
+except ImportError as e:  # ai_core needs the full backend requirements
+    raise unittest.SkipTest(f"ai_core dependencies not installed: {e}")
+
+sys.path.append(str(Path(__file__).resolve().parents[2] / "benchmarks"))
+from stub_llm_server import CANNED_PLAN, StubLLMServer  # noqa: E402
+
+PLAN_SCHEMA = {"title": "plan", "type": "object", "properties": {"tool_name": {"type": "string"}},
+               "required": ["tool_name"]}
+
+
+class TestCassette(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".jsonl")
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def _record(self, recorder, messages, response, json_mode=False):
+        recorder.record(api_mode="offline", model="phi3", phase="planner", json_mode=json_mode,
+                        messages=messages, response=response, latency_seconds=0.5)
+
+    def test_key_ignores_extra_message_fields(self):
+        messages = [{"role": "user", "content": "hi"}]
+        self.assertEqual(cassette_key(messages, False), cassette_key([{"role": "user", "content": "hi", "name": "x"}], False))
+        self.assertNotEqual(cassette_key(messages, False), cassette_key(messages, True))
+
+    def test_replay_is_ordered_and_cycles(self):
+        recorder = CassetteRecorder(self.path)
+        question = [{"role": "user", "content": "who is the dean?"}]
+        self._record(recorder, question, "first")
+        self._record(recorder, question, "second")
+        self._record(recorder, [{"role": "user", "content": "other"}], "other", json_mode=True)
+
+        player = CassettePlayer(self.path)
+        self.assertEqual(len(player), 3)
+        answers = [player.lookup(question, False)["response"] for _ in range(3)]
+        self.assertEqual(answers, ["first", "second", "first"])
+        self.assertIsNone(player.lookup(question, True))
+        self.assertEqual(player.lookup([{"role": "user", "content": "other"}], True)["latency_seconds"], 0.5)
+
+
+class TestStubReplay(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".jsonl")
+        os.close(fd)
+        self.addCleanup(os.remove, self.path)
+        self.addCleanup(close_http_sessions)
+
+    def _service(self, server, api_mode, **config):
+        return LLMService({"api_mode": api_mode, "mistral_api_key": "test-key", "ollama_api_url": server.ollama_url,
+                           "mistral_api_url": server.mistral_url, **config})
+
+    def _plan_call(self, service):
+        return service.execute(system_prompt="You plan.", user_prompt="who is the dean?", json_mode=True,
+                               json_schema=PLAN_SCHEMA, retries=0)
+
+    def test_schema_constrained_calls_are_json_mode(self):
+        with StubLLMServer() as server:
+            for api_mode in ("online", "offline"):
+                self.assertEqual(self._plan_call(self._service(server, api_mode)), json.dumps(CANNED_PLAN))
+
+    def test_schema_constrained_call_replays_from_its_recording(self):
+        for api_mode in ("online", "offline"):
+            with StubLLMServer() as server:
+                self._plan_call(self._service(server, api_mode, record_cassette=self.path))
+            with StubLLMServer(cassette=self.path, strict=True) as server:
+                self._plan_call(self._service(server, api_mode))
+                self.assertEqual((server.stats["cassette_hits"], server.stats["misses"]), (1, 0), api_mode)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import contextvars
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from utils.ai_core.database import CONTENT_FIELDS, MongoCollectionAdapter, current_fields, field_scope
+except ImportError as e:  # ai_core needs the full backend requirements
+    raise unittest.SkipTest(f"ai_core dependencies not installed: {e}")
+
+
+class RecordingCursor(list):
+    def limit(self, n):
+        return self
+
+    def max_time_ms(self, ms):
+        return self
+
+
+class RecordingCollection:
+    """Records the arguments of find() and returns one student document."""
+
+    def __init__(self):
+        self.calls = []
+
+    def find_one(self, filter_query, projection=None):
+        return None  # No name_tokens yet
+
+    def find(self, filter_query, projection=None):
+        self.calls.append((filter_query, projection))
+        return RecordingCursor([{"_id": 1, "full_name": "Ana Cruz", "student_id": "21-0001"}])
+
+
+class TestProjection(unittest.TestCase):
+    def setUp(self):
+        self.collection = RecordingCollection()
+        self.adapter = MongoCollectionAdapter(self.collection)
+
+    def test_media_is_excluded_by_default(self):
+        result = self.adapter.query(query_texts=["ana"], n_results=5)
+        self.assertEqual(self.collection.calls[0][1], {"image": 0, "audio": 0, "descriptor": 0, "name_tokens": 0})
+        self.assertEqual(result["metadatas"][0][0]["full_name"], "Ana Cruz")
+
+    def test_field_list_keeps_the_content_fields(self):
+        self.adapter.get(where={"program": "BSCS"}, fields=["gwa", "grades"])
+        filter_query, projection = self.collection.calls[0]
+        self.assertEqual(filter_query, {"course": "BSCS"})
+        self.assertEqual(set(projection), set(CONTENT_FIELDS) | {"grades"})
+        self.assertEqual(set(projection.values()), {1})
+
+    def test_no_exclusions_means_no_projection(self):
+        MongoCollectionAdapter(self.collection, excluded_fields=()).get()
+        self.assertIsNone(self.collection.calls[0][1])
+
+    def test_field_scope_applies_in_copied_contexts(self):
+        with field_scope(["grades"]):
+            with ThreadPoolExecutor(max_workers=1) as pool:
+                pool.submit(contextvars.copy_context().run, self.adapter.get).result()
+        self.assertIsNone(current_fields())
+        self.assertIn("grades", self.collection.calls[0][1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,131 @@
+import socket
+import unittest
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from utils.ai_core.deadline import Deadline, current_deadline, deadline_scope
+    from utils.ai_core.llm_service import LLMService
+    from utils.ai_core.stages import Stage, run_stages
+except ImportError as e:  # ai_core needs the full backend requirements
+    raise unittest.SkipTest(f"ai_core dependencies not installed: {e}")
+
+
+class TestDeadline(unittest.TestCase):
+    def test_budget_and_cuts(self):
+        deadline = Deadline(10.0, name="chatprompt")
+        self.assertFalse(deadline.expired())
+        self.assertAlmostEqual(deadline.clamp(360), 10.0, delta=0.5)
+        self.assertEqual(deadline.clamp(1.0), 1.0)
+        self.assertGreater(deadline.max_time_ms(), 9000)
+
+        self.assertTrue(deadline.allows("summarizer", 5.0))
+        self.assertFalse(deadline.allows("dynamic_examples", 20.0))
+        deadline.cut("dynamic_examples", "again")  # Recorded once
+        self.assertEqual([c["stage"] for c in deadline.cut_stages], ["dynamic_examples"])
+
+        expired = Deadline(0.0)
+        self.assertTrue(expired.expired())
+        self.assertEqual(expired.max_time_ms(), 1)  # 0 would mean "no limit" to MongoDB
+
+    def test_within(self):
+        request = Deadline(5.0)
+        stage = request.within(0.2, "intent")
+        self.assertLessEqual(stage.remaining(), 0.2)
+        self.assertLessEqual(request.within(60.0, "examples").remaining(), 5.0)
+        stage.cut("llm_intent", "deadline exceeded")
+        self.assertEqual(request.cut_stages[0]["stage"], "llm_intent")
+
+    def test_scope(self):
+        self.assertIsNone(current_deadline())
+        outer, inner = Deadline(5.0), Deadline(1.0)
+        with deadline_scope(outer):
+            with deadline_scope(inner):
+                self.assertIs(current_deadline(), inner)
+            self.assertIs(current_deadline(), outer)
+        self.assertIsNone(current_deadline())
+
+
+class TestDeadlinePropagation(unittest.TestCase):
+    def setUp(self):
+        self.executor = ThreadPoolExecutor(max_workers=2)
+
+    def tearDown(self):
+        self.executor.shutdown(wait=False)
+
+    def test_stages_see_the_deadline_and_stop_at_it(self):
+        deadline = Deadline(0.1)
+        with deadline_scope(deadline):
+            t0 = time.perf_counter()
+            run = run_stages({
+                "examples": Stage(lambda: time.sleep(0.5) or ["x"], timeout=1.5, default=[]),
+                "context": Stage(lambda: current_deadline(), optional=False),
+            }, self.executor)
+        self.assertLess(time.perf_counter() - t0, 0.4)
+        self.assertIs(run["context"], deadline)
+        self.assertEqual(run["examples"], [])
+        self.assertEqual(deadline.cut_stages[0]["stage"], "examples")
+
+    def test_llm_timeouts_follow_the_deadline(self):
+        service = LLMService({"api_mode": "offline", "ollama_api_url": "http://127.0.0.1:9/api/chat",
+                              "planner_model": "planner"})
+        self.assertEqual(service._get_timeout("planner"), (10, 180))
+        with deadline_scope(Deadline(5.0)):
+            connect, read = service._get_timeout("planner")
+            self.assertLessEqual(read, 5.0)
+        with deadline_scope(Deadline(0.0)) as deadline:
+            result = service.execute(system_prompt="s", user_prompt="u", phase="planner")
+        self.assertTrue(LLMService.is_error_response(result))
+        self.assertIn("deadline", result)
+        self.assertEqual(service.get_health()["deadline_exceeded"], 1)
+        self.assertEqual(deadline.cut_stages[0]["stage"], "llm_planner")
+
+    def test_expired_call_leaves_the_half_open_probe_free(self):
+        service = LLMService({"api_mode": "offline", "ollama_api_url": "http://127.0.0.1:11/api/chat",
+                              "planner_model": "planner",
+                              "circuit_breaker": {"failure_threshold": 1, "recovery_timeout": 0.05}})
+        service.breaker.record_failure()
+        time.sleep(0.06)
+        with deadline_scope(Deadline(0.0)):
+            service.execute(system_prompt="s", user_prompt="u", phase="planner")
+        self.assertEqual(service.breaker.state, "half_open")
+        self.assertTrue(service.breaker.allow_request())  # The probe is still available
+
+    def test_timed_out_stage_stops_its_llm_call_without_tripping_the_breaker(self):
+        silent = socket.socket()  # Accepts connections (backlog) but never answers
+        silent.bind(("127.0.0.1", 0))
+        silent.listen(8)
+        self.addCleanup(silent.close)
+        service = LLMService({"api_mode": "offline", "planner_model": "planner",
+                              "ollama_api_url": f"http://127.0.0.1:{silent.getsockname()[1]}/api/chat",
+                              "circuit_breaker": {"failure_threshold": 1}})
+        finished = []
+
+        def intent():
+            finished.append(service.execute(system_prompt="s", user_prompt="u", phase="intent"))
+
+        with ThreadPoolExecutor(max_workers=2) as executor, deadline_scope(Deadline(30.0)) as deadline:
+            run = run_stages({"intent": Stage(intent, timeout=0.2)}, executor)
+            self.assertEqual(run.skipped, {"intent": "timeout after 0.2s"})
+        self.assertLess(run.timings["intent"], 1.0)  # The call ended with its stage, not at the read timeout
+        self.assertIn("Error", finished[0])
+        self.assertEqual(service.breaker.snapshot()["failures"], 0)
+        self.assertEqual(service.breaker.state, "closed")
+        self.assertGreater(deadline.remaining(), 25.0)
+
+    def test_waiting_for_the_model_stops_at_the_deadline(self):
+        service = LLMService({"api_mode": "offline", "ollama_api_url": "http://127.0.0.1:12/api/chat",
+                              "planner_model": "planner", "residency": {"enabled": True, "max_hold_seconds": 5.0}})
+        busy = service.residency.acquire("other-model")
+        try:
+            with deadline_scope(Deadline(0.2)) as deadline:
+                result = service.execute(system_prompt="s", user_prompt="u", phase="planner")
+        finally:
+            service.residency.release(busy)
+        self.assertIn("deadline", result)
+        self.assertEqual(deadline.cut_stages[0]["reason"], "deadline exceeded waiting for the model")
+        self.assertEqual(service.residency.snapshot()["in_flight"], {})
+
+
+if __name__ == "__main__":
+    unittest.main()
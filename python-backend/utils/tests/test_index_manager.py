@@ -0,0 +1,91 @@
+import unittest
+
+try:
+    from pymongo.errors import OperationFailure
+    from utils.ai_core.index_manager import IndexManager, index_name, required_filter_fields
+except ImportError as e:  # ai_core needs the full backend requirements
+    raise unittest.SkipTest(f"ai_core dependencies not installed: {e}")
+
+
+class Cursor(list):
+    def limit(self, n):
+        return Cursor(self[:n])
+
+
+class FakeCollection:
+    """Just enough of a pymongo collection for the index manager."""
+
+    def __init__(self, docs, index_stats=True):
+        self.docs = docs
+        self.indexes = {"_id_": {"key": {"_id": 1}}}
+        self.ops = {}
+        self.index_stats = index_stats
+        self.created = []
+
+    def find(self, filter_query, projection):
+        return Cursor({k: v for k, v in doc.items() if k in projection} for doc in self.docs)
+
+    def index_information(self):
+        return dict(self.indexes)
+
+    def aggregate(self, pipeline):
+        if not self.index_stats:
+            raise OperationFailure("not authorized")
+        return [{"name": name, "accesses": {"ops": self.ops.get(name, 0)}} for name in self.indexes]
+
+    def create_index(self, keys, name):
+        self.created.append(name)
+        self.indexes[name] = {"key": dict(keys)}
+
+
+class TestIndexManager(unittest.TestCase):
+    def setUp(self):
+        self.db = {
+            "students_ccs": FakeCollection([{"student_id": "1", "full_name": "Ana", "course": "BSCS",
+                                             "year": "2", "section": "A", "department": "CCS"}]),
+            "schedules_ccs": FakeCollection([{"adviser": "Prof. Reyes", "course": "BSCS", "year": "2"}],
+                                            index_stats=False),
+        }
+        self.manager = IndexManager(self.db, list(self.db))
+
+    def test_fields_follow_the_adapter_translations(self):
+        fields = required_filter_fields({"course": "program", "yr": "year_level", "student_name": "full_name"})
+        self.assertIn("student_name", fields)
+        self.assertNotIn("program", fields)  # Stored as 'course'
+        self.assertNotIn("yr", fields)
+        self.assertEqual(fields.count("year"), 1)
+
+    def test_only_fields_the_documents_have(self):
+        self.assertEqual(self.manager.required_indexes("schedules_ccs"), [("course",), ("year",), ("adviser",)])
+        self.assertIn(("course", "year", "section"), self.manager.required_indexes("students_ccs"))
+
+    def test_compound_prefix_gets_no_single_field_index(self):
+        required = self.manager.required_indexes("students_ccs")
+        self.assertIn(("course", "year", "section"), required)
+        self.assertNotIn(("course",), required)
+        self.assertIn(("year",), required)
+        self.assertNotIn("analyst_course", self.manager.ensure()["students_ccs"])
+
+    def test_ensure_is_idempotent(self):
+        self.db["students_ccs"].indexes["student_id_1"] = {"key": {"student_id": 1}}  # Created by someone else
+        dry = self.manager.ensure(dry_run=True)
+        self.assertEqual(self.db["students_ccs"].created, [])
+        created = self.manager.ensure()
+        self.assertEqual(created, dry)
+        self.assertNotIn(index_name(("student_id",)), created["students_ccs"])
+        self.assertIn("analyst_course_year_section", created["students_ccs"])
+        self.assertEqual(self.manager.ensure(), {})
+
+    def test_report(self):
+        self.db["students_ccs"].indexes["old_guardian_1"] = {"key": {"guardian_name": 1}}
+        self.manager.ensure()
+        self.db["students_ccs"].ops["analyst_course_year_section"] = 12
+        report = self.manager.report()
+        self.assertEqual(report["students_ccs"]["missing"], [])
+        self.assertNotIn("analyst_course_year_section", report["students_ccs"]["unused"])
+        self.assertIn("old_guardian_1", report["students_ccs"]["unused"])
+        self.assertIsNone(report["schedules_ccs"]["unused"])  # No $indexStats permission
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+import threading
+
+try:
+    from utils.ai_core.intent_classifier import IntentClassifier
+except ImportError as e:  # ai_core needs the full backend requirements
+    raise unittest.SkipTest(f"ai_core dependencies not installed: {e}")
+
+LABELS = ["get_person_schedule", "find_people", "get_school_info", "get_student_grades"]
+TEMPLATES = {
+    "get_person_schedule": ["what is the schedule of {x}", "show class schedule for {x}", "when are the classes of {x}"],
+    "find_people": ["list all students in {x}", "who are the faculty of {x}", "show all {x} students"],
+    "get_school_info": ["what is the mission of {x}", "tell me about the history of {x}", "what is the vision of {x}"],
+    "get_student_grades": ["what are the grades of {x}", "show the gwa of {x}", "did {x} pass all subjects grades"],
+}
+NAMES = ["BSCS 1A", "Ana Cruz", "BSIT", "PDM", "Juan Dela Cruz", "BSCS", "the college", "Maria"]
+
+
+def _samples():
+    return [(t.format(x=name), label) for label, templates in TEMPLATES.items() for t in templates for name in NAMES]
+
+
+class TestIntentClassifier(unittest.TestCase):
+    def test_untrained_returns_none(self):
+        clf = IntentClassifier(LABELS)
+        self.assertEqual(clf.predict("schedule of BSCS 1A"), (None, 0.0))
+        self.assertFalse(clf.fit(_samples()[:5]))  # Below min_training_samples
+        self.assertFalse(clf.trained)
+
+    def test_fit_and_predict(self):
+        clf = IntentClassifier(LABELS, confidence_threshold=0.5)
+        self.assertTrue(clf.fit(_samples() + [("ignored", "unknown_tool")]))
+        self.assertEqual(clf.stats["training_samples"], len(_samples()))
+        label, confidence = clf.predict("what's the schedule of Pedro")
+        self.assertEqual(label, "get_person_schedule")
+        self.assertGreater(confidence, 0.25)
+        self.assertEqual(clf.predict("what is the mission of the university")[0], "get_school_info")
+
+    def test_incremental_learning_and_accuracy(self):
+        clf = IntentClassifier(LABELS + ["query_curriculum"], retrain_after_samples=3)
+        clf.fit(_samples())
+        for _ in range(20):
+            clf.learn("curriculum subjects for first year", "query_curriculum")
+        self.assertEqual(clf.predict("curriculum subjects for first year")[0], "query_curriculum")
+        self.assertTrue(clf._retrain.is_set())
+
+        clf.record_outcome("find_people", "find_people", "classifier")
+        clf.record_outcome("find_people", "get_person_profile", "classifier")
+        clf.record_outcome("get_school_info", "get_school_info", "llm")
+        stats = clf.get_stats()
+        self.assertEqual(stats["accuracy"], {"classifier": 0.5, "llm": 1.0})
+        self.assertEqual(stats["llm_fallbacks"], 1)
+
+    def test_learning_publishes_a_new_model(self):
+        clf = IntentClassifier(LABELS)
+        clf.fit(_samples())
+        vectorizer, classifier = clf._model
+        coef = classifier.coef_.copy()
+        clf.learn("show class schedule for Pedro", "get_person_schedule")
+        self.assertIs(clf._model[0], vectorizer)
+        self.assertIsNot(clf._model[1], classifier)
+        self.assertTrue((classifier.coef_ == coef).all())  # A prediction holding the old pair sees stable weights
+        self.assertFalse((clf._model[1].coef_ == coef).all())
+
+    def test_background_training(self):
+        clf = IntentClassifier(LABELS)
+        loaded = threading.Event()
+
+        def load():
+            loaded.set()
+            return _samples()
+
+        clf.start_background_training(load, interval_seconds=60)
+        self.assertTrue(loaded.wait(timeout=5))
+        for _ in range(100):
+            if clf.trained:
+                break
+            threading.Event().wait(0.05)
+        self.assertTrue(clf.trained)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+import asyncio
+import threading
+import time
+
+try:
+    from utils.ai_core.llm_service import run_batch, run_batch_async
+except ImportError as e:  # ai_core needs the full backend requirements
+    raise unittest.SkipTest(f"ai_core dependencies not installed: {e}")
+
+
+class TestRunBatch(unittest.TestCase):
+    def test_results_keep_input_order_and_isolate_errors(self):
+        def execute(user_prompt, delay=0.0):
+            time.sleep(delay)
+            if user_prompt == "boom":
+                raise RuntimeError("bad request")
+            if user_prompt == "down":
+                return "Error: Could not connect to the AI service. Details: timeout"
+            return user_prompt.upper()
+
+        batch = [{"user_prompt": "a", "delay": 0.05}, {"user_prompt": "boom"},
+                 {"user_prompt": "down"}, {"user_prompt": "b"}]
+        results = run_batch(execute, batch, max_workers=4)
+        self.assertEqual([r["ok"] for r in results], [True, False, False, True])
+        self.assertEqual(results[0]["content"], "A")
+        self.assertEqual(results[3]["content"], "B")
+        self.assertIn("bad request", results[1]["error"])
+        self.assertTrue(results[2]["error"].startswith("Error:"))
+
+    def test_concurrency_is_capped(self):
+        lock, state = threading.Lock(), {"active": 0, "peak": 0}
+
+        def execute(user_prompt):
+            with lock:
+                state["active"] += 1
+                state["peak"] = max(state["peak"], state["active"])
+            time.sleep(0.02)
+            with lock:
+                state["active"] -= 1
+            return user_prompt
+
+        run_batch(execute, [{"user_prompt": str(i)} for i in range(12)], max_workers=3)
+        self.assertLessEqual(state["peak"], 3)
+
+    def test_async_batch(self):
+        async def execute_async(user_prompt):
+            await asyncio.sleep(0.01 if user_prompt == "slow" else 0)
+            return user_prompt
+
+        results = asyncio.run(run_batch_async(execute_async, [{"user_prompt": "slow"}, {"user_prompt": "fast"}], 2))
+        self.assertEqual([r["content"] for r in results], ["slow", "fast"])
+
+    def test_empty_batch(self):
+        self.assertEqual(run_batch(lambda **kw: "", [], max_workers=4), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+import time
+
+try:
+    from utils.ai_core.llm_cache import LLMResponseCache
+except ImportError as e:  # ai_core needs the full backend requirements
+    raise unittest.SkipTest(f"ai_core dependencies not installed: {e}")
+
+
+class TestLLMResponseCache(unittest.TestCase):
+    def test_key_is_content_addressed(self):
+        msgs = [{"role": "user", "content": "hi"}]
+        k1 = LLMResponseCache.make_key("phi3", msgs, False, "intent")
+        k2 = LLMResponseCache.make_key("phi3", [dict(m) for m in msgs], False, "intent")
+        self.assertEqual(k1, k2)
+        self.assertNotEqual(k1, LLMResponseCache.make_key("phi3", msgs, True, "intent"))
+        self.assertNotEqual(k1, LLMResponseCache.make_key("phi3", msgs, False, "planner"))
+
+    def test_key_includes_the_json_schema(self):
+        msgs = [{"role": "user", "content": "hi"}]
+        plan = {"type": "object", "properties": {"plan": {"type": "array"}}}
+        intent = {"type": "object", "properties": {"intent": {"type": "string"}}}
+        k1 = LLMResponseCache.make_key("phi3", msgs, True, "planner", plan)
+        self.assertEqual(k1, LLMResponseCache.make_key("phi3", msgs, True, "planner", dict(plan)))
+        self.assertNotEqual(k1, LLMResponseCache.make_key("phi3", msgs, True, "planner", intent))
+        self.assertNotEqual(k1, LLMResponseCache.make_key("phi3", msgs, True, "planner"))
+
+    def test_hit_and_miss_counters(self):
+        cache = LLMResponseCache({})
+        key = cache.make_key("m", [], False, "intent")
+        self.assertIsNone(cache.get(key, "intent"))
+        cache.set(key, "intent", "find_people")
+        self.assertEqual(cache.get(key, "intent"), "find_people")
+        stats = cache.get_stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+        self.assertEqual(stats["by_phase"]["intent"], {"hits": 1, "misses": 1})
+
+    def test_synth_is_uncached_by_default(self):
+        cache = LLMResponseCache({})
+        key = cache.make_key("m", [], False, "synth")
+        cache.set(key, "synth", "answer")
+        self.assertIsNone(cache.get(key, "synth"))
+        self.assertEqual(cache.get_stats()["size"], 0)
+
+    def test_lru_eviction(self):
+        cache = LLMResponseCache({"max_entries": 2})
+        for i in range(3):
+            cache.set(f"k{i}", "intent", str(i))
+        self.assertIsNone(cache.get("k0", "intent"))
+        self.assertEqual(cache.get("k2", "intent"), "2")
+        self.assertEqual(cache.get_stats()["evictions"], 1)
+
+    def test_ttl_expiry(self):
+        cache = LLMResponseCache({"phase_ttls": {"intent": 0.05}})
+        cache.set("k", "intent", "v")
+        self.assertEqual(cache.get("k", "intent"), "v")
+        time.sleep(0.06)
+        self.assertIsNone(cache.get("k", "intent"))
+        self.assertEqual(cache.get_stats()["expired"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
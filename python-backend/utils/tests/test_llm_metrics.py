@@ -0,0 +1,78 @@
+import unittest
+import time
+
+try:
+    from utils.ai_core.llm_metrics import LLMMetrics, RollingHistogram
+except ImportError as e:  # ai_core needs the full backend requirements
+    raise unittest.SkipTest(f"ai_core dependencies not installed: {e}")
+
+
+def _record(phase="planner", latency=1.0, ok=True, cache_hit=False, retries=0):
+    return {"phase": phase, "model": "phi3", "backend": "offline", "ok": ok, "cache_hit": cache_hit,
+            "stream": False, "retries": retries, "queue_wait": 0.0, "ttfb": latency / 2, "latency": latency,
+            "prompt_tokens": 100, "completion_tokens": 20, "tokens_per_sec": 20 / latency if latency else None}
+
+
+class TestRollingHistogram(unittest.TestCase):
+    def test_percentiles(self):
+        hist = RollingHistogram()
+        for value in range(1, 101):
+            hist.observe(float(value))
+        summary = hist.summary()
+        self.assertEqual(summary["count"], 100)
+        self.assertEqual(summary["max"], 100.0)
+        self.assertAlmostEqual(summary["p50"], 50.0, delta=1)
+        self.assertAlmostEqual(summary["p95"], 95.0, delta=1)
+
+    def test_window_drops_old_samples(self):
+        hist = RollingHistogram(window_seconds=60)
+        hist.observe(5.0, now=time.time() - 120)
+        hist.observe(1.0)
+        self.assertEqual(hist.summary()["count"], 1)
+
+    def test_cumulative_buckets(self):
+        hist = RollingHistogram()
+        for value in (0.01, 0.2, 3.0):
+            hist.observe(value)
+        counts, total, count = hist.buckets((0.1, 1.0, 10.0))
+        self.assertEqual(counts, [1, 2, 3])
+        self.assertEqual(count, 3)
+        self.assertAlmostEqual(total, 3.21)
+
+
+class TestLLMMetrics(unittest.TestCase):
+    def test_snapshot_by_phase_and_target(self):
+        metrics = LLMMetrics()
+        metrics.record(_record("planner", 2.0, retries=1))
+        metrics.record(_record("planner", 0.0, cache_hit=True))
+        metrics.record(_record("synth", 8.0))
+        metrics.record(_record("synth", 30.0, ok=False))
+
+        snapshot = metrics.snapshot()
+        planner = snapshot["by_phase"]["planner"]
+        self.assertEqual((planner["calls"], planner["retries"], planner["cache_hits"]), (2, 1, 1))
+        self.assertEqual(planner["latency"]["count"], 1)  # Cache hits are kept out of latency
+        self.assertEqual(snapshot["by_phase"]["synth"]["errors"], 1)
+        self.assertEqual(snapshot["by_phase"]["synth"]["latency"]["max"], 8.0)  # So are failures
+        self.assertEqual(len(snapshot["by_target"]), 2)
+        self.assertEqual(metrics.slowest_phase(), "synth")
+
+    def test_prometheus_export(self):
+        metrics = LLMMetrics()
+        metrics.record(_record("intent", 0.3))
+        text = metrics.export_prometheus()
+        self.assertIn('llm_call_latency_seconds_bucket{phase="intent",model="phi3",backend="offline",le="0.5"} 1', text)
+        self.assertIn('llm_calls_total{phase="intent",model="phi3",backend="offline"} 1', text)
+
+    def test_planner_retry_rate(self):
+        metrics = LLMMetrics()
+        for _ in range(4):
+            metrics.count("planner", "plans")
+        metrics.count("planner", "reprompts")
+        planner = metrics.snapshot()["by_phase"]["planner"]
+        self.assertEqual(planner["retry_rate"], 0.25)
+        self.assertIn('llm_planner_reprompts_total{phase="planner"} 1', metrics.export_prometheus())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import asyncio
+import threading
+import time
+import unittest
+
+try:
+    from utils.ai_core.llm_router import LLMRouter
+except ImportError as e:  # ai_core needs the full backend requirements
+    raise unittest.SkipTest(f"ai_core dependencies not installed: {e}")
+
+
+class StubBackend:
+    """LLMService stand-in that answers after `delay` seconds, or with an error string."""
+
+    def __init__(self, label, delay=0.0, error=False, available=True):
+        self.api_mode, self.endpoint = "stub", label
+        self.delay, self.error, self.available = delay, error, available
+        self.debug_mode = False
+        self.max_concurrency = 4
+        self.calls = 0
+        self.cancelled = threading.Event()
+
+    def _answer(self):
+        return f"Error: Could not connect to {self.endpoint}." if self.error else f"answer from {self.endpoint}"
+
+    def execute(self, **kwargs):
+        self.calls += 1
+        time.sleep(self.delay)
+        return self._answer()
+
+    async def execute_async(self, **kwargs):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled.set()
+            raise
+        return self._answer()
+
+    def is_available(self):
+        return self.available
+
+    def get_health(self):
+        return {}
+
+
+def router_for(*backends, **config):
+    return LLMRouter(list(backends), {"hedge_delay": 0.05, "adaptive_hedge": False, **config})
+
+
+class TestLLMRouter(unittest.TestCase):
+    def test_hedge_wins_when_the_preferred_backend_is_slow(self):
+        router = router_for(StubBackend("slow", delay=0.5), StubBackend("fast", delay=0.01))
+        t0 = time.perf_counter()
+        self.assertEqual(router.execute(phase="planner"), "answer from fast")
+        self.assertLess(time.perf_counter() - t0, 0.3)
+        stats = router.get_health()["router"]
+        self.assertEqual((stats["hedged"], stats["hedge_wins"]), (1, 1))
+
+    def test_fast_failure_fails_over_without_waiting_for_the_hedge(self):
+        failing, healthy = StubBackend("failing", error=True), StubBackend("healthy")
+        router = router_for(failing, healthy, hedge_delay=5.0)
+        t0 = time.perf_counter()
+        self.assertEqual(router.execute(phase="planner"), "answer from healthy")
+        self.assertLess(time.perf_counter() - t0, 1.0)
+        self.assertEqual(router.get_health()["router"]["hedged"], 0)
+        self.assertGreaterEqual(router.get_health()["router"]["failovers"], 1)
+
+    def test_open_breakers_are_skipped_and_all_open_fails_fast(self):
+        down, up = StubBackend("down", available=False), StubBackend("up")
+        self.assertEqual(router_for(down, up).execute(phase="planner"), "answer from up")
+        self.assertEqual(down.calls, 0)
+
+        down_too = StubBackend("down-too", error=True, available=False)
+        router = router_for(down_too, StubBackend("down-3", available=False))
+        self.assertTrue(router.is_error_response(router.execute(phase="planner")))
+        self.assertFalse(router.is_available())
+
+    def test_phases_outside_hedge_phases_are_not_hedged(self):
+        router = router_for(StubBackend("slow", delay=0.2), StubBackend("fast"))
+        self.assertEqual(router.execute(phase="synth"), "answer from slow")  # Not hedged by default
+        self.assertEqual(router.get_health()["router"]["hedged"], 0)
+
+    def test_async_loser_is_cancelled(self):
+        slow, fast = StubBackend("slow", delay=2.0), StubBackend("fast", delay=0.01)
+        router = router_for(slow, fast)
+        result = asyncio.run(router.execute_async(phase="planner"))
+        self.assertEqual(result, "answer from fast")
+        self.assertTrue(slow.cancelled.is_set())
+
+    def test_sync_hedging_stops_while_losers_are_still_running(self):
+        slow, fast = StubBackend("slow", delay=0.4), StubBackend("fast")
+        router = router_for(slow, fast, max_abandoned_hedges=1)
+        self.assertEqual(router.execute(phase="planner"), "answer from fast")
+        self.assertEqual(router.get_health()["router"]["abandoned_in_flight"], 1)
+        self.assertEqual(router.execute(phase="planner"), "answer from slow")  # Waited instead of hedging
+        stats = router.get_health()["router"]
+        self.assertEqual((stats["hedged"], stats["hedges_skipped"]), (1, 1))
+        time.sleep(0.5)
+        self.assertEqual(router.get_health()["router"]["abandoned_in_flight"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,158 @@
+import asyncio
+import sys
+import unittest
+from pathlib import Path
+
+try:
+    from utils.ai_core.analyst import AIAnalyst
+    from utils.ai_core.llm_service import LLMService, close_async_http_clients, close_http_sessions
+except ImportError as e:  # ai_core needs the full backend requirements
+    raise unittest.SkipTest(f"ai_core dependencies not installed: {e}")
+
+sys.path.append(str(Path(__file__).resolve().parents[2] / "benchmarks"))
+from stub_llm_server import CANNED_TEXT, StubLLMServer  # noqa: E402
+
+
+def service_for(server, api_mode="offline"):
+    return LLMService({"api_mode": api_mode, "mistral_api_key": "test-key", "ollama_api_url": server.ollama_url,
+                       "mistral_api_url": server.mistral_url,
+                       "retry_policy": {"base_delay": 0.01, "max_retry_after": 0.01}})
+
+
+def collect_async(stream):
+    async def collect():
+        try:
+            return [token async for token in stream]
+        finally:
+            await close_async_http_clients()
+    return asyncio.run(collect())
+
+
+class TestExecuteStream(unittest.TestCase):
+    def setUp(self):
+        self.server = StubLLMServer().start()
+        self.addCleanup(self.server.stop)
+        self.addCleanup(close_http_sessions)
+
+    def test_tokens_from_mistral_sse_and_ollama_ndjson(self):
+        for api_mode in ("online", "offline"):
+            service = service_for(self.server, api_mode)
+            for tokens in (list(service.execute_stream(system_prompt="s", user_prompt="q")),
+                           collect_async(service.execute_stream_async(system_prompt="s", user_prompt="q"))):
+                self.assertGreater(len(tokens), 1, api_mode)
+                self.assertEqual("".join(tokens), CANNED_TEXT, api_mode)
+            self.assertEqual(service.get_health()["failures"], 0)
+
+    def test_failure_before_the_first_token_is_retried_then_reported(self):
+        server = StubLLMServer(error_rate=1.0).start()
+        self.addCleanup(server.stop)
+        service = service_for(server)
+        for tokens in (list(service.execute_stream(system_prompt="s", user_prompt="q", retries=1)),
+                       collect_async(service.execute_stream_async(system_prompt="s", user_prompt="q", retries=1))):
+            self.assertEqual(len(tokens), 1)
+            self.assertTrue(LLMService.is_error_response(tokens[0]))
+        self.assertEqual(server.stats["injected_errors"], 4)
+
+    def test_parse_stream_line(self):
+        usage = {}
+        self.assertEqual(LLMService._parse_stream_line('data: {"choices": [{"delta": {"content": "Hi"}}]}'), "Hi")
+        self.assertIsNone(LLMService._parse_stream_line("data: [DONE]"))
+        self.assertIsNone(LLMService._parse_stream_line(": keep-alive"))
+        self.assertEqual(LLMService._parse_stream_line('{"message": {"content": "Hi"}, "done": false}'), "Hi")
+        LLMService._parse_stream_line('{"message": {"content": ""}, "done": true, "eval_count": 7}', usage)
+        self.assertEqual(usage.get("completion_tokens"), 7)
+        with self.assertRaises(ValueError):
+            LLMService._parse_stream_line('{"error": "model not found"}')
+
+
+class LastWordRouter:
+    def route(self, query):
+        return {"tool_name": "lookup_person", "parameters": {"name": query.split()[-1]}}, "test"
+
+
+class QueryLog:
+    def __init__(self):
+        self.records = []
+
+    def record_query_result(self, **kwargs):
+        self.records.append(kwargs)
+
+
+class SessionsCollection:
+    def __init__(self):
+        self.updates = []
+
+    def find_one(self, filter_query):
+        return None
+
+    def update_one(self, filter_query, update, upsert=False):
+        self.updates.append(update["$set"])
+
+
+class SummaryQueue:
+    def __init__(self):
+        self.submitted = []
+
+    def pending(self, session_id):
+        return False
+
+    def submit(self, session_id):
+        self.submitted.append(session_id)
+
+
+class TestStreamingTurn(unittest.TestCase):
+    def setUp(self):
+        self.server = StubLLMServer(tokens_per_sec=200).start()
+        self.addCleanup(self.server.stop)
+        # The streaming turn only needs these attributes on the rule-router path; the real
+        # constructor needs MongoDB.
+        analyst = self.analyst = AIAnalyst.__new__(AIAnalyst)
+        analyst.debug_mode = False
+        analyst.execution_mode = "test"
+        analyst.endpoint_deadlines, analyst.default_deadline = {}, None
+        analyst.max_history_turns = 10
+        analyst._session_locks = {}
+        analyst.sessions_cache = {}
+        analyst.sessions_collection = SessionsCollection()
+        analyst.summary_queue = SummaryQueue()
+        analyst.rule_router = LastWordRouter()
+        analyst.plan_cache = None
+        analyst.intent_classifier = None
+        analyst.tool_fields = {}
+        analyst._save_dynamic_example = lambda *args: None
+        analyst._add_entity_to_session = lambda session_id, name: None
+        analyst.training_system = QueryLog()
+        analyst.synth_llm = service_for(self.server)
+        analyst.available_tools = {"lookup_person": lambda name: [{"content": f"{name} profile", "metadata": {}}]}
+
+    def test_tokens_then_done_and_the_turn_is_saved_after_the_stream(self):
+        logged_while_streaming = []
+
+        async def turn():
+            events = []
+            try:
+                async for event in self.analyst.web_stream_ai_analyst_async("who is ana", "s1"):
+                    if event["type"] == "token":
+                        logged_while_streaming.append(len(self.analyst.training_system.records))
+                    events.append(event)
+            finally:
+                await close_async_http_clients()
+            return events
+
+        events = asyncio.run(turn())
+        tokens, done = events[:-1], events[-1]
+        self.assertGreater(len(tokens), 1)
+        self.assertTrue(all(event["type"] == "token" for event in tokens))
+        self.assertEqual("".join(event["content"] for event in tokens), CANNED_TEXT)
+        self.assertEqual((done["type"], done["ai_response"], done["cut_stages"]), ("done", CANNED_TEXT, []))
+
+        self.assertEqual(set(logged_while_streaming), {0})
+        self.assertEqual(len(self.analyst.training_system.records), 1)
+        self.assertEqual(self.analyst.training_system.records[0]["final_answer"], CANNED_TEXT)
+        self.assertEqual(self.analyst.sessions_cache["s1"]["chat_history"][-1],
+                         {"role": "assistant", "content": CANNED_TEXT})
+        self.assertEqual(self.analyst.summary_queue.submitted, ["s1"])
+
+
+if __name__ == "__main__":
+    unittest.main()
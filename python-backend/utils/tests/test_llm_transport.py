@@ -0,0 +1,103 @@
+import asyncio
+import sys
+import unittest
+from pathlib import Path
+
+try:
+    from utils.ai_core.llm_service import (
+        LLMService, close_async_http_clients, close_http_sessions, get_async_http_client, get_http_session
+    )
+except ImportError as e:  # ai_core needs the full backend requirements
+    raise unittest.SkipTest(f"ai_core dependencies not installed: {e}")
+
+sys.path.append(str(Path(__file__).resolve().parents[2] / "benchmarks"))
+from stub_llm_server import CANNED_TEXT, StubLLMServer  # noqa: E402
+
+
+def service_for(server, api_mode="offline", **config):
+    return LLMService({"api_mode": api_mode, "mistral_api_key": "test-key", "ollama_api_url": server.ollama_url,
+                       "mistral_api_url": server.mistral_url,
+                       "retry_policy": {"base_delay": 0.01, "max_retry_after": 0.01}, **config})
+
+
+class TestPooledTransport(unittest.TestCase):
+    def setUp(self):
+        self.server = StubLLMServer().start()
+        self.addCleanup(self.server.stop)
+        self.addCleanup(close_http_sessions)
+
+    def connections_opened(self, url):
+        pools = get_http_session(url).get_adapter(url).poolmanager.pools
+        return sum(pools[key].num_connections for key in pools.keys())
+
+    def test_one_session_per_endpoint(self):
+        session = get_http_session(self.server.ollama_url)
+        self.assertIs(get_http_session(self.server.mistral_url), session)  # Same host:port, other path
+        self.assertIsNot(get_http_session("http://127.0.0.1:1/api/chat"), session)
+        close_http_sessions()
+        self.assertIsNot(get_http_session(self.server.ollama_url), session)
+
+    def test_planner_and_synth_reuse_one_connection(self):
+        planner, synth = service_for(self.server), service_for(self.server)
+        for _ in range(3):
+            self.assertEqual(planner.execute(system_prompt="s", user_prompt="q", phase="planner"), CANNED_TEXT)
+            self.assertEqual(synth.execute(system_prompt="s", user_prompt="q", phase="synth"), CANNED_TEXT)
+        self.assertEqual(self.server.stats["requests"], 6)
+        self.assertEqual(self.connections_opened(self.server.ollama_url), 1)
+
+    def test_both_protocols(self):
+        for api_mode in ("online", "offline"):
+            service = service_for(self.server, api_mode)
+            self.assertEqual(service.execute(system_prompt="s", user_prompt="q", json_mode=True),
+                             '{"tool_name": "answer_conversational_query", "parameters": {}}')
+
+    def test_timeouts_are_split_per_phase(self):
+        service = service_for(self.server, connect_timeout=2, read_timeouts={"planner": 30, "summary": 5})
+        self.assertEqual(service._get_timeout("planner"), (2, 30))
+        self.assertEqual(service._get_timeout("synth"), (2, 360))
+        self.assertEqual(service._get_timeout("summary"), (2, 5))
+        self.assertEqual(service._get_timeout("intent"), (2, 30))  # Falls back to the planner role
+
+    def test_failed_calls_are_retried_on_the_pool(self):
+        server = StubLLMServer(error_rate=1.0).start()
+        self.addCleanup(server.stop)
+        result = service_for(server).execute(system_prompt="s", user_prompt="q", retries=1)
+        self.assertTrue(LLMService.is_error_response(result))
+        self.assertEqual(server.stats["injected_errors"], 2)
+        self.assertEqual(self.connections_opened(server.ollama_url), 1)
+
+
+class TestAsyncPooledTransport(unittest.TestCase):
+    def setUp(self):
+        self.server = StubLLMServer().start()
+        self.addCleanup(self.server.stop)
+
+    def test_clients_are_shared_per_loop_and_endpoint(self):
+        async def clients():
+            first = get_async_http_client(self.server.ollama_url)
+            same = get_async_http_client(self.server.mistral_url)
+            await close_async_http_clients()
+            return first, same, get_async_http_client(self.server.ollama_url)
+
+        first, same, after_close = asyncio.run(clients())
+        self.assertIs(first, same)
+        self.assertIsNot(after_close, first)
+        self.assertIsNot(asyncio.run(clients())[0], first)  # A new event loop gets its own client
+
+    def test_concurrent_async_calls(self):
+        planner, synth = service_for(self.server), service_for(self.server)
+
+        async def calls():
+            try:
+                return await asyncio.gather(*(service.execute_async(system_prompt="s", user_prompt=str(i), phase=phase)
+                                              for i in range(4) for service, phase in ((planner, "planner"),
+                                                                                       (synth, "synth"))))
+            finally:
+                await close_async_http_clients()
+
+        self.assertEqual(asyncio.run(calls()), [CANNED_TEXT] * 8)
+        self.assertEqual(self.server.stats["requests"], 8)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import re
+import unittest
+
+try:
+    from utils.ai_core.database import MongoCollectionAdapter, name_tokens
+except ImportError as e:  # ai_core needs the full backend requirements
+    raise unittest.SkipTest(f"ai_core dependencies not installed: {e}")
+
+
+class Cursor(list):
+    def limit(self, n):
+        return self
+
+
+class PeopleCollection:
+    def __init__(self, tokenized):
+        self.tokenized = tokenized
+        self.filters = []
+        self.find_one_calls = 0
+
+    def find_one(self, filter_query, projection=None):
+        self.find_one_calls += 1
+        return {"_id": 1} if self.tokenized else None
+
+    def find(self, filter_query, projection=None):
+        self.filters.append(filter_query)
+        return Cursor()
+
+
+class TestNameTokens(unittest.TestCase):
+    def test_cleaning(self):
+        self.assertEqual(name_tokens("Dr. Maria Santos-Reyes, Jr."), ["MARIA", "SANTOS", "REYES"])
+        self.assertEqual(name_tokens("escobar, jared m."), ["ESCOBAR", "JARED", "M"])
+        self.assertEqual(name_tokens("Peñaflor Peñaflor"), ["PEÑAFLOR"])
+        self.assertEqual(name_tokens(None), [])
+
+    def test_indexed_prefix_lookup_once_the_collection_is_tokenized(self):
+        collection = PeopleCollection(tokenized=True)
+        adapter = MongoCollectionAdapter(collection)
+        adapter.query(query_texts=["Prof. Jared Esco"], where={"program": "BSCS"})
+        adapter.query(query_texts=["escobar"])
+        self.assertEqual(collection.filters[0], {"course": "BSCS", "$or": [
+            {"name_tokens": {"$all": [re.compile("^JARED"), re.compile("^ESCO")]}},
+            {"name_tokens": {"$exists": False},
+             "full_name": {"$regex": r"(?=.*Prof\.)(?=.*Jared)(?=.*Esco)", "$options": "i"}},
+        ]})
+        self.assertEqual(collection.filters[1]["$or"][0], {"name_tokens": {"$all": [re.compile("^ESCOBAR")]}})
+        self.assertEqual(collection.find_one_calls, 1)  # Cached
+
+    def test_documents_without_tokens_stay_findable(self):
+        collection = PeopleCollection(tokenized=True)
+        adapter = MongoCollectionAdapter(collection)
+        adapter.query(query_texts=["reyes"], where={"$or": [{"program": "BSCS"}, {"program": "BSIT"}]})
+        name_filter = adapter.name_filter("reyes")
+        self.assertEqual(collection.filters[0], {"$and": [{"$or": [{"course": "BSCS"}, {"course": "BSIT"}]},
+                                                          name_filter]})
+        untokenized = {"full_name": "Santos-Reyes, Maria"}  # e.g. written by a path that skips nameTokens()
+        fallback = name_filter["$or"][1]
+        self.assertNotIn("name_tokens", untokenized)
+        self.assertRegex(untokenized["full_name"], re.compile(fallback["full_name"]["$regex"], re.IGNORECASE))
+
+    def test_regex_until_backfilled(self):
+        collection = PeopleCollection(tokenized=False)
+        MongoCollectionAdapter(collection).query(query_texts=["jared escobar"])
+        self.assertEqual(collection.filters[0], {"full_name": {"$regex": "(?=.*jared)(?=.*escobar)", "$options": "i"}})
+
+    def test_explicit_full_name_filter_wins(self):
+        collection = PeopleCollection(tokenized=True)
+        MongoCollectionAdapter(collection).query(query_texts=["x"], where={"full_name": "Ana Cruz"})
+        self.assertEqual(collection.filters[0], {"full_name": "Ana Cruz"})
+
+
+if __name__ == "__main__":
+    unittest.main()
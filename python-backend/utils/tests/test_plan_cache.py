@@ -0,0 +1,80 @@
+import unittest
+import contextlib
+import io
+
+try:
+    from utils.ai_core.plan_cache import PlanCache, normalize_pattern
+    from utils.ai_core.policy_engine import PolicyEngine
+except ImportError as e:  # ai_core needs the full backend requirements
+    raise unittest.SkipTest(f"ai_core dependencies not installed: {e}")
+
+
+def _policy_engine():
+    with contextlib.redirect_stdout(io.StringIO()):
+        engine = PolicyEngine(known_programs=["BSCS", "BSIT"])
+    engine.nlp = None  # Keep the tests independent of the installed SpaCy model
+    return engine
+
+
+SCHEDULE_CALL = {"tool_name": "get_person_schedule", "parameters": {"program": "BSCS", "year_level": 2}}
+
+
+class TestPlanCache(unittest.TestCase):
+    def setUp(self):
+        self.engine = _policy_engine()
+        self.cache = PlanCache(self.engine, {"min_successes": 2, "demote_after_failures": 2})
+
+    def test_delexicalize_query_extracts_entities(self):
+        pattern, entities = self.engine.delexicalize_query("schedule of bscs 2nd year")
+        self.assertEqual(pattern, "schedule of {PROGRAM} {YEAR}")
+        self.assertEqual(entities["PROGRAM"], ["BSCS"])
+        self.assertEqual(entities["YEAR"], ["2"])
+        self.assertEqual(normalize_pattern("  Schedule of {PROGRAM}  {YEAR}? "), "schedule of {program} {year}")
+
+    def test_template_served_after_enough_successes_and_refilled(self):
+        self.cache.record_outcome("schedule of BSCS 2nd year", SCHEDULE_CALL, "SUCCESS_DIRECT", served=False)
+        self.assertIsNone(self.cache.lookup("schedule of BSIT 3rd year"))  # One success isn't enough
+        self.cache.record_outcome("schedule of BSCS 2nd year", SCHEDULE_CALL, "SUCCESS_DIRECT", served=False)
+
+        tool_call = self.cache.lookup("Schedule of BSIT 3rd year?")
+        self.assertEqual(tool_call, {"tool_name": "get_person_schedule",
+                                     "parameters": {"program": "BSIT", "year_level": 3}})
+        self.assertEqual(self.cache.get_stats()["top_templates"][0]["hits"], 1)
+        self.assertIsNone(self.cache.lookup("schedule of BSIT and BSCS 3rd year"))  # Different pattern
+
+    def test_unfillable_when_entity_is_ambiguous(self):
+        call = {"tool_name": "find_people", "parameters": {"program": "BSCS"}}
+        for _ in range(2):
+            self.cache.record_outcome("students of BSCS", call, "SUCCESS_DIRECT", served=False)
+        self.assertIsNotNone(self.cache.lookup("students of BSIT"))
+        self.cache._templates["students of {program}"].plan_template["parameters"]["section"] = "{PERSON_NAME}"
+        self.assertIsNone(self.cache.lookup("students of BSIT"))
+        self.assertEqual(self.cache.stats["unfillable"], 1)
+
+    def test_demoted_after_served_failures(self):
+        self.cache.min_success_rate = 0.5  # Otherwise the success rate alone stops serving it first
+        for _ in range(2):
+            self.cache.record_outcome("schedule of BSCS 2nd year", SCHEDULE_CALL, "SUCCESS_DIRECT", served=False)
+        for _ in range(2):
+            tool_call = self.cache.lookup("schedule of BSIT 1st year")
+            self.assertIsNotNone(tool_call)
+            self.cache.record_outcome("schedule of BSIT 1st year", tool_call, "FAIL_EMPTY", served=True)
+        self.assertIsNone(self.cache.lookup("schedule of BSIT 1st year"))
+        self.assertEqual(self.cache.stats["demotions"], 1)
+
+    def test_seed_from_dynamic_examples(self):
+        seeded = self.cache.seed([
+            {"user_pattern": "schedule of {PROGRAM} {YEAR}", "quality_label": "SUCCESS_DIRECT",
+             "plan_template": {"tool_name": "get_person_schedule",
+                               "parameters": {"program": "{PROGRAM}", "year_level": "{YEAR}"}}},
+            {"user_pattern": "broken", "plan_template": None},
+        ])
+        self.assertEqual(seeded, 1)
+        self.assertIsNone(self.cache.lookup("schedule of BSIT 4th year"))  # Seeded with one success
+        self.cache.record_outcome("schedule of BSIT 4th year", {"tool_name": "get_person_schedule",
+                                  "parameters": {"program": "BSIT", "year_level": 4}}, "SUCCESS_DIRECT", served=False)
+        self.assertEqual(self.cache.lookup("schedule of BSCS 1st year")["parameters"]["year_level"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from utils.ai_core.plan_executor import build_step_graph, placeholder_refs, run_plan
+except ImportError as e:  # ai_core needs the full backend requirements
+    raise unittest.SkipTest(f"ai_core dependencies not installed: {e}")
+
+
+def call(tool_name, **params):
+    return {"tool_name": tool_name, "parameters": params}
+
+
+class TestPlanExecutor(unittest.TestCase):
+    def setUp(self):
+        self.executor = ThreadPoolExecutor(max_workers=4)
+
+    def tearDown(self):
+        self.executor.shutdown(wait=False)
+
+    def test_dependency_graph(self):
+        self.assertEqual(placeholder_refs({"a": ["$program_from_step_1", {"b": "$year_level_from_step_3"}]}), {1, 3})
+        self.assertEqual(placeholder_refs({"name": "$not a placeholder"}), set())
+        graph = build_step_graph([call("get_person_profile", person_name="Ana"),
+                                  call("get_student_grades", student_name="Ana"),
+                                  call("get_adviser_info", program="$program_from_step_1")])
+        self.assertEqual(graph, {1: set(), 2: set(), 3: {1}})
+        with self.assertRaises(ValueError):
+            build_step_graph([call("find_people", name="$full_name_from_step_1")])
+
+    def test_independent_steps_run_concurrently_and_dependents_wait(self):
+        def run_step(number, tool_call, results):
+            time.sleep(0.1)
+            if number == 3:
+                return [{"uses": results[1]}]
+            return [number]
+
+        t0 = time.perf_counter()
+        run = run_plan([call("a"), call("b"), call("c", x="$x_from_step_1")], run_step, self.executor)
+        elapsed = time.perf_counter() - t0
+        self.assertLess(elapsed, 0.28)  # Two waves of 0.1s, not three
+        self.assertEqual(run.results, {1: [1], 2: [2], 3: [{"uses": [1]}]})
+        self.assertGreaterEqual(run.steps[3].started_at, run.steps[1].duration)
+        self.assertEqual(set(run.timings), {1, 2, 3})
+        self.assertEqual(len(run.to_dict()["steps"]), 3)
+
+    def test_failed_or_empty_dependencies_skip_their_dependents(self):
+        def run_step(number, tool_call, results):
+            if number == 1:
+                raise RuntimeError("db down")
+            return [] if number == 2 else ["ok"]
+
+        run = run_plan([call("a"), call("b"), call("c", x="$x_from_step_1"), call("d", y="$y_from_step_2"),
+                        call("e")], run_step, self.executor)
+        self.assertIn("db down", run.steps[1].error)
+        self.assertFalse(run.steps[2].usable)
+        self.assertIn("step 1", run.steps[3].skipped)
+        self.assertIn("step 2", run.steps[4].skipped)
+        self.assertEqual(run.results[5], ["ok"])
+
+
+if __name__ == "__main__":
+    unittest.main()
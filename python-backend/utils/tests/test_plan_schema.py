@@ -0,0 +1,148 @@
+import unittest
+import json
+from typing import Any, List, Optional
+
+try:
+    from utils.ai_core.plan_schema import (
+        PLANNER_PSEUDO_TOOLS, build_plan_schema, build_tool_call_schema, extract_json_object, parse_plan,
+        parse_tool_call, validate_tool_call
+    )
+except ImportError as e:  # ai_core needs the full backend requirements
+    raise unittest.SkipTest(f"ai_core dependencies not installed: {e}")
+
+
+def find_people(name: str = None, year_level: int = None, n_results: int = 1000) -> List[dict]:
+    return []
+
+
+def get_person_profile(person_name: str) -> List[dict]:
+    return []
+
+
+def search_database(query_text: Optional[str] = None, filters: Optional[dict] = None, topic: Any = None) -> List[dict]:
+    return []
+
+
+TOOLS = {"find_people": find_people, "get_person_profile": get_person_profile,
+         "search_database": search_database, **PLANNER_PSEUDO_TOOLS}
+
+
+class TestToolCallSchema(unittest.TestCase):
+    def test_one_branch_per_tool_with_its_parameters(self):
+        schema = build_tool_call_schema(TOOLS)
+        json.dumps(schema)  # Must be serializable to send as 'format' / response_format
+        branches = {b["properties"]["tool_name"]["const"]: b["properties"]["parameters"] for b in schema["anyOf"]}
+        self.assertEqual(set(branches), set(TOOLS))
+        self.assertEqual(branches["get_person_profile"]["required"], ["person_name"])
+        self.assertEqual(branches["get_person_profile"]["properties"]["person_name"], {"type": "string"})
+        self.assertEqual(branches["find_people"]["required"], [])
+        self.assertEqual(branches["find_people"]["properties"]["year_level"],
+                         {"anyOf": [{"type": "integer"}, {"type": "null"}]})
+        self.assertEqual(branches["search_database"]["properties"]["filters"],
+                         {"anyOf": [{"type": "object"}, {"type": "null"}]})
+        self.assertEqual(branches["search_database"]["properties"]["topic"], {})
+        self.assertFalse(branches["find_people"]["additionalProperties"])
+        self.assertEqual(branches["request_clarification"]["required"], ["question_for_user"])
+
+
+class TestParseToolCall(unittest.TestCase):
+    def test_valid_call(self):
+        call, error = parse_tool_call('{"tool_name": "find_people", "parameters": {"year_level": 1}}', TOOLS)
+        self.assertIsNone(error)
+        self.assertEqual(call, {"tool_name": "find_people", "parameters": {"year_level": 1}})
+
+    def test_prose_and_trailing_braces_do_not_break_extraction(self):
+        text = ('Sure! ```json\n{"tool_name": "get_person_profile", "parameters": {"person_name": "Ana"}}\n```'
+                ' Note: {this is not json}')
+        call, error = parse_tool_call(text, TOOLS)
+        self.assertIsNone(error)
+        self.assertEqual(call["parameters"], {"person_name": "Ana"})
+        obj, _ = extract_json_object('{"a": 1} and then {"b": 2}')
+        self.assertEqual(obj, {"a": 1})
+
+    def test_missing_parameters_default_to_empty(self):
+        call, error = parse_tool_call('{"tool_name": "find_people"}', TOOLS)
+        self.assertEqual(call["parameters"], {})
+
+    def test_errors_are_specific(self):
+        cases = {
+            "": "empty",
+            "no json here": "no JSON object",
+            '{"tool_name": "find_people", "parameters": {': "invalid JSON",
+            '{"parameters": {}}': "no 'tool_name'",
+            '{"tool_name": "drop_tables", "parameters": {}}': "not an available tool",
+            '{"tool_name": "get_person_profile", "parameters": {}}': "person_name",
+            '{"tool_name": "find_people", "parameters": ["x"]}': "must be an object",
+            '{"tool_name": "find_people", "parameters": {"nme": "Ana"}}': "no parameter(s) nme",
+            '{"tool_name": "find_people", "parameters": {"year_level": [2]}}': "'year_level' of 'find_people'",
+            '{"tool_name": "find_people", "parameters": {"n_results": "many"}}': "must be integer",
+            '{"tool_name": "get_person_profile", "parameters": {"person_name": null}}': "must be string",
+            '{"tool_name": "find_people", "parameters": {"year_level": "$year_level_from_step_1"}}': "integer",
+        }
+        for text, expected in cases.items():
+            call, error = parse_tool_call(text, TOOLS)
+            self.assertIsNone(call, text)
+            self.assertIn(expected, error, text)
+
+    def test_parameter_types_the_tools_accept(self):
+        for params in ({"year_level": 2}, {"year_level": "2"}, {"year_level": None}, {"name": "Ana", "n_results": 5}):
+            call, error = validate_tool_call({"tool_name": "find_people", "parameters": params}, TOOLS)
+            self.assertIsNone(error, params)
+        call, error = validate_tool_call({"tool_name": "search_database",
+                                          "parameters": {"filters": {"program": "BSCS"}, "topic": [1, "x"]}}, TOOLS)
+        self.assertIsNone(error)
+
+
+STEP_TOOLS = {name: tool for name, tool in TOOLS.items() if name not in PLANNER_PSEUDO_TOOLS}
+
+
+class TestParsePlan(unittest.TestCase):
+    def test_plan_schema_accepts_placeholders_in_steps(self):
+        schema = build_plan_schema(TOOLS, STEP_TOOLS, max_steps=3)
+        json.dumps(schema)
+        plan = schema["anyOf"][-1]["properties"]["plan"]
+        self.assertEqual(plan["maxItems"], 3)
+        steps = {b["properties"]["tool_name"]["const"]: b["properties"]["parameters"]
+                 for b in plan["items"]["properties"]["tool_call"]["anyOf"]}
+        self.assertNotIn("request_clarification", steps)
+        self.assertEqual(steps["find_people"]["properties"]["year_level"]["anyOf"][-1], {"type": "string"})
+
+    def test_single_call_and_plan(self):
+        plan, error = parse_plan('{"tool_name": "find_people", "parameters": {}}', TOOLS, STEP_TOOLS, 3)
+        self.assertEqual(plan, {"plan": [{"tool_call": {"tool_name": "find_people", "parameters": {}}}]})
+
+        text = json.dumps({"plan": [
+            {"tool_call": {"tool_name": "get_person_profile", "parameters": {"person_name": "Ana"}}},
+            {"tool_call": {"tool_name": "find_people", "parameters": {"year_level": "$year_level_from_step_1"}}},
+            {"tool_call": {"tool_name": "finish_plan", "parameters": {}}},
+        ]})
+        plan, error = parse_plan(text, TOOLS, STEP_TOOLS, 3)
+        self.assertIsNone(error)
+        self.assertEqual([s["tool_call"]["tool_name"] for s in plan["plan"]], ["get_person_profile", "find_people"])
+
+        text = text.replace('"$year_level_from_step_1"', '[1]')
+        plan, error = parse_plan(text, TOOLS, STEP_TOOLS, 3)
+        self.assertIn("step 2", error)
+        self.assertIn("'year_level' of 'find_people'", error)
+
+    def test_plan_errors(self):
+        def step(tool_name, **params):
+            return {"tool_call": {"tool_name": tool_name, "parameters": params}}
+
+        cases = {
+            "too many": ({"plan": [step("find_people")] * 4}, "at most 3"),
+            "forward ref": ({"plan": [step("find_people", name="$full_name_from_step_2"), step("find_people")]},
+                            "earlier steps"),
+            "pseudo tool": ({"plan": [step("find_people"), step("request_clarification", question_for_user="?")]},
+                            "on its own"),
+            "bad step": ({"plan": [step("find_people"), step("get_person_profile")]}, "step 2"),
+            "empty": ({"plan": []}, "non-empty"),
+        }
+        for label, (obj, expected) in cases.items():
+            plan, error = parse_plan(json.dumps(obj), TOOLS, STEP_TOOLS, 3)
+            self.assertIsNone(plan, label)
+            self.assertIn(expected, error, label)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+import asyncio
+import unittest
+import threading
+import time
+
+try:
+    from utils.ai_core.residency import ModelResidencyScheduler, ResidencyTimeout
+except ImportError as e:  # ai_core needs the full backend requirements
+    raise unittest.SkipTest(f"ai_core dependencies not installed: {e}")
+
+
+class TestModelResidencyScheduler(unittest.TestCase):
+    def test_resident_model_runs_without_swap(self):
+        scheduler = ModelResidencyScheduler("test", max_loaded_models=1)
+        scheduler.seed(["phi3:latest"])
+        with scheduler.slot("phi3:latest") as slot:
+            self.assertFalse(slot.swapped)
+        self.assertEqual(scheduler.stats["swaps"], 0)
+        self.assertEqual(scheduler.resident_models(), ["phi3:latest"])
+
+    def test_queued_calls_for_loaded_model_run_before_swap(self):
+        scheduler = ModelResidencyScheduler("test", max_loaded_models=1, max_hold_seconds=5.0)
+        scheduler.seed(["phi3:latest"])
+        order, lock = [], threading.Lock()
+        first = scheduler.acquire("phi3:latest")  # Keeps phi3 busy while the others queue up
+
+        def call(model, delay):
+            time.sleep(delay)
+            with scheduler.slot(model):
+                with lock:
+                    order.append(model)
+                time.sleep(0.01)
+
+        threads = [threading.Thread(target=call, args=("llama3:8b", 0.0)),
+                   threading.Thread(target=call, args=("phi3:latest", 0.05)),
+                   threading.Thread(target=call, args=("phi3:latest", 0.05))]
+        for t in threads:
+            t.start()
+        time.sleep(0.15)
+        scheduler.release(first)
+        for t in threads:
+            t.join(timeout=5)
+
+        self.assertEqual(order, ["phi3:latest", "phi3:latest", "llama3:8b"])
+        self.assertEqual(scheduler.stats["swaps"], 1)
+        self.assertGreaterEqual(scheduler.stats["reordered"], 1)
+
+    def test_held_model_is_not_starved(self):
+        scheduler = ModelResidencyScheduler("test", max_loaded_models=1, max_hold_seconds=0.1)
+        scheduler.seed(["phi3:latest"])
+        done = threading.Event()
+
+        def swap_call():
+            with scheduler.slot("llama3:8b"):
+                done.set()
+
+        # Keep phi3 continuously busy with overlapping calls; the swap must still happen.
+        busy = scheduler.acquire("phi3:latest")
+        t = threading.Thread(target=swap_call)
+        t.start()
+        time.sleep(0.2)
+        late = []
+        late_thread = threading.Thread(target=lambda: late.append(scheduler.acquire("phi3:latest")))
+        late_thread.start()
+        time.sleep(0.05)
+        self.assertEqual(late, [])  # Held behind the overdue swap
+        scheduler.release(busy)
+        self.assertTrue(done.wait(timeout=2))
+        t.join(timeout=2)
+        late_thread.join(timeout=2)
+        scheduler.release(late[0])
+        self.assertEqual(scheduler.stats["swaps"], 2)
+
+    def test_capacity_allows_two_models(self):
+        scheduler = ModelResidencyScheduler("test", max_loaded_models=2)
+        a = scheduler.acquire("phi3:latest")
+        b = scheduler.acquire("llama3:8b")
+        self.assertEqual(set(scheduler.resident_models()), {"phi3:latest", "llama3:8b"})
+        b.load_seconds = 1.5
+        scheduler.release(a)
+        scheduler.release(b)
+        self.assertEqual(scheduler.snapshot()["swap_seconds"]["count"], 1)
+
+    def test_acquire_times_out(self):
+        scheduler = ModelResidencyScheduler("test", max_loaded_models=1, max_hold_seconds=5.0)
+        busy = scheduler.acquire("phi3:latest")
+        t0 = time.perf_counter()
+        with self.assertRaises(ResidencyTimeout):
+            scheduler.acquire("llama3:8b", timeout=0.1)
+        self.assertLess(time.perf_counter() - t0, 0.5)
+        self.assertEqual(scheduler.snapshot()["waiting"], {})
+        scheduler.release(busy)
+        self.assertEqual(scheduler.stats["timed_out"], 1)
+
+    def test_cancelled_async_acquire_releases_the_slot(self):
+        scheduler = ModelResidencyScheduler("test", max_loaded_models=1)
+        busy = scheduler.acquire("phi3:latest")
+
+        async def cancel_waiting_call():
+            task = asyncio.ensure_future(scheduler.acquire_async("llama3:8b"))
+            await asyncio.sleep(0.05)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            scheduler.release(busy)  # The worker thread now gets llama3 and must hand it back
+            await asyncio.sleep(0.3)
+
+        asyncio.run(cancel_waiting_call())
+        self.assertEqual(scheduler.snapshot()["in_flight"], {})
+        self.assertEqual(scheduler.resident_models(), ["llama3:8b"])
+
+
+if __name__ == "__main__":
+    unittest.main()
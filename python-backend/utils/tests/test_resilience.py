@@ -0,0 +1,97 @@
+import asyncio
+import unittest
+import time
+
+try:
+    from utils.ai_core.resilience import CircuitBreaker, backoff_delay, parse_retry_after
+except ImportError as e:  # ai_core needs the full backend requirements
+    raise unittest.SkipTest(f"ai_core dependencies not installed: {e}")
+
+
+class TestBackoff(unittest.TestCase):
+    def test_full_jitter_is_bounded(self):
+        for attempt in range(6):
+            delay = backoff_delay(attempt, base_delay=0.5, max_delay=4.0)
+            self.assertGreaterEqual(delay, 0.0)
+            self.assertLessEqual(delay, min(4.0, 0.5 * 2 ** attempt))
+
+    def test_retry_after_wins_but_is_capped(self):
+        self.assertEqual(backoff_delay(0, retry_after=3.0), 3.0)
+        self.assertEqual(backoff_delay(0, retry_after=120.0, max_retry_after=30.0), 30.0)
+
+    def test_parse_retry_after(self):
+        self.assertEqual(parse_retry_after("7"), 7.0)
+        self.assertEqual(parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT"), 0.0)  # In the past
+        self.assertIsNone(parse_retry_after(None))
+        self.assertIsNone(parse_retry_after("soon"))
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def test_opens_after_threshold_and_fails_fast(self):
+        breaker = CircuitBreaker("test", failure_threshold=2, recovery_timeout=60)
+        breaker.record_failure()
+        self.assertTrue(breaker.allow_request())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow_request())
+        self.assertFalse(breaker.is_available())
+        self.assertEqual(breaker.snapshot()["short_circuited"], 1)
+
+    def test_half_open_probe(self):
+        breaker = CircuitBreaker("test", failure_threshold=1, recovery_timeout=0.05)
+        breaker.record_failure()
+        time.sleep(0.06)
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertTrue(breaker.allow_request())
+        self.assertFalse(breaker.allow_request())  # Only one probe at a time
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow_request())
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        self.assertEqual(breaker.snapshot()["times_opened"], 2)
+
+    def half_open_breaker(self, **settings):
+        breaker = CircuitBreaker("test", failure_threshold=1, recovery_timeout=0.05, **settings)
+        breaker.record_failure()
+        time.sleep(0.06)
+        return breaker
+
+    def test_released_permit_frees_the_probe(self):
+        breaker = self.half_open_breaker()
+        permit = breaker.acquire()
+        self.assertTrue(permit.is_probe)
+        self.assertIsNone(breaker.acquire())
+        permit.release()
+        permit.release()  # Idempotent
+        self.assertTrue(breaker.acquire().is_probe)
+        self.assertFalse(CircuitBreaker("closed").acquire().is_probe)
+
+    def test_cancelled_probe_frees_its_slot(self):
+        breaker = self.half_open_breaker()
+
+        async def probe():
+            async with breaker.acquire():
+                await asyncio.sleep(10)
+
+        async def cancel_probe():
+            task = asyncio.ensure_future(probe())
+            await asyncio.sleep(0.01)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+        asyncio.run(cancel_probe())
+        self.assertTrue(breaker.is_available())
+
+    def test_stale_probe_is_reclaimed(self):
+        breaker = self.half_open_breaker(probe_timeout=0.05)
+        self.assertTrue(breaker.allow_request())  # Never reported back
+        self.assertFalse(breaker.is_available())
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow_request())
+        self.assertEqual(breaker.snapshot()["probes_reclaimed"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+try:
+    from utils.ai_core.rule_router import RuleRouter
+except ImportError as e:  # ai_core needs the full backend requirements
+    raise unittest.SkipTest(f"ai_core dependencies not installed: {e}")
+
+RULES_PATH = Path(__file__).resolve().parents[2] / "config" / "routing_rules.json"
+VOCABULARIES = {
+    "program": ["BSCS", "BSIT", "BSBA"],
+    "department": ["CCS", "CBA"],
+    "position": ["Dean", "Program Head"],
+}
+
+
+class TestRuleRouter(unittest.TestCase):
+    def setUp(self):
+        self.router = RuleRouter(str(RULES_PATH), VOCABULARIES)
+
+    def assertRoutes(self, query, tool_name, parameters, rule=None):
+        tool_call, name = self.router.route(query)
+        self.assertEqual(tool_call, {"tool_name": tool_name, "parameters": parameters}, query)
+        if rule:
+            self.assertEqual(name, rule)
+
+    def test_shipped_rules(self):
+        self.assertRoutes("PDM-2023-000123", "get_data_by_id", {"pdm_id": "PDM-2023-000123"}, "pdm_id")
+        self.assertRoutes("Hello!", "answer_conversational_query", {}, "greeting")
+        self.assertRoutes("schedule of BSIT 2nd year", "get_person_schedule", {"program": "BSIT", "year_level": 2})
+        self.assertRoutes("what is the schedule of bscs 3A?", "get_person_schedule",
+                          {"program": "BSCS", "year_level": 3, "section": "A"})
+        self.assertRoutes("grades of Juan Dela Cruz", "get_student_grades", {"student_name": "Juan Dela Cruz"},
+                          "student_grades")
+        self.assertRoutes("show the grades of BSCS first year", "get_student_grades",
+                          {"program": "BSCS", "year_level": 1}, "group_grades")
+        self.assertRoutes("list all BSBA 4th year students", "find_people",
+                          {"program": "BSBA", "year_level": 4, "role": "student"})
+        self.assertRoutes("who is the dean of CCS?", "find_people", {"role": "Dean", "department": "CCS"})
+
+    def test_ambiguous_queries_go_to_the_planner(self):
+        for query in ["compare the schedule of BSIT and BSCS", "schedule of BSIT 1st year and 2nd year",
+                      "who teaches the most classes", "what is the mission of PDM", ""]:
+            self.assertEqual(self.router.route(query), (None, None), query)
+        stats = self.router.get_stats()
+        self.assertEqual(stats["routed"], 0)
+        self.assertGreaterEqual(stats["no_match"], 1)
+
+    def test_longest_vocabulary_value_wins(self):
+        router = RuleRouter(str(RULES_PATH), {"program": ["BS", "BSCS"]})
+        self.assertEqual(router.extract_entities("schedule of BSCS 1st year")["program"], ["BSCS"])
+
+
+class TestRuleRouterReload(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, "rules.json")
+        shutil.copy(RULES_PATH, self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _write(self, rules):
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump({"rules": rules}, f)
+        stat = os.stat(self.path)
+        os.utime(self.path, (stat.st_atime, stat.st_mtime + 5))  # Make sure the mtime changes
+
+    def test_hot_reload_and_bad_file_keeps_rules(self):
+        router = RuleRouter(self.path, VOCABULARIES, reload_interval_seconds=0)
+        self.assertEqual(router.route("mission")[0], None)
+        self._write([{"name": "mission", "tool_name": "get_school_info", "exact": ["mission"],
+                      "params": {"topic": "mission"}}])
+        self.assertEqual(router.route("mission")[0], {"tool_name": "get_school_info", "parameters": {"topic": "mission"}})
+
+        self._write([{"name": "broken", "tool_name": "find_people", "require": ["planet"]}])
+        self.assertEqual(router.route("mission")[1], "mission")  # Previous rules kept
+        self.assertEqual(router.get_stats()["reloads"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
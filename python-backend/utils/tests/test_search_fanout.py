@@ -0,0 +1,130 @@
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from utils.ai_core.analyst import AIAnalyst
+    from utils.ai_core.database import SOURCE_FIELD, MongoCollectionAdapter, union_query
+    from utils.ai_core.turn_state import turn_scope
+except ImportError as e:  # ai_core needs the full backend requirements
+    raise unittest.SkipTest(f"ai_core dependencies not installed: {e}")
+
+
+class Cursor(list):
+    def limit(self, n):
+        return self
+
+
+class SlowCollection:
+    """Adapter stand-in: answers query() after `delay` seconds, or raises `error`."""
+
+    def __init__(self, name, delay, error=None):
+        self.name, self.delay, self.error = name, delay, error
+
+    def query(self, **kwargs):
+        time.sleep(self.delay)
+        if self.error:
+            raise RuntimeError(self.error)
+        return {"documents": [[f"{self.name} doc"]], "metadatas": [[{"collection": self.name}]]}
+
+
+class UnionCollection:
+    """pymongo collection stand-in that evaluates the $unionWith branches it is given."""
+
+    def __init__(self, name, docs, database="school_system", fail=False):
+        self.name, self.docs, self.database, self.fail = name, docs, database, fail
+        self.pipelines = []
+
+    def find_one(self, filter_query, projection=None):
+        return None
+
+    def run(self, pipeline):
+        source = next(stage["$addFields"][SOURCE_FIELD]["$literal"] for stage in pipeline if "$addFields" in stage)
+        limit = next(stage["$limit"] for stage in pipeline if "$limit" in stage)
+        return [{**doc, SOURCE_FIELD: source} for doc in self.docs[:limit]]
+
+    def aggregate(self, pipeline, **options):
+        self.pipelines.append((pipeline, options))
+        if self.fail:
+            raise RuntimeError("$unionWith not supported")
+        own = [stage for stage in pipeline if "$unionWith" not in stage]
+        results = self.run(own)
+        for stage in pipeline:
+            if "$unionWith" in stage:
+                results += COLLECTIONS[stage["$unionWith"]["coll"]].run(stage["$unionWith"]["pipeline"])
+        return results
+
+
+COLLECTIONS = {}
+
+
+class TestUnionQuery(unittest.TestCase):
+    def setUp(self):
+        COLLECTIONS.clear()
+        for name, count in (("students_ccs", 3), ("students_cba", 1), ("grades_ccs", 2)):
+            COLLECTIONS[name] = UnionCollection(name, [{"_id": f"{name}-{i}", "full_name": f"Ana {i}"}
+                                                       for i in range(count)])
+        self.adapters = {name: MongoCollectionAdapter(coll) for name, coll in COLLECTIONS.items()}
+
+    def test_one_aggregation_split_back_per_collection(self):
+        results = union_query(self.adapters, ["ana"], n_results=2, max_time_ms=500)
+        self.assertEqual(list(results), ["students_ccs", "students_cba", "grades_ccs"])
+        self.assertEqual([len(r["ids"][0]) for r in results.values()], [2, 1, 2])  # Limited on the server
+        self.assertNotIn(SOURCE_FIELD, results["students_ccs"]["metadatas"][0][0])
+        pipeline, options = COLLECTIONS["students_ccs"].pipelines[0]
+        self.assertEqual(options, {"maxTimeMS": 500})
+        self.assertEqual([stage["$unionWith"]["coll"] for stage in pipeline if "$unionWith" in stage],
+                         ["students_cba", "grades_ccs"])
+        self.assertEqual(pipeline[0], {"$match": {"full_name": {"$regex": "(?=.*ana)", "$options": "i"}}})
+
+    def test_collections_of_one_database_only(self):
+        COLLECTIONS["students_cba"].database = "other"
+        with self.assertRaises(ValueError):
+            union_query(self.adapters, ["*"])
+
+
+class TestSearchFanout(unittest.TestCase):
+    def setUp(self):
+        # search_database only needs these attributes; the real constructor needs MongoDB.
+        self.analyst = AIAnalyst.__new__(AIAnalyst)
+        self.analyst.debug_mode = False
+        self.analyst.search_strategy = "parallel"
+        self.analyst.REVERSE_SCHEMA_MAP = AIAnalyst._create_reverse_schema_map()
+        self.analyst._search_executor = ThreadPoolExecutor(max_workers=8)
+        self.analyst.collections = {
+            "students_ccs": SlowCollection("students_ccs", 0.3),
+            "students_cba": SlowCollection("students_cba", 0.05),
+            "schedules_ccs": SlowCollection("schedules_ccs", 0.1),
+            "students_cte": SlowCollection("students_cte", 0.1, error="hnsw segment reader: corrupted"),
+        }
+
+    def tearDown(self):
+        self.analyst._search_executor.shutdown(wait=False)
+
+    def test_collections_are_queried_concurrently_in_a_stable_order(self):
+        with turn_scope() as turn:
+            t0 = time.perf_counter()
+            hits = self.analyst.search_database(query="ana", collection_filter="students_")
+            self.assertLess(time.perf_counter() - t0, 0.4)  # Slowest collection, not the sum
+        self.assertEqual([h["source_collection"] for h in hits], ["students_ccs", "students_cba"])
+        self.assertEqual(turn.corruption_warnings, ["students_cte"])
+
+    def test_union_strategy_and_fallback(self):
+        COLLECTIONS.clear()
+        COLLECTIONS.update({"students_ccs": UnionCollection("students_ccs", [{"_id": 1, "full_name": "Ana"}]),
+                            "students_cba": UnionCollection("students_cba", [{"_id": 2, "full_name": "Ben"}])})
+        self.analyst.search_strategy = "union"
+        self.analyst.collections = {name: MongoCollectionAdapter(coll) for name, coll in COLLECTIONS.items()}
+        hits = self.analyst.search_database(collection_filter="students_")
+        self.assertEqual([h["source_collection"] for h in hits], ["students_ccs", "students_cba"])
+        self.assertEqual(len(COLLECTIONS["students_ccs"].pipelines), 1)
+
+        COLLECTIONS["students_ccs"].fail = True  # Falls back to one find() per collection
+        COLLECTIONS["students_ccs"].find = COLLECTIONS["students_cba"].find = \
+            lambda *a: Cursor([{"_id": 3, "full_name": "Cy"}])
+        hits = self.analyst.search_database(collection_filter="students_")
+        self.assertEqual([h["source_collection"] for h in hits], ["students_ccs", "students_cba"])
+
+
+if __name__ == "__main__":
+    unittest.main()
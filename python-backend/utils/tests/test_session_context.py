@@ -0,0 +1,79 @@
+import json
+import threading
+import unittest
+
+try:
+    from utils.ai_core.analyst import AIAnalyst
+except ImportError as e:  # ai_core needs the full backend requirements
+    raise unittest.SkipTest(f"ai_core dependencies not installed: {e}")
+
+
+class SessionsCollection:
+    def __init__(self):
+        self.updates = []
+
+    def update_one(self, filter_query, update, upsert=False):
+        self.updates.append(json.loads(json.dumps(update["$set"], default=str)))
+
+
+class SummarizerLLM:
+    """Returns a new structured context; `during_call` runs while the 'LLM' is busy."""
+
+    def __init__(self, context, during_call=None):
+        self.context, self.during_call = context, during_call
+
+    def execute(self, **kwargs):
+        if self.during_call:
+            self.during_call()
+        return json.dumps(self.context)
+
+
+class TestSessionContext(unittest.TestCase):
+    def setUp(self):
+        # The summarizer only needs these attributes; the real constructor needs MongoDB.
+        self.analyst = AIAnalyst.__new__(AIAnalyst)
+        self.analyst.debug_mode = False
+        self.analyst.max_history_turns = 10
+        self.analyst._session_locks = {}
+        self.analyst.sessions_collection = SessionsCollection()
+        self.session = {"session_id": "s1", "structured_context": {"current_topic": "None."},
+                        "chat_history": [{"role": "user", "content": "who is ana?"},
+                                         {"role": "assistant", "content": "Ana Cruz is a BSCS student."}]}
+        self.analyst.sessions_cache = {"s1": self.session}
+
+    def test_summary_keeps_a_clarification_set_meanwhile(self):
+        def turn_asks_for_clarification():
+            self.analyst._set_turn_context(self.session, clarification_pending=True,
+                                           original_ambiguous_query="show the schedule")
+
+        self.analyst.planner_llm = SummarizerLLM(
+            {"current_topic": "Ana Cruz", "clarification_pending": False, "original_ambiguous_query": ""},
+            during_call=turn_asks_for_clarification)
+        self.analyst._summarize_conversation("s1")
+
+        context = self.session["structured_context"]
+        self.assertEqual(context["current_topic"], "Ana Cruz")
+        self.assertTrue(context["clarification_pending"])
+        self.assertEqual(context["original_ambiguous_query"], "show the schedule")
+        self.assertEqual(self.analyst.sessions_collection.updates[-1]["structured_context"], context)
+
+    def test_history_appends_race_with_the_summary(self):
+        self.analyst.planner_llm = SummarizerLLM({"current_topic": "Ana Cruz"})
+
+        def turns():
+            for i in range(200):
+                self.analyst._update_session_history("s1", f"question {i}", f"answer {i}")
+
+        writer = threading.Thread(target=turns)
+        writer.start()
+        for _ in range(50):
+            self.analyst._summarize_conversation("s1")
+        writer.join()
+        history = self.session["chat_history"]
+        self.assertEqual(len(history), 20)
+        self.assertEqual(history[-1], {"role": "assistant", "content": "answer 199"})
+        self.assertEqual(self.session["structured_context"], {"current_topic": "Ana Cruz"})
+
+
+if __name__ == "__main__":
+    unittest.main()
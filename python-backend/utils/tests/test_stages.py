@@ -0,0 +1,61 @@
+import unittest
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from utils.ai_core.deadline import current_deadline
+    from utils.ai_core.stages import Stage, run_stages
+except ImportError as e:  # ai_core needs the full backend requirements
+    raise unittest.SkipTest(f"ai_core dependencies not installed: {e}")
+
+
+class TestRunStages(unittest.TestCase):
+    def setUp(self):
+        self.executor = ThreadPoolExecutor(max_workers=4)
+
+    def tearDown(self):
+        self.executor.shutdown(wait=False)
+
+    def test_stages_run_concurrently(self):
+        t0 = time.perf_counter()
+        run = run_stages({
+            "a": Stage(lambda: time.sleep(0.1) or "a", timeout=1.0),
+            "b": Stage(lambda: time.sleep(0.1) or "b", timeout=1.0),
+            "c": Stage(lambda: "c", optional=False),
+        }, self.executor)
+        self.assertLess(time.perf_counter() - t0, 0.18)
+        self.assertEqual((run["a"], run["b"], run["c"]), ("a", "b", "c"))
+        self.assertEqual(run.skipped, {})
+        self.assertEqual(set(run.timings), {"a", "b", "c"})
+
+    def test_slow_optional_stage_is_skipped(self):
+        t0 = time.perf_counter()
+        run = run_stages({
+            "examples": Stage(lambda: time.sleep(0.5) or ["x"], timeout=0.05, default=[]),
+            "context": Stage(lambda: "{}", optional=False),
+        }, self.executor)
+        self.assertLess(time.perf_counter() - t0, 0.3)
+        self.assertEqual(run["examples"], [])
+        self.assertIn("timeout", run.skipped["examples"])
+
+    def test_stage_timeout_is_the_deadline_inside_the_stage(self):
+        run = run_stages({
+            "intent": Stage(lambda: current_deadline().remaining(), timeout=0.5),
+            "context": Stage(current_deadline, optional=False),
+        }, self.executor)
+        self.assertLessEqual(run["intent"], 0.5)
+        self.assertIsNone(run["context"])
+
+    def test_errors(self):
+        def boom():
+            raise RuntimeError("db down")
+
+        run = run_stages({"examples": Stage(boom, default=[])}, self.executor)
+        self.assertEqual(run["examples"], [])
+        self.assertIn("db down", run.skipped["examples"])
+        with self.assertRaises(RuntimeError):
+            run_stages({"context": Stage(boom, optional=False)}, self.executor)
+
+
+if __name__ == "__main__":
+    unittest.main()
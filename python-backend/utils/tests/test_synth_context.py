@@ -0,0 +1,76 @@
+import unittest
+
+try:
+    from utils.ai_core.synth_context import build_synth_context, compact_document, dumps_compact, rank_documents
+    from utils.ai_core.token_budget import estimate_tokens
+except ImportError as e:  # ai_core needs the full backend requirements
+    raise unittest.SkipTest(f"ai_core dependencies not installed: {e}")
+
+
+def student(name, course="BSCS", year="2", section="A"):
+    content = f"Student profile for {name}. Program: {course}, Year: {year}, Section: {section}."
+    return {"source_collection": "students_ccs", "content": content,
+            "metadata": {"_id": "66f0c0ffee", "full_name": name, "course": course, "year": year,
+                         "section": section, "content": content, "field_status": "{'gwa': 'missing'}",
+                         "created_at": "2025-01-01 00:00:00", "gwa": "None"}}
+
+
+class TestCompactDocument(unittest.TestCase):
+    def test_internal_fields_and_duplicates_are_dropped(self):
+        compact = compact_document({**student("Ana Cruz"), "relevance": 12})
+        self.assertEqual(compact["metadata"], {"full_name": "Ana Cruz", "course": "BSCS", "year": "2", "section": "A"})
+        self.assertNotIn("relevance", compact)
+        self.assertEqual(compact["source_collection"], "students_ccs")
+        self.assertNotIn("\n", dumps_compact(compact))
+
+
+class TestRanking(unittest.TestCase):
+    def test_query_terms_then_relevance_with_system_notes_first(self):
+        docs = [
+            {"source_collection": "faculty", "content": "Prof. Reyes teaches Networks.", "relevance": 30},
+            {"source_collection": "schedules", "content": "Schedule of BSIT 3A: Databases on Monday.", "relevance": 10},
+            {"source_collection": "system_note", "content": "Note: the targeted search failed."},
+        ]
+        ranked = rank_documents(docs, "What is the schedule of BSIT 3A?")
+        self.assertEqual([d["source_collection"] for d in ranked], ["system_note", "schedules", "faculty"])
+
+
+class TestBuildSynthContext(unittest.TestCase):
+    def test_everything_fits(self):
+        docs = [student("Ana Cruz"), student("Ben Santos")]
+        data, omitted = build_synth_context(docs, "students in BSCS", max_tokens=2000)
+        self.assertEqual(len(data), 2)
+        self.assertEqual(omitted, {})
+
+    def test_overflow_is_counted_per_collection(self):
+        docs = [student(f"Student {i}") for i in range(40)]
+        data, omitted = build_synth_context(docs, "BSCS students", max_tokens=300)
+        self.assertLessEqual(estimate_tokens(dumps_compact(data)), 300)
+        self.assertEqual(len(data) + omitted["documents"], 40)
+        self.assertEqual(omitted["by_collection"], {"students_ccs": 40 - len(data)})
+
+    def test_max_documents(self):
+        docs = [student(f"Student {i}") for i in range(10)]
+        data, omitted = build_synth_context(docs, None, max_tokens=10000, max_documents=4)
+        self.assertEqual(len(data), 4)
+        self.assertEqual(omitted["documents"], 6)
+
+    def test_groups_are_filled_student_by_student(self):
+        groups = [
+            {"source_collection": "grouped_students", "group_name": "BSCS - Year 2 - Section A",
+             "students": [student(f"Ana {i}") for i in range(30)]},
+            {"source_collection": "grouped_students", "group_name": "BSIT - Year 1 - Section B",
+             "students": [student(f"Ben {i}", course="BSIT") for i in range(30)]},
+        ]
+        data, omitted = build_synth_context(groups, "BSIT year 1 section B students", max_tokens=400)
+        self.assertEqual(data[0]["group_name"], "BSIT - Year 1 - Section B")  # Ranked by the query
+        shown = len(data[0]["students"])
+        self.assertTrue(0 < shown < 30)
+        self.assertEqual((data[0]["students_shown"], data[0]["students_total"]), (shown, 30))
+        self.assertIn({"group_name": "BSIT - Year 1 - Section B", "shown": shown, "total": 30}, omitted["groups"])
+        self.assertEqual(omitted["groups"][-1]["group_name"], "BSCS - Year 2 - Section A")
+        self.assertLessEqual(estimate_tokens(dumps_compact(data)), 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
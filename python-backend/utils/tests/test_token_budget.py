@@ -0,0 +1,65 @@
+import unittest
+
+try:
+    from utils.ai_core.token_budget import estimate_message_tokens, estimate_tokens, fit_messages_to_budget
+except ImportError as e:  # ai_core needs the full backend requirements
+    raise unittest.SkipTest(f"ai_core dependencies not installed: {e}")
+
+
+def _messages(history_turns: int, system: str = "Be brief.", user: str = "Who teaches BSCS 1A?"):
+    history = []
+    for i in range(history_turns):
+        history.append({"role": "user", "content": f"question number {i} " * 20})
+        history.append({"role": "assistant", "content": f"answer number {i} " * 20})
+    return [{"role": "system", "content": system}] + history + [{"role": "user", "content": user}]
+
+
+class TestTokenEstimate(unittest.TestCase):
+    def test_estimate_grows_with_text(self):
+        self.assertEqual(estimate_tokens(""), 0)
+        self.assertEqual(estimate_tokens(None), 0)
+        self.assertLess(estimate_tokens("hello"), estimate_tokens("hello, world"))
+        self.assertGreater(estimate_tokens("internationalization"), 1)  # Long words cost more than one token
+
+
+class TestFitMessagesToBudget(unittest.TestCase):
+    def test_under_budget_is_untouched(self):
+        messages = _messages(1)
+        fitted, actions = fit_messages_to_budget(messages, 10_000)
+        self.assertEqual(fitted, messages)
+        self.assertEqual(actions, [])
+
+    def test_drops_oldest_history_first(self):
+        messages = _messages(4)
+        budget = estimate_message_tokens(messages) - 50
+        fitted, actions = fit_messages_to_budget(messages, budget, min_history_messages=2)
+        self.assertLessEqual(estimate_message_tokens(fitted), budget)
+        self.assertEqual(fitted[0], messages[0])
+        self.assertEqual(fitted[-1], messages[-1])
+        self.assertEqual(fitted[-2], messages[-2])  # Most recent turn kept
+        self.assertIn("oldest history", actions[0])
+
+    def test_truncates_context_blocks_in_order(self):
+        docs = '{"data": [' + ", ".join('{"name": "Student %d"}' % i for i in range(200)) + "]}"
+        examples = "Example plan. " * 50
+        system = f"Rules.\n{examples}"
+        user = f"Factual Documents:\n{docs}\n\nQuestion: Who is enrolled?"
+        messages = _messages(0, system=system, user=user)
+        budget = estimate_message_tokens(messages) - 300
+
+        fitted, actions = fit_messages_to_budget(messages, budget, context_blocks=[docs, examples])
+        self.assertLessEqual(estimate_message_tokens(fitted), budget)
+        self.assertIn(examples, fitted[0]["content"])  # Second block untouched
+        self.assertTrue(fitted[-1]["content"].endswith("Question: Who is enrolled?"))
+        self.assertIn("truncated", fitted[-1]["content"])
+        self.assertEqual(len(actions), 1)
+
+    def test_input_is_not_mutated(self):
+        messages = _messages(3)
+        original = [dict(m) for m in messages]
+        fit_messages_to_budget(messages, 10)
+        self.assertEqual(messages, original)
+
+
+if __name__ == "__main__":
+    unittest.main()